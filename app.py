@@ -1,49 +1,34 @@
 import os
-from flask import Flask, request, jsonify, send_from_directory
+import json
+import time
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from sentence_transformers import SentenceTransformer
-from PyPDF2 import PdfReader
-from pdf2image import convert_from_path
-import pytesseract
-from pinecone import Pinecone, ServerlessSpec
 from dotenv import load_dotenv
+from upload_cache import digest
+from matching import MatchError, BATCH_MAX_DOCS, match_batch, match_pdf, matches_kind, upload_cache
+from pdf_extract import probe_needs_ocr
+from jobs import JobQueue, PRIORITY_OCR, PRIORITY_TEXT, FINAL_STATES
+from services import services, APP_PRELOAD, APP_WARMUP
+from metrics import init_app as init_metrics, span
 
 # ----------------------------------------------
 # Load environment variables
 # ----------------------------------------------
 load_dotenv()
-api_key = os.getenv("PINECONE_API_KEY")
-if not api_key:
-    raise ValueError("❌ Set your PINECONE_API_KEY in the .env file!")
 
 # ----------------------------------------------
 # Flask setup
 # ----------------------------------------------
 app = Flask(__name__)
 CORS(app)
+init_metrics(app)  # per-stage timing spans + Prometheus /metrics
 
 # ----------------------------------------------
-# Pinecone setup
+# Vector index + embedding model: created lazily by `services`
+# (see gunicorn.conf.py for the preload / fork-safe setup)
 # ----------------------------------------------
-index_name = "legal-cases"
-pc = Pinecone(api_key=api_key)
-
-if index_name not in [idx["name"] for idx in pc.list_indexes()]:
-    print(f"🆕 Creating Pinecone index '{index_name}'...")
-    pc.create_index(
-        name=index_name,
-        dimension=384,  # for all-MiniLM-L6-v2
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-index = pc.Index(index_name)
-
-# ----------------------------------------------
-# Embedding model
-# ----------------------------------------------
-print("🔹 Loading embedding model...")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-print("✅ Loaded model: all-MiniLM-L6-v2")
+if APP_WARMUP and not APP_PRELOAD:
+    services.start_warm_up()
 
 # ----------------------------------------------
 # File save folder
@@ -51,26 +36,6 @@ print("✅ Loaded model: all-MiniLM-L6-v2")
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "user_uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# ----------------------------------------------
-# PDF text extraction (with OCR fallback)
-# ----------------------------------------------
-def extract_pdf_text(file_path):
-    text = ""
-    try:
-        reader = PdfReader(file_path)
-        for page in reader.pages:
-            t = page.extract_text()
-            if t:
-                text += t + " "
-        if not text.strip():
-            print("🔍 Using OCR fallback...")
-            images = convert_from_path(file_path)
-            for img in images:
-                text += pytesseract.image_to_string(img)
-    except Exception as e:
-        print(f"⚠️ PDF extraction failed: {e}")
-    return text.strip()
-
 # ----------------------------------------------
 # Upload + Match route
 # ----------------------------------------------
@@ -83,38 +48,147 @@ def upload_and_match():
     if file.filename == "":
         return jsonify({"error": "No selected file"}), 400
 
+    data = file.read()
+    sha = digest(data)
     save_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(save_path)
+    with span("save"), open(save_path, "wb") as f:
+        f.write(data)
     print(f"📂 File saved: {save_path}")
 
-    # Extract text
-    text = extract_pdf_text(save_path)
-    if not text:
-        print("❌ No text extracted from PDF.")
-        return jsonify({"error": "Unable to extract readable text from PDF"}), 400
-
-    # Create embeddings
-    embedding = embedder.encode(text).tolist()
-
-    # Query Pinecone for similar cases
     try:
-        res = index.query(vector=embedding, top_k=5, include_metadata=True)
-    except Exception as e:
-        print(f"❌ Pinecone query failed: {e}")
-        return jsonify({"error": "Failed to query Pinecone"}), 500
-
-    # Format results
-    results = []
-    for match in res["matches"]:
-        file_name = match["id"]
-        score = match["score"]
-        results.append({
-            "file": file_name,
-            "score": score
-        })
-
+        results, cached = match_pdf(sha, save_path)
+    except MatchError as e:
+        return jsonify({"error": e.message}), e.status
+    if cached:
+        print(f"⚡ Cache hit: {sha[:12]}")
     return jsonify({"message": "Matches retrieved successfully!", "results": results})
 
+# ----------------------------------------------
+# Batch match: many PDFs and/or raw texts in one request, one encoder
+# call, concurrent index queries, NDJSON lines streamed as documents finish
+# ----------------------------------------------
+@app.route("/batch_match", methods=["POST"])
+def batch_match():
+    items = []
+    for file in request.files.getlist("files") + request.files.getlist("file"):
+        if file.filename == "":
+            continue
+        data = file.read()
+        sha = digest(data)
+        save_path = os.path.join(UPLOAD_FOLDER, f"{sha[:16]}_{os.path.basename(file.filename)}")
+        with span("save"), open(save_path, "wb") as f:
+            f.write(data)
+        items.append({"id": file.filename, "sha": sha, "path": save_path})
+
+    body = request.get_json(silent=True) or {}
+    texts = body.get("texts") or request.form.getlist("texts")
+    for i, entry in enumerate(texts):
+        if isinstance(entry, dict):
+            doc_id, text = str(entry.get("id", f"text-{i}")), entry.get("text") or ""
+        else:
+            doc_id, text = f"text-{i}", str(entry)
+        if text.strip():
+            items.append({"id": doc_id, "sha": digest(text.encode("utf-8")), "text": text})
+
+    if not items:
+        return jsonify({"error": "No files or texts in request"}), 400
+    ids = [item["id"] for item in items]
+    if len(set(ids)) != len(ids):
+        duplicates = sorted({i for i in ids if ids.count(i) > 1})
+        return jsonify({"error": "Document ids must be unique within a batch", "duplicates": duplicates}), 400
+    if len(items) > BATCH_MAX_DOCS:
+        return jsonify({"error": f"At most {BATCH_MAX_DOCS} documents per batch"}), 413
+
+    def stream():
+        started, errors = time.time(), 0
+        for result in match_batch(items):
+            errors += "error" in result
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "documents": len(items), "errors": errors,
+                          "seconds": round(time.time() - started, 3)}) + "\n"
+
+    print(f"📦 Batch of {len(items)} documents")
+    return Response(stream(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+# ----------------------------------------------
+# Async jobs: POST returns a job ID at once, a bounded worker pool does
+# extraction / OCR / matching (text-layer PDFs ahead of OCR jobs)
+# ----------------------------------------------
+def run_match_job(job):
+    # workers start with the process; the first jobs wait out warm-up instead of loading the model themselves
+    services.wait_ready()
+    payload = job["payload"]
+    results, _ = match_pdf(payload["sha"], payload["path"])
+    return results
+
+job_queue = JobQueue(run_match_job)
+services.on_process_start(job_queue.start)
+
+def public_job(job):
+    job = dict(job)
+    job.pop("payload", None)
+    job.pop("lease_until", None)
+    job["kind"] = "ocr" if job.pop("priority") == PRIORITY_OCR else "text"
+    return job
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    if "file" not in request.files:
+        return jsonify({"error": "No file part in request"}), 400
+    file = request.files["file"]
+    if file.filename == "":
+        return jsonify({"error": "No selected file"}), 400
+
+    data = file.read()
+    sha = digest(data)
+    # content-addressed name: concurrent jobs for same-named files never clobber each other
+    save_path = os.path.join(UPLOAD_FOLDER, f"{sha[:16]}_{os.path.basename(file.filename)}")
+    with span("save"), open(save_path, "wb") as f:
+        f.write(data)
+
+    priority = PRIORITY_OCR if probe_needs_ocr(save_path) else PRIORITY_TEXT
+    kind, _ = matches_kind()
+    job, deduplicated = job_queue.submit({"sha": sha, "path": save_path, "filename": file.filename},
+                                         priority=priority, dedup_key=f"{sha}:{kind}")
+    body = public_job(job)
+    body["deduplicated"] = deduplicated
+    body["status_url"] = f"/jobs/{job['id']}"
+    body["events_url"] = f"/jobs/{job['id']}/events"
+    return jsonify(body), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(public_job(job))
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-sent events: one ``status`` event per change, ending with ``done`` or ``failed``."""
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def stream():
+        last = None
+        while True:
+            job = public_job(job_queue.get(job_id))
+            state = (job["status"], job.get("queue_position"))
+            if state != last:
+                last = state
+                yield f"event: {job['status'] if job['status'] in FINAL_STATES else 'status'}\n" \
+                      f"data: {json.dumps(job)}\n\n"
+            if job["status"] in FINAL_STATES:
+                return
+            time.sleep(0.5)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/jobs", methods=["GET"])
+def jobs_overview():
+    return jsonify(job_queue.stats())
+
 # ----------------------------------------------
 # File download route
 # ----------------------------------------------
@@ -133,6 +207,31 @@ def list_files():
     files = os.listdir(UPLOAD_FOLDER)
     return jsonify({"files": files})
 
+# ----------------------------------------------
+# Runtime stats (embedding batcher + upload cache)
+# ----------------------------------------------
+@app.route("/stats", methods=["GET"])
+def stats():
+    encoder = services.encoder if services.ready.is_set() else None
+    index = services.index if services.ready.is_set() else None
+    return jsonify({
+        "embedding": encoder.stats() if hasattr(encoder, "stats") else None,
+        "upload_cache": upload_cache.stats(),
+        "query_cache": index.stats() if hasattr(index, "stats") else None,
+    })
+
+# ----------------------------------------------
+# Liveness / readiness (warm-up finished, model + index loaded)
+# ----------------------------------------------
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    status = services.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+
 # ----------------------------------------------
 # Run app
 # ----------------------------------------------
@@ -0,0 +1,12 @@
+import os
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Serving index and embedding model
+# ----------------------------------------------
+# Shared by the Flask app (services.py) and the offline scripts, which use
+# them as defaults without importing the app's model / index singletons.
+load_dotenv()
+INDEX_NAME = os.getenv("APP_INDEX", "legal-cases")
+EMBED_MODEL = os.getenv("APP_EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_DIMENSION = int(os.getenv("APP_EMBED_DIMENSION", "384"))  # all-MiniLM-L6-v2
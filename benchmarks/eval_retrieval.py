@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import tempfile
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+import vector_store
+from vector_store import LocalIndex, FAISS_INDEX_TYPE, FAISS_QUANTIZATION, FAISS_NPROBE, FAISS_EF_SEARCH
+from encoder import load_encoder, ENCODER_BACKEND
+from chunk_retrieval import RETRIEVAL_MODE, CHUNK_CANDIDATES, chunk_id, search_documents
+from reduction import Projection
+from app_config import EMBED_MODEL
+from run_benchmarks import percentiles, git_commit
+from synthetic_corpus import TOPICS, synthetic_judgment
+
+# ----------------------------------------------
+# Retrieval quality vs. latency over labeled pairs
+# ----------------------------------------------
+# Each anchor is a query; its positives (train_similarity.py CSV format) are
+# the relevant documents among all positives (plus optional distractors).
+# Every configuration is served from a throwaway LocalIndex, and embeddings
+# are cached on disk, so re-running a sweep only pays for the search.
+
+EVAL_CACHE_DIR = os.getenv("EVAL_CACHE_DIR", os.path.join(ROOT, "cache", "eval"))
+CONFIG_KEYS = ("name", "model", "backend", "mode", "index_type", "quantization", "nprobe", "ef_search", "dim",
+               "reduction")
+DEFAULT_SWEEP = [
+    {"index_type": "flat"},
+    {"index_type": "hnsw"},
+    {"index_type": "ivf"},
+    {"index_type": "flat", "quantization": "int8"},
+    {"index_type": "flat", "quantization": "binary"},
+]
+
+
+# ---------- labeled data ----------
+def load_labeled(csv_path):
+    """Unique anchors as queries, unique positives as documents, and each query's relevant doc IDs."""
+    from train_similarity import load_rows
+    docs, queries, relevant = {}, {}, []
+    for anchor, positive, _ in load_rows(csv_path):
+        doc = docs.setdefault(positive, f"d{len(docs)}")
+        if anchor not in queries:
+            queries[anchor] = len(relevant)
+            relevant.append(set())
+        relevant[queries[anchor]].add(doc)
+    return {"doc_ids": list(docs.values()), "doc_texts": list(docs), "queries": list(queries),
+            "relevant": relevant}
+
+
+def synthetic_pairs(path, n_cases=300, pages=3, seed=7):
+    """A pairs CSV from synthetic judgments: one paragraph is the anchor, the rest of the judgment the positive."""
+    import csv
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["anchor", "positive"])
+        for i in range(n_cases):
+            lines, _ = synthetic_judgment(rng, topics[i % len(topics)], pages)
+            paragraphs = [p.strip() for p in " ".join(l or "\n" for l in lines).split("\n") if p.strip()]
+            pick = rng.randrange(1, len(paragraphs))
+            writer.writerow([paragraphs[pick], "\n".join(p for j, p in enumerate(paragraphs) if j != pick)])
+    return path
+
+
+def add_distractors(data, corpus_dir, limit):
+    """Unlabeled judgments from a text-shard corpus (corpus_shards.py) that compete with the positives."""
+    from corpus_shards import iter_documents
+    added = 0
+    for doc_id, text, _ in iter_documents(corpus_dir):
+        if added >= limit:
+            break
+        data["doc_ids"].append(f"x-{doc_id}")
+        data["doc_texts"].append(text)
+        added += 1
+    return added
+
+
+# ---------- embeddings (cached between runs) ----------
+_encoders = {}
+
+
+def encode_cached(model_name, backend, texts, batch_size, cache_dir=EVAL_CACHE_DIR):
+    """Vectors for ``texts`` plus the encode stats; reused from disk when model, backend and texts match."""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    key = hashlib.sha1(json.dumps([model_name, backend, digest.hexdigest()]).encode("utf-8")).hexdigest()[:20]
+    safe = model_name.strip("/").replace("/", "__")
+    path = os.path.join(cache_dir, f"{safe}-{backend}-{key}.npz")
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as data:
+            return data["vectors"], {**json.loads(str(data["stats"])), "cached": True}
+    if (model_name, backend) not in _encoders:
+        _encoders[(model_name, backend)] = load_encoder(model_name, backend=backend)
+    model = _encoders[(model_name, backend)]
+    model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm-up
+    t0 = time.perf_counter()
+    vectors = np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                      show_progress_bar=False), dtype="float32")
+    wall = time.perf_counter() - t0
+    stats = {"texts": len(texts), "encode_sec": round(wall, 3), "texts_per_sec": round(len(texts) / wall, 2)}
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(path, vectors=vectors, stats=np.array(json.dumps(stats)))
+    return vectors, {**stats, "cached": False}
+
+
+def units(ids, texts, mode):
+    """``(vector_ids, owner_positions, texts)``: one unit per document, or one per chunk."""
+    if mode != "chunk":
+        return list(ids), list(range(len(texts))), list(texts)
+    from chunker import chunk_text
+    vids, owners, out = [], [], []
+    for pos, (doc, text) in enumerate(zip(ids, texts)):
+        for i, chunk in enumerate(chunk_text(text) or [text]):
+            vids.append(chunk_id(doc, i))
+            owners.append(pos)
+            out.append(chunk)
+    return vids, owners, out
+
+
+# ---------- metrics ----------
+def score_ranking(ranked, relevant, k):
+    ranked = ranked[:k]
+    hits = [1 if doc in relevant else 0 for doc in ranked]
+    first = next((i for i, h in enumerate(hits) if h), None)
+    dcg = sum(h / np.log2(i + 2) for i, h in enumerate(hits))
+    ideal = sum(1 / np.log2(i + 2) for i in range(min(len(relevant), k)))
+    return {"recall": sum(hits) / len(relevant), "mrr": 0.0 if first is None else 1 / (first + 1),
+            "ndcg": dcg / ideal if ideal else 0.0}
+
+
+def pareto(rows, objective, costs=("p50_ms", "index_mb")):
+    """Flag rows no other row beats on ``objective`` and every cost at once."""
+    for r in rows:
+        r["pareto"] = "error" not in r and not any(
+            "error" not in o and o is not r and o[objective] >= r[objective]
+            and all(o[c] <= r[c] for c in costs)
+            and (o[objective] > r[objective] or any(o[c] < r[c] for c in costs))
+            for o in rows)
+    return rows
+
+
+# ---------- one configuration ----------
+def parse_config(spec):
+    cfg = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        key, _, value = part.partition("=")
+        if key not in CONFIG_KEYS:
+            raise ValueError(f"❌ Unknown config key '{key}' (use {', '.join(CONFIG_KEYS)})")
+        cfg[key] = int(value) if key in ("nprobe", "ef_search", "dim") else value
+    return cfg
+
+
+def resolve(cfg, args):
+    cfg = {"model": args.model, "backend": ENCODER_BACKEND, "mode": RETRIEVAL_MODE, "index_type": FAISS_INDEX_TYPE,
+           "quantization": FAISS_QUANTIZATION, "nprobe": FAISS_NPROBE, "ef_search": FAISS_EF_SEARCH, "dim": 0,
+           "reduction": "pca", **cfg}
+    if "name" not in cfg:
+        parts = [cfg["model"].split("/")[-1], cfg["backend"], cfg["mode"], cfg["index_type"], cfg["quantization"]]
+        if cfg["index_type"] == "ivf":
+            parts.append(f"nprobe{cfg['nprobe']}")
+        elif cfg["index_type"] == "hnsw":
+            parts.append(f"ef{cfg['ef_search']}")
+        if cfg["dim"]:
+            parts.append(f"{cfg['reduction']}{cfg['dim']}")
+        cfg["name"] = "/".join(parts)
+    return cfg
+
+
+def run_config(cfg, data, k, batch_size, workdir):
+    doc_vids, doc_owner, doc_texts = units(data["doc_ids"], data["doc_texts"], cfg["mode"])
+    query_ids = [f"q{i}" for i in range(len(data["queries"]))]
+    _, query_owner, query_texts = units(query_ids, data["queries"], cfg["mode"])
+    doc_vecs, doc_stats = encode_cached(cfg["model"], cfg["backend"], doc_texts, batch_size)
+    query_vecs, query_stats = encode_cached(cfg["model"], cfg["backend"], query_texts, batch_size)
+
+    if cfg["dim"]:
+        rng = np.random.default_rng(0)
+        sample = doc_vecs[rng.choice(len(doc_vecs), size=min(50000, len(doc_vecs)), replace=False)]
+        projection = Projection.fit(sample, cfg["dim"], cfg["reduction"])
+        doc_vecs, query_vecs = projection.apply(doc_vecs), projection.apply(query_vecs)
+
+    # FAISS search-time knobs are read from vector_store at build time
+    saved = vector_store.FAISS_NPROBE, vector_store.FAISS_EF_SEARCH
+    vector_store.FAISS_NPROBE, vector_store.FAISS_EF_SEARCH = cfg["nprobe"], cfg["ef_search"]
+    try:
+        name = hashlib.sha1(cfg["name"].encode("utf-8")).hexdigest()[:12]
+        idx = LocalIndex(name, root=workdir, dimension=doc_vecs.shape[1], index_type=cfg["index_type"],
+                         quantization=cfg["quantization"])
+        t0 = time.perf_counter()
+        for i in range(0, len(doc_vecs), 1000):
+            idx.upsert(vectors=[(vid, vec, {}) for vid, vec in zip(doc_vids[i:i + 1000], doc_vecs[i:i + 1000])])
+        idx.persist()
+        # reopen so quantized modes serve from the memory-mapped float store, as in production
+        idx = LocalIndex(name, root=workdir, index_type=cfg["index_type"], quantization=cfg["quantization"])
+        per_query = [[] for _ in query_ids]
+        for row, owner in enumerate(query_owner):
+            per_query[owner].append(row)
+
+        def search(rows):
+            if cfg["mode"] == "chunk":
+                hits = search_documents(idx, query_vecs[rows], top_k=k, candidates=max(CHUNK_CANDIDATES, k))
+                return [h["doc_id"] for h in hits]
+            return [m["id"] for m in idx.query(vector=query_vecs[rows[0]], top_k=k)["matches"]]
+
+        search(per_query[0])  # builds the FAISS structure outside the timing
+        build_sec = time.perf_counter() - t0
+        latencies, scores = [], []
+        for rows, relevant in zip(per_query, data["relevant"]):
+            s0 = time.perf_counter()
+            ranked = search(rows)
+            latencies.append((time.perf_counter() - s0) * 1000)
+            scores.append(score_ranking(ranked, relevant, k))
+        footprint = idx.memory_footprint()
+    finally:
+        vector_store.FAISS_NPROBE, vector_store.FAISS_EF_SEARCH = saved
+
+    lat = percentiles(latencies)
+    return {
+        "config": cfg["name"],
+        f"recall@{k}": round(float(np.mean([s["recall"] for s in scores])), 4),
+        f"mrr@{k}": round(float(np.mean([s["mrr"] for s in scores])), 4),
+        f"ndcg@{k}": round(float(np.mean([s["ndcg"] for s in scores])), 4),
+        "p50_ms": lat["p50_ms"],
+        "p99_ms": lat["p99_ms"],
+        "encode_docs_per_sec": doc_stats["texts_per_sec"],
+        "encode_queries_per_sec": query_stats["texts_per_sec"],
+        "embeddings_cached": doc_stats["cached"] and query_stats["cached"],
+        "index_mb": round(footprint["index_bytes"] / 2 ** 20, 2),
+        "float_store_mb": round(footprint["float_store_bytes"] / 2 ** 20, 2),
+        "vectors": len(doc_vids),
+        "dim": int(doc_vecs.shape[1]),
+        "build_sec": round(build_sec, 2),
+        "settings": cfg,
+    }
+
+
+def print_table(rows, k, objective):
+    cols = [(f"recall@{k}", 10), (f"mrr@{k}", 9), (f"ndcg@{k}", 9), ("p50_ms", 9), ("p99_ms", 9),
+            ("index_mb", 10), ("encode_docs_per_sec", 10)]
+    width = max([len(r["config"]) for r in rows] + [6]) + 2
+    print(f"\n  {'config':<{width}}" + "".join(f"{c.replace('encode_docs_per_sec', 'docs/s'):>{w}}" for c, w in cols))
+    for r in sorted(rows, key=lambda r: -r.get(objective, -1)):
+        if "error" in r:
+            print(f"  {r['config']:<{width}}  ❌ {r['error']}")
+            continue
+        print(f"{'★ ' if r['pareto'] else '  '}{r['config']:<{width}}" + "".join(f"{r[c]:>{w}}" for c, w in cols))
+    print(f"\n★ = Pareto-optimal on {objective} vs p50 latency and index memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality vs. latency over labeled anchor/positive pairs.")
+    parser.add_argument("--csv", help="Pairs CSV (anchor,positive) as used by train_similarity.py")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic pairs instead")
+    parser.add_argument("--distractors", help="Text-shard corpus dir whose judgments are added as distractors")
+    parser.add_argument("--max-distractors", type=int, default=10000)
+    parser.add_argument("--config", action="append", default=[],
+                        help="key=value,... with keys " + ", ".join(CONFIG_KEYS) + " (repeatable)")
+    parser.add_argument("--configs", help="JSON file with a list of config objects")
+    parser.add_argument("--model", default=EMBED_MODEL, help="Default model for configs that don't set one")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--objective", default="ndcg", choices=["recall", "mrr", "ndcg"])
+    parser.add_argument("--limit", type=int, default=0, help="Evaluate at most this many queries")
+    parser.add_argument("--out", help="Results JSON (default benchmarks/results/eval-<timestamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="echo-eval-")
+    try:
+        csv_path = args.csv or synthetic_pairs(os.path.join(workdir, "pairs.csv"), args.synthetic or 300)
+        data = load_labeled(csv_path)
+        if args.limit:
+            data["queries"], data["relevant"] = data["queries"][:args.limit], data["relevant"][:args.limit]
+        if args.distractors:
+            print(f"➕ {add_distractors(data, args.distractors, args.max_distractors):,} distractor judgments")
+        print(f"📊 {len(data['queries']):,} queries over {len(data['doc_ids']):,} documents, k={args.k}")
+
+        configs = [parse_config(c) for c in args.config]
+        if args.configs:
+            with open(args.configs, encoding="utf-8") as f:
+                configs += json.load(f)
+        configs = [resolve(c, args) for c in (configs or DEFAULT_SWEEP)]
+
+        rows = []
+        for cfg in configs:
+            print(f"⏱️ {cfg['name']}...")
+            try:
+                rows.append(run_config(cfg, data, args.k, args.batch_size, workdir))
+                print(f"   ndcg@{args.k} {rows[-1][f'ndcg@{args.k}']}, p50 {rows[-1]['p50_ms']} ms")
+            except Exception as e:
+                rows.append({"config": cfg["name"], "error": repr(e), "settings": cfg})
+                print(f"❌ {cfg['name']} failed: {e}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    objective = f"{args.objective}@{args.k}"
+    pareto(rows, objective)
+    print_table(rows, args.k, objective)
+
+    results = {"meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "cpus": os.cpu_count(), "args": vars(args), "queries": len(data["queries"]),
+                        "documents": len(data["doc_ids"])},
+               "rows": rows}
+    out = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                   f"eval-{time.strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n✅ Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_corpus import generate_corpus
+
+# ----------------------------------------------
+# End-to-end benchmark suite
+# ----------------------------------------------
+# Every stage runs against a throwaway local FAISS store in a temp dir, so
+# the suite never touches Pinecone or the real index. Project modules are
+# imported only after the environment below is set.
+
+STAGES = ["extract", "pdf_to_text", "chunk", "encode", "index", "pipeline", "load"]
+BENCH_INDEX = "bench-cases"
+
+
+def percentiles(values_ms):
+    import numpy as np
+    if not values_ms:
+        return {}
+    arr = np.asarray(values_ms)
+    return {"p50_ms": round(float(np.percentile(arr, 50)), 3), "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3), "max_ms": round(float(arr.max()), 3)}
+
+
+def timed_map(fn, items):
+    """Run ``fn`` over ``items``; returns ``(results, per_item_ms, errors, wall_sec)``."""
+    results, latencies, errors = [], [], 0
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        try:
+            results.append(fn(item))
+        except Exception as e:
+            errors += 1
+            results.append(None)
+            print(f"   ⚠️ {getattr(fn, '__name__', 'stage')} failed on {item}: {e}")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return results, latencies, errors, time.perf_counter() - start
+
+
+def stage_result(items, wall, latencies=None, errors=0, **extra):
+    out = {"items": items, "wall_sec": round(wall, 3), "items_per_sec": round(items / wall, 2) if wall else None,
+           "errors": errors}
+    out.update(percentiles(latencies or []))
+    out.update(extra)
+    return out
+
+
+# ---------- individual stages ----------
+def bench_extract(ctx):
+    from pdf_extract import extract_pdf_text
+    out = {}
+    for kind in ("text", "scan"):
+        paths = [c["abspath"] for c in ctx["cases"] if c["kind"] == kind]
+        if not paths:
+            continue
+        texts, lat, errors, wall = timed_map(extract_pdf_text, paths)
+        if kind == "text":
+            ctx["texts"] = [t for t in texts if t]
+        out[kind] = stage_result(len(paths), wall, lat, errors,
+                                 empty=sum(1 for t in texts if not t),
+                                 chars=sum(len(t) for t in texts if t))
+    return out
+
+
+def bench_pdf_to_text(ctx):
+    from utils import pdf_to_text
+    paths = [c["abspath"] for c in ctx["cases"] if c["kind"] == "text"]
+    texts, lat, errors, wall = timed_map(pdf_to_text, paths)
+    return stage_result(len(paths), wall, lat, errors, chars=sum(len(t) for t in texts if t))
+
+
+def bench_chunk(ctx):
+    from utils import chunk_document
+    texts = ctx.get("texts") or []
+    chunked, lat, errors, wall = timed_map(chunk_document, texts)
+    ctx["chunks"] = [c for doc in chunked if doc for c in doc]
+    return stage_result(len(texts), wall, lat, errors, chunks=len(ctx["chunks"]))
+
+
+def bench_encode(ctx):
+    from encoder import load_encoder, ENCODER_BACKEND
+    t0 = time.perf_counter()
+    model = load_encoder(ctx["model"])
+    load_sec = time.perf_counter() - t0
+    chunks = ctx.get("chunks") or ["warm-up"]
+    model.encode(chunks[:8], show_progress_bar=False)  # exclude first-call overhead
+    t0 = time.perf_counter()
+    vectors = model.encode(chunks, batch_size=ctx["batch_size"], convert_to_numpy=True, show_progress_bar=False)
+    wall = time.perf_counter() - t0
+    ctx["model_obj"] = model
+    ctx["vectors"] = vectors
+    single = []
+    for text in chunks[:min(50, len(chunks))]:
+        s0 = time.perf_counter()
+        model.encode(text, show_progress_bar=False)
+        single.append((time.perf_counter() - s0) * 1000)
+    return stage_result(len(chunks), wall, single, backend=ENCODER_BACKEND, model_load_sec=round(load_sec, 3),
+                        batch_size=ctx["batch_size"], latency_is="single-text encode")
+
+
+def bench_index(ctx):
+    import numpy as np
+    from vector_store import LocalIndex, FAISS_INDEX_TYPE, FAISS_QUANTIZATION
+    vectors = ctx.get("vectors")
+    if vectors is None or not len(vectors):
+        return {"skipped": "no vectors (encode stage did not run)"}
+    workdir = tempfile.mkdtemp(dir=ctx["workdir"])
+    idx = LocalIndex("stage-index", root=workdir, dimension=vectors.shape[1])
+    records = [(f"c{i}", v, {"n": i}) for i, v in enumerate(vectors)]
+    t0 = time.perf_counter()
+    for i in range(0, len(records), 100):
+        idx.upsert(vectors=records[i:i + 100])
+    idx.persist()
+    upsert_wall = time.perf_counter() - t0
+
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), size=min(200, len(vectors)), replace=False)]
+    lat = []
+    t0 = time.perf_counter()
+    for q in queries:
+        s0 = time.perf_counter()
+        idx.query(vector=q.tolist(), top_k=10)
+        lat.append((time.perf_counter() - s0) * 1000)
+    query_wall = time.perf_counter() - t0
+    return {"index_type": FAISS_INDEX_TYPE, "quantization": FAISS_QUANTIZATION,
+            "upsert": stage_result(len(records), upsert_wall),
+            "query": stage_result(len(queries), query_wall, lat, top_k=10)}
+
+
+def bench_pipeline(ctx):
+    import reindex_cases
+    from vector_store import get_index, flush
+    from ingest_manifest import IngestManifest, incremental_ingest
+    from chunk_retrieval import RETRIEVAL_MODE
+    index = get_index(BENCH_INDEX, dimension=ctx["dimension"])
+    manifest = IngestManifest(BENCH_INDEX)
+    pdfs = reindex_cases.collect_pdfs(ctx["corpus"])
+    model = ctx.get("model_obj")
+
+    def make_encode_fn():
+        from encoder import load_encoder
+        encoder = model or load_encoder(ctx["model"])
+        return lambda texts: encoder.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                            show_progress_bar=False)
+
+    t0 = time.perf_counter()
+    report, plan = incremental_ingest(index, manifest, pdfs, ctx["corpus"], reindex_cases.extract_units,
+                                      make_encode_fn, ctx["model"], RETRIEVAL_MODE, full=True)
+    flush(index)
+    wall = time.perf_counter() - t0
+    # a second run over the unchanged corpus measures the manifest's no-op cost
+    t0 = time.perf_counter()
+    incremental_ingest(index, manifest, pdfs, ctx["corpus"], reindex_cases.extract_units,
+                       make_encode_fn, ctx["model"], RETRIEVAL_MODE)
+    noop = time.perf_counter() - t0
+    manifest.close()
+    return stage_result(len(pdfs), wall, retrieval_mode=RETRIEVAL_MODE, noop_rerun_sec=round(noop, 3),
+                        report=report)
+
+
+def bench_load(ctx):
+    import app as app_module
+    client_app = app_module.app
+    files = [c["abspath"] for c in ctx["cases"] if c["kind"] == "text"] or [c["abspath"] for c in ctx["cases"]]
+    payloads = []
+    for path in files:
+        with open(path, "rb") as f:
+            payloads.append((os.path.basename(path), f.read()))
+
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def one_request(_):
+        with counter_lock:
+            n = next(counter)
+        name, data = payloads[n % len(payloads)]
+        if not ctx["warm_cache"]:
+            data = data + b"\n%% bench-%d\n" % n  # unique bytes -> no upload-cache hit
+        s0 = time.perf_counter()
+        with client_app.test_client() as client:
+            resp = client.post("/upload_and_match", data={"file": (io.BytesIO(data), name)},
+                               content_type="multipart/form-data")
+        return (time.perf_counter() - s0) * 1000, resp.status_code
+
+    one_request(0)  # first request pays model / index warm-up
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=ctx["concurrency"]) as pool:
+        results = list(pool.map(one_request, range(ctx["requests"])))
+    wall = time.perf_counter() - t0
+    lat = [ms for ms, _ in results]
+    errors = sum(1 for _, status in results if status != 200)
+    return stage_result(len(results), wall, lat, errors, concurrency=ctx["concurrency"],
+                        warm_cache=ctx["warm_cache"])
+
+
+BENCHES = {"extract": bench_extract, "pdf_to_text": bench_pdf_to_text, "chunk": bench_chunk,
+           "encode": bench_encode, "index": bench_index, "pipeline": bench_pipeline, "load": bench_load}
+
+
+# ---------- results ----------
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            flatten(f"{prefix}.{k}" if prefix else k, v, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(base_path, current):
+    """Print metrics that moved by more than 5% against an earlier results file."""
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    old, new = flatten("", base["stages"], {}), flatten("", current["stages"], {})
+    print(f"\n🔍 vs {base['meta'].get('commit')} ({base_path})")
+    for key in sorted(set(old) & set(new)):
+        if old[key] and abs(new[key] - old[key]) / abs(old[key]) > 0.05:
+            change = (new[key] - old[key]) / abs(old[key]) * 100
+            print(f"   {key:<45}{old[key]:>12}{new[key]:>12}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction, encoding, indexing and serving.")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--cases", type=int, default=40)
+    parser.add_argument("--min-pages", type=int, default=2)
+    parser.add_argument("--max-pages", type=int, default=10)
+    parser.add_argument("--scan-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="Reuse an existing corpus dir instead of generating one")
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=100, help="/upload_and_match requests in the load stage")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warm-cache", action="store_true", help="Let repeat uploads hit the upload cache")
+    parser.add_argument("--out", help="Results JSON (default benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to diff against")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp work dir")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="echo-bench-")
+    # point every store at the temp dir before any project module is imported
+    os.environ.update({
+        "VECTOR_BACKEND": "faiss",
+        "VECTOR_STORE_DIR": os.path.join(workdir, "vector_data"),
+        "LEXICAL_DIR": os.path.join(workdir, "vector_data", "lexical"),
+        "INGEST_MANIFEST_PATH": os.path.join(workdir, "vector_data", "manifest.sqlite"),
+        "UPLOAD_CACHE_DIR": os.path.join(workdir, "cache"),
+        "BULK_DEAD_LETTER": os.path.join(workdir, "dead_letter.jsonl"),
+        "APP_INDEX": BENCH_INDEX,
+        "APP_EMBED_MODEL": args.model,
+        "APP_EMBED_DIMENSION": str(args.dimension),
+        "APP_PRELOAD": "0",
+        "APP_WARMUP": "0",
+    })
+
+    corpus = args.corpus or os.path.join(workdir, "corpus")
+    if args.corpus:
+        with open(os.path.join(corpus, "corpus.json"), encoding="utf-8") as f:
+            cases = json.load(f)["cases"]
+    else:
+        t0 = time.perf_counter()
+        cases = generate_corpus(corpus, args.cases, args.min_pages, args.max_pages, args.scan_fraction, args.seed)
+        print(f"📄 Generated {len(cases)} judgments in {time.perf_counter() - t0:.1f}s")
+    for c in cases:
+        c["abspath"] = os.path.join(corpus, c["path"])
+
+    cwd = os.getcwd()
+    os.chdir(workdir)  # app.py saves uploads relative to the working directory
+    ctx = {"cases": cases, "corpus": corpus, "workdir": workdir, "model": args.model, "dimension": args.dimension,
+           "batch_size": args.batch_size, "requests": args.requests, "concurrency": args.concurrency,
+           "warm_cache": args.warm_cache}
+    results = {
+        "meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "args": vars(args), "corpus": {"cases": len(cases),
+                                                "scan": sum(c["kind"] == "scan" for c in cases),
+                                                "pages": sum(c["pages"] for c in cases)}},
+        "stages": {},
+    }
+    try:
+        for name in args.stages.split(","):
+            print(f"⏱️ {name}...")
+            try:
+                results["stages"][name] = BENCHES[name](ctx)
+            except Exception as e:
+                results["stages"][name] = {"error": repr(e)}
+                print(f"❌ {name} failed: {e}")
+            print(f"   {json.dumps(results['stages'][name], default=str)[:300]}")
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(ROOT, "benchmarks", "results",
+                                   f"{time.strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\n✅ Results written to {out}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+# Pinecone rejects upsert requests above 2 MB; leave headroom for the envelope
+BULK_MAX_BATCH_BYTES = int(os.getenv("BULK_MAX_BATCH_BYTES", str(1_600_000)))
+BULK_MAX_BATCH_VECTORS = int(os.getenv("BULK_MAX_BATCH_VECTORS", "1000"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", "6"))
+BULK_DEAD_LETTER = os.getenv("BULK_DEAD_LETTER", os.path.join("logs", "dead_letter.jsonl"))
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class BulkWriteError(Exception):
+    """Some records could not be written and were sent to the dead-letter file."""
+
+    def __init__(self, failed):
+        super().__init__(f"{len(failed)} record(s) failed; see dead-letter file")
+        self.failed = failed
+
+
+def _status_of(error):
+    for attr in ("status", "status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limited(error):
+    return _status_of(error) == 429 or "too many requests" in str(error).lower()
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = _status_of(error)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    text = str(error).lower()
+    return any(s in text for s in ("429", "timed out", "timeout", "connection", "temporarily", "unavailable"))
+
+
+def _retry_after(error):
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After") or headers.get("retry-after"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def record_size(record):
+    """Approximate JSON payload size of one upsert record in bytes."""
+    if isinstance(record, dict):
+        vid, values, metadata = record["id"], record["values"], record.get("metadata") or {}
+    else:
+        vid, values = record[0], record[1]
+        metadata = record[2] if len(record) > 2 else {}
+    # ~10 bytes per serialized float plus separators
+    return 32 + len(str(vid)) + 11 * len(values) + len(json.dumps(metadata, default=str))
+
+
+class BulkWriter:
+    """
+    Batched, concurrent upsert client for any index with ``upsert(vectors=...)``.
+
+    Batches are cut by payload bytes (and a vector cap), not by count. Each
+    request retries rate-limit and transient errors with exponential backoff
+    and full jitter (honouring ``Retry-After``). The number of requests in
+    flight adapts AIMD-style: halved on a 429, grown back by one after a run
+    of successes. A batch rejected for a non-retryable reason is bisected to
+    isolate the bad records, which go to a JSONL dead-letter file.
+    ``on_written(batch)``, if given, is called (from the sending thread) with
+    each batch once the index has accepted it, e.g. to mirror exactly the
+    written records into an embedding snapshot.
+
+    Use :meth:`write` for a synchronous call, or :meth:`add` / :meth:`close`
+    (or a ``with`` block) to stream records through a background pool.
+    """
+
+    def __init__(self, index, max_batch_bytes=BULK_MAX_BATCH_BYTES, max_batch_vectors=BULK_MAX_BATCH_VECTORS,
+                 concurrency=BULK_CONCURRENCY, max_retries=BULK_MAX_RETRIES, base_delay=0.5, max_delay=30.0,
+                 dead_letter_path=BULK_DEAD_LETTER, on_written=None):
+        self.index = index
+        self.on_written = on_written
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_vectors = max_batch_vectors
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_path = dead_letter_path
+        self._limit = self.concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._gate = threading.Condition()
+        self._dl_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "vectors": 0, "bytes": 0, "retries": 0, "rate_limited": 0, "dead_lettered": 0}
+        self._pending, self._pending_bytes = [], 0
+        self._failed = []  # dead-lettered since the last flush()
+        self._executor = None
+        self._futures = []
+
+    # ---------- adaptive concurrency gate ----------
+    def _acquire(self):
+        with self._gate:
+            while self._in_flight >= self._limit:
+                self._gate.wait()
+            self._in_flight += 1
+
+    def _release(self, rate_limited):
+        with self._gate:
+            self._in_flight -= 1
+            if rate_limited:
+                self._limit = max(1, self._limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= 2 * self._limit and self._limit < self.concurrency:
+                    self._limit += 1
+                    self._successes = 0
+            self._gate.notify_all()
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    # ---------- batching ----------
+    def batches(self, records):
+        """Split records into batches under the byte and vector caps."""
+        batch, size = [], 0
+        for record in records:
+            rsize = record_size(record)
+            if batch and (size + rsize > self.max_batch_bytes or len(batch) >= self.max_batch_vectors):
+                yield batch, size
+                batch, size = [], 0
+            batch.append(record)
+            size += rsize
+        if batch:
+            yield batch, size
+
+    # ---------- one request with retries ----------
+    def _send(self, batch, size):
+        """Upsert one batch; returns ``[(record, error)]`` for records that could not be written."""
+        attempt = 0
+        while True:
+            self._acquire()
+            rate_limited = False
+            try:
+                self.index.upsert(vectors=batch)
+                self._count(requests=1, vectors=len(batch), bytes=size)
+                error = None
+            except Exception as e:
+                error = e
+                rate_limited = is_rate_limited(e)
+            finally:
+                self._release(rate_limited)
+            if error is None:
+                if self.on_written:
+                    self.on_written(batch)
+                return []
+
+            if is_retryable(error) and attempt < self.max_retries:
+                delay = _retry_after(error) or random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self._count(retries=1, rate_limited=int(rate_limited))
+                attempt += 1
+                time.sleep(delay)
+                continue
+            if len(batch) > 1 and not is_retryable(error):
+                # isolate the offending record(s) instead of losing the whole batch
+                mid = len(batch) // 2
+                left, right = batch[:mid], batch[mid:]
+                return (self._send(left, sum(map(record_size, left)))
+                        + self._send(right, sum(map(record_size, right))))
+            return [(record, error) for record in batch]
+
+    def _dead_letter(self, failed):
+        if not failed:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_path)), exist_ok=True)
+        with self._dl_lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for record, error in failed:
+                if not isinstance(record, dict):
+                    record = {"id": record[0], "values": list(record[1]),
+                              "metadata": record[2] if len(record) > 2 else {}}
+                f.write(json.dumps({"time": time.time(), "error": repr(error), "record": record}, default=str) + "\n")
+        self._count(dead_lettered=len(failed))
+        with self._stats_lock:
+            self._failed.extend(record for record, _ in failed)
+        print(f"⚠️ {len(failed)} record(s) written to dead-letter file {self.dead_letter_path}")
+
+    # ---------- public API ----------
+    def write(self, records):
+        """Synchronously write ``records``; raises :class:`BulkWriteError` if any were dead-lettered."""
+        failed = []
+        for batch, size in self.batches(records):
+            failed += self._send(batch, size)
+        self._dead_letter(failed)
+        if failed:
+            raise BulkWriteError(failed)
+
+    def _submit(self, batch, size):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        def run():
+            self._dead_letter(self._send(batch, size))
+
+        # bound queued work so a fast producer can't buffer the whole corpus
+        while len([f for f in self._futures if not f.done()]) >= 2 * self.concurrency:
+            time.sleep(0.01)
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(self._executor.submit(run))
+
+    def add(self, record):
+        """Queue one record; full batches are sent in the background."""
+        rsize = record_size(record)
+        if self._pending and (self._pending_bytes + rsize > self.max_batch_bytes
+                              or len(self._pending) >= self.max_batch_vectors):
+            self._submit(self._pending, self._pending_bytes)
+            self._pending, self._pending_bytes = [], 0
+        self._pending.append(record)
+        self._pending_bytes += rsize
+
+    def add_many(self, records):
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        """
+        Send anything pending and wait for all background requests; returns
+        the records dead-lettered since the previous ``flush``.
+        """
+        if self._pending:
+            self._submit(self._pending, self._pending_bytes)
+            self._pending, self._pending_bytes = [], 0
+        for future in self._futures:
+            future.result()
+        self._futures = []
+        with self._stats_lock:
+            failed, self._failed = self._failed, []
+        return failed
+
+    def close(self):
+        """Send anything pending and wait for all background requests."""
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return self.stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        with self._stats_lock:
+            out = dict(self._stats)
+        out["concurrency_limit"] = self._limit
+        return out
+
+
+# ----------------------------------------------
+# Local fake server for testing the client
+# ----------------------------------------------
+class FakeRateLimitedIndex:
+    """
+    Wraps an index (e.g. a ``LocalIndex``) and behaves like a remote service:
+    adds request latency, enforces a requests-per-second budget with 429s,
+    injects random 503s and rejects oversized payloads with a 400.
+    """
+
+    def __init__(self, index=None, latency=0.05, rps=20, error_rate=0.02, max_bytes=2_000_000):
+        self.index = index
+        self.latency = latency
+        self.rps = rps
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._window = []
+        self.received = 0
+
+    class Error(Exception):
+        def __init__(self, status, message):
+            super().__init__(f"({status}) {message}")
+            self.status = status
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(self.latency)
+        now = time.monotonic()
+        with self._lock:
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rps:
+                raise self.Error(429, "Too Many Requests")
+            self._window.append(now)
+        if random.random() < self.error_rate:
+            raise self.Error(503, "Service Unavailable")
+        if sum(map(record_size, vectors)) > self.max_bytes:
+            raise self.Error(400, "Request payload too large")
+        if self.index is not None:
+            self.index.upsert(vectors=vectors)
+        with self._lock:
+            self.received += len(vectors)
+        return {"upserted_count": len(vectors)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import numpy as np
+    parser = argparse.ArgumentParser(description="Exercise BulkWriter against a local fake rate-limited server.")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--rps", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    fake = FakeRateLimitedIndex(rps=args.rps, latency=args.latency)
+    rng = np.random.default_rng(0)
+    start = time.time()
+    with BulkWriter(fake, dead_letter_path=os.path.join("logs", "fake_dead_letter.jsonl")) as writer:
+        for i in range(args.vectors):
+            writer.add({"id": f"v{i}", "values": rng.standard_normal(args.dim).round(6).tolist(),
+                        "metadata": {"n": i}})
+    elapsed = time.time() - start
+    print(f"✅ {fake.received}/{args.vectors} vectors in {elapsed:.2f}s ({fake.received / elapsed:.0f} vec/s)")
+    print(f"📊 {writer.stats()}")
@@ -0,0 +1,119 @@
+import os
+from collections import defaultdict
+from vector_store import query_many
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+# "document": one vector per judgment (first few hundred tokens only)
+# "chunk": one vector per chunk, hits rolled back up to the judgment
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "document").lower()
+CHUNK_AGGREGATION = os.getenv("CHUNK_AGGREGATION", "maxsim").lower()
+CHUNK_TOP_N = int(os.getenv("CHUNK_TOP_N", "3"))
+CHUNK_CANDIDATES = int(os.getenv("CHUNK_CANDIDATES", "20"))
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "32"))
+
+CHUNK_SEPARATOR = "#chunk-"
+
+
+# ----------------------------------------------
+# Chunk IDs <-> document IDs
+# ----------------------------------------------
+def chunk_id(doc_id, i):
+    return f"{doc_id}{CHUNK_SEPARATOR}{i}"
+
+
+def chunk_prefix(doc_id):
+    """ID prefix shared by every chunk of a document (for ``index.list(prefix=...)``)."""
+    return f"{doc_id}{CHUNK_SEPARATOR}"
+
+
+def doc_id_of(match):
+    """Resolve the parent document of an index match (chunk or whole-document vector)."""
+    metadata = match.get("metadata") or {}
+    if metadata.get("doc_id"):
+        return metadata["doc_id"]
+    return match["id"].split(CHUNK_SEPARATOR, 1)[0]
+
+
+def chunk_units(doc_id, chunks, metadata=None, per_chunk=None):
+    """
+    ``(vector_id, text, metadata)`` for every chunk of a document, before
+    encoding; ``per_chunk`` optionally adds metadata (e.g. page provenance) per chunk.
+    """
+    units = []
+    for i, chunk in enumerate(chunks):
+        meta = dict(metadata or {})
+        if per_chunk:
+            meta.update(per_chunk[i])
+        meta.update({"doc_id": doc_id, "chunk_index": i, "text": chunk})
+        units.append((chunk_id(doc_id, i), chunk, meta))
+    return units
+
+
+def chunk_records(doc_id, chunks, vectors, metadata=None, per_chunk=None):
+    """Build upsert records for every chunk of a document."""
+    records = []
+    for (vid, _, meta), vec in zip(chunk_units(doc_id, chunks, metadata, per_chunk), vectors):
+        records.append({
+            "id": vid,
+            "values": vec.tolist() if hasattr(vec, "tolist") else list(vec),
+            "metadata": meta,
+        })
+    return records
+
+
+def encode_chunks(model, chunks, batch_size=ENCODE_BATCH_SIZE):
+    """Encode all chunks of a document in one batched call."""
+    return model.encode(chunks, batch_size=batch_size, convert_to_numpy=True,
+                        show_progress_bar=False)
+
+
+# ----------------------------------------------
+# Document-level aggregation
+# ----------------------------------------------
+def aggregate_hits(results, method=CHUNK_AGGREGATION, top_n=CHUNK_TOP_N):
+    """
+    Roll per-query-chunk matches up into one score per document.
+
+    ``max``       best single chunk-to-chunk similarity
+    ``mean_top_n`` mean of the document's ``top_n`` best chunk hits
+    ``maxsim``    for each query chunk take its best hit in the document,
+                  then average over all query chunks (missing hits count 0)
+    """
+    per_doc = defaultdict(list)          # doc -> every hit score
+    best_per_query = defaultdict(dict)   # doc -> {query chunk: best score}
+    for qi, res in enumerate(results):
+        for match in res.get("matches", []):
+            doc = doc_id_of(match)
+            score = match.get("score", 0.0)
+            per_doc[doc].append(score)
+            if score > best_per_query[doc].get(qi, float("-inf")):
+                best_per_query[doc][qi] = score
+
+    scores = {}
+    for doc, hits in per_doc.items():
+        if method == "max":
+            scores[doc] = max(hits)
+        elif method == "mean_top_n":
+            top = sorted(hits, reverse=True)[:top_n]
+            scores[doc] = sum(top) / len(top)
+        elif method == "maxsim":
+            scores[doc] = sum(best_per_query[doc].values()) / max(len(results), 1)
+        else:
+            raise ValueError(f"❌ Unknown CHUNK_AGGREGATION '{method}' (use max, mean_top_n or maxsim)")
+    return scores, {doc: len(hits) for doc, hits in per_doc.items()}
+
+
+def search_documents(index, query_vectors, top_k=5, candidates=CHUNK_CANDIDATES,
+                     method=CHUNK_AGGREGATION, filter=None):
+    """
+    Multi-vector search: every query chunk is searched in one batched call,
+    then hits are aggregated per document into a ranked case list.
+    """
+    results = query_many(index, query_vectors, top_k=candidates,
+                         include_metadata=True, filter=filter)
+    scores, hit_counts = aggregate_hits(results, method=method)
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+    return [{"doc_id": doc, "score": score, "matched_chunks": hit_counts[doc]}
+            for doc, score in ranked]
@@ -0,0 +1,236 @@
+import os
+import re
+import string
+import threading
+from collections import namedtuple
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+# Chunk budget in model tokens, including the [CLS]/[SEP] the encoder adds
+# (all-MiniLM-L6-v2 truncates at 256)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+# Trailing sentences (up to this many tokens) repeated at the start of the next chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# Tokenizer used to measure chunks; should match the embedding model
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+# "regex" (fast, legal-abbreviation aware) or "pysbd" (slower, more careful)
+CHUNK_SPLITTER = os.getenv("CHUNK_SPLITTER", "regex").lower()
+# "model": exact counts from the tokenizer; "estimate": several times faster, errs on the long side
+CHUNK_TOKEN_COUNT = os.getenv("CHUNK_TOKEN_COUNT", "model").lower()
+
+SPECIAL_TOKENS = 2  # [CLS] ... [SEP]
+
+Chunk = namedtuple("Chunk", "text n_tokens page_start page_end char_start char_end")
+Chunk.__doc__ = """One chunk; ``char_start`` is an offset into page ``page_start``, ``char_end`` into ``page_end``."""
+
+_Unit = namedtuple("_Unit", "text n_tokens page start end")
+
+
+# ----------------------------------------------
+# Sentence splitting
+# ----------------------------------------------
+# Abbreviations common in Indian judgments that end in "." without ending a sentence
+ABBREVIATIONS = {
+    "no", "nos", "sec", "secs", "s", "ss", "art", "arts", "cl", "r", "o", "ord", "para", "paras", "p", "pp",
+    "v", "vs", "viz", "i.e", "e.g", "etc", "cf", "ibid", "supra", "mr", "mrs", "ms", "dr", "shri", "smt",
+    "sri", "mohd", "km", "kum", "hon'ble", "honble", "j", "jj", "cj", "ltd", "pvt", "co", "corp", "inc", "govt",
+    "dept", "st", "ors", "anr", "vol", "ed", "crl", "cri", "civ", "misc", "app", "appl", "w.p", "s.l.p",
+    "cr.p.c", "i.p.c", "c.p.c", "u/s", "a.i.r", "s.c.c", "scc", "air", "d", "m", "a", "b", "c",
+}
+_BOUNDARY = re.compile(r"[.!?][\"'”’)\]]*\s+")
+
+
+def _regex_sentences(text):
+    """``(start, end)`` spans of sentences in ``text``, skipping abbreviation and numbering dots."""
+    start = 0
+    for m in _BOUNDARY.finditer(text):
+        end = m.end()
+        if text[m.start()] == ".":
+            nxt = text[end:end + 1]
+            if nxt and not (nxt.isupper() or nxt in "(\"'“‘[" or nxt.isdigit()):
+                continue  # lower-case continuation: "... under s. 302 read with ..."
+            dot = m.start()
+            word_start = max(start, text.rfind(" ", start, dot) + 1, text.rfind("\n", start, dot) + 1)
+            word = text[word_start:dot].lstrip("(\"'“‘[").lower()
+            if word in ABBREVIATIONS or word.isdigit() or len(word) <= 1:
+                continue  # "Sec. 302", "No. 5", "2. The appellant", "M. Nagaraj"
+        yield start, m.start() + 1
+        start = end
+    if start < len(text):
+        yield start, len(text)
+
+
+_pysbd = None
+
+
+def _pysbd_sentences(text):
+    global _pysbd
+    if _pysbd is None:
+        import pysbd
+        _pysbd = pysbd.Segmenter(language="en", clean=False, char_span=True)
+    for span in _pysbd.segment(text):
+        yield span.start, span.end
+
+
+def split_sentences(text, splitter=CHUNK_SPLITTER):
+    """Sentence ``(start, end)`` spans with surrounding whitespace trimmed."""
+    spans = _pysbd_sentences(text) if splitter == "pysbd" else _regex_sentences(text)
+    for start, end in spans:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            yield start, end
+
+
+# ----------------------------------------------
+# Token counting
+# ----------------------------------------------
+class _ModelTokens:
+    """Counts with the embedding model's (fast, Rust) tokenizer."""
+
+    def __init__(self, tokenizer):
+        self.backend = tokenizer.backend_tokenizer  # skips BatchEncoding overhead
+
+    def count(self, texts):
+        return [len(enc) for enc in self.backend.encode_batch(texts, add_special_tokens=False)]
+
+    def pieces(self, text):
+        return [(s, e, 1) for s, e in self.backend.encode(text, add_special_tokens=False).offsets]
+
+
+class _ApproxTokens:
+    """
+    Estimated WordPiece counts: words plus punctuation plus one piece per
+    16 characters for words the vocabulary splits. Errs on the long side.
+    """
+    _TOKEN = re.compile(r"\w+|[^\w\s]")
+    _PUNCT = str.maketrans("", "", string.punctuation)
+
+    def count(self, texts):
+        return [len(t.split()) + len(t) - len(t.translate(self._PUNCT)) + len(t) // 16 for t in texts]
+
+    def pieces(self, text):
+        return [(m.start(), m.end(), 1 + (m.end() - m.start()) // 8) for m in self._TOKEN.finditer(text)]
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_token_counter(name=CHUNK_TOKENIZER):
+    global _counter
+    with _counter_lock:
+        if _counter is None and CHUNK_TOKEN_COUNT == "estimate":
+            _counter = _ApproxTokens()
+        if _counter is None:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+                if not tokenizer.is_fast:
+                    raise ValueError("offset mapping needs a fast tokenizer")
+                _counter = _ModelTokens(tokenizer)
+            except Exception as e:
+                print(f"⚠️ Tokenizer {name} unavailable ({e}); chunk sizes are estimated")
+                _counter = _ApproxTokens()
+        return _counter
+
+
+# ----------------------------------------------
+# Chunking
+# ----------------------------------------------
+def _units(pages, counter, splitter):
+    """Sentences of every page with their token counts (one tokenizer call per page)."""
+    for page_no, page in enumerate(pages, start=1):
+        if not page:
+            continue
+        spans = list(split_sentences(page, splitter))
+        if not spans:
+            continue
+        texts = [" ".join(page[s:e].split()) for s, e in spans]
+        for text, n, (s, e) in zip(texts, counter.count(texts), spans):
+            yield _Unit(text, n, page_no, s, e)
+
+
+def _windows(unit, counter, budget, overlap):
+    """Split one over-long sentence into token windows that overlap by ``overlap`` tokens."""
+    pieces = counter.pieces(unit.text)
+    i = 0
+    while i < len(pieces):
+        j, n = i, 0
+        while j < len(pieces) and (n + pieces[j][2] <= budget or j == i):
+            n += pieces[j][2]
+            j += 1
+        # unit.text is whitespace-normalised, so window offsets into the page are approximate
+        yield Chunk(unit.text[pieces[i][0]:pieces[j - 1][1]], n, unit.page, unit.page, unit.start, unit.end)
+        if j >= len(pieces):
+            return
+        back, k = 0, j
+        while k - 1 > i and back + pieces[k - 1][2] <= overlap:
+            k -= 1
+            back += pieces[k][2]
+        i = k
+
+
+def _emit(units):
+    return Chunk(" ".join(u.text for u in units), sum(u.n_tokens for u in units),
+                 units[0].page, units[-1].page, units[0].start, units[-1].end)
+
+
+def chunk_pages(pages, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, splitter=CHUNK_SPLITTER,
+                counter=None):
+    """
+    Pack sentences from an iterable of page texts into chunks of at most
+    ``max_tokens`` model tokens (special tokens included).
+
+    Pages are consumed lazily, so a generator from :func:`utils.iter_pdf_pages`
+    never has to be joined into one string. Each chunk starts with the
+    trailing sentences of the previous one, up to ``overlap_tokens``; a
+    sentence longer than the budget is cut into overlapping token windows.
+    """
+    counter = counter or get_token_counter()
+    budget = max(8, max_tokens - SPECIAL_TOKENS)
+    overlap = max(0, min(overlap_tokens, budget // 2))
+    buf, buf_tokens, fresh = [], 0, 0
+
+    for unit in _units(pages, counter, splitter):
+        if unit.n_tokens > budget:
+            if fresh:
+                yield _emit(buf)
+            yield from _windows(unit, counter, budget, overlap)
+            buf, buf_tokens, fresh = [], 0, 0
+            continue
+        if buf_tokens + unit.n_tokens > budget and fresh:
+            yield _emit(buf)
+            # carry the tail of this chunk over as overlap
+            tail, tail_tokens = [], 0
+            for prev in reversed(buf):
+                if tail_tokens + prev.n_tokens > overlap:
+                    break
+                tail.append(prev)
+                tail_tokens += prev.n_tokens
+            buf, buf_tokens, fresh = tail[::-1], tail_tokens, 0
+        while buf and buf_tokens + unit.n_tokens > budget:
+            buf_tokens -= buf.pop(0).n_tokens  # overlap must give way to new text
+        buf.append(unit)
+        buf_tokens += unit.n_tokens
+        fresh += 1
+
+    if fresh:
+        yield _emit(buf)
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Chunk texts of one document: a string (form feeds split pages) or an iterable of pages."""
+    pages = text.split("\f") if isinstance(text, str) else text
+    return [chunk.text for chunk in chunk_pages(pages, max_tokens, overlap_tokens)]
+
+
+def provenance(chunk):
+    """Per-chunk metadata for the index."""
+    return {"page_start": chunk.page_start, "page_end": chunk.page_end,
+            "char_start": chunk.char_start, "char_end": chunk.char_end, "n_tokens": chunk.n_tokens}
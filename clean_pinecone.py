@@ -1,58 +1,78 @@
 import os
-from pinecone import Pinecone
+import argparse
+from vector_store import get_index, flush, bump_index_version, delete_in_batches
+from chunk_retrieval import CHUNK_SEPARATOR
+from ingest_manifest import IngestManifest
 from dotenv import load_dotenv
 from tqdm import tqdm  # progress bar
 
 # Load environment variables
 load_dotenv()
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX", "legal-cases")
 UPLOADS_DIR = "uploads"
 
-if not PINECONE_API_KEY:
-    raise ValueError("❌ Missing Pinecone API key in .env file")
+parser = argparse.ArgumentParser(description="Delete index vectors whose source PDF no longer exists locally.")
+parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+parser.add_argument("--workers", type=int, default=4, help="Concurrent delete requests")
+args = parser.parse_args()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+# Initialize the vector index (Pinecone or local FAISS)
+index = get_index(INDEX_NAME)
 
 print(f"\n🧹 Fast cleaning Pinecone index: {INDEX_NAME}\n")
 
-# 1️⃣ Collect all local PDF names (without .pdf)
+# 1️⃣ Collect every document ID a local PDF can be indexed under:
+#    reindex_cases.py uses the file name, scripts/index_pdf_cases.py uses "<year folder>_<file name>"
 local_ids = set()
 for root, _, files in os.walk(UPLOADS_DIR):
+    parent = os.path.basename(root)
     for f in files:
         if f.lower().endswith(".pdf"):
-            local_ids.add(os.path.splitext(f)[0])
+            stem = os.path.splitext(f)[0]
+            local_ids.add(stem)
+            local_ids.add(f"{parent}_{stem}")
 
-print(f"📁 Found {len(local_ids)} local PDF files.")
+# Vector IDs recorded by the ingest manifest are always kept
+manifest_ids = IngestManifest(INDEX_NAME).all_vector_ids()
+
+print(f"📁 Found {len(local_ids)} local document IDs, {len(manifest_ids)} vector IDs in the manifest.")
 
 # 2️⃣ Get Pinecone stats
 stats = index.describe_index_stats()
 total_vectors = stats.get("total_vector_count", 0)
 print(f"📊 Pinecone currently has {total_vectors} entries.\n")
 
-# 3️⃣ Fetch all Pinecone IDs (generator)
-print("🔍 Fetching all Pinecone IDs from index (please wait)...")
-all_ids = []
-for ids_page in index.list():  # ✅ yields list of IDs
-    all_ids.extend(ids_page)
-
-print(f"✅ Retrieved {len(all_ids)} IDs from Pinecone.\n")
-
-# 4️⃣ Find IDs that are NOT present locally
-to_delete = [pid for pid in tqdm(all_ids, desc="🧩 Checking IDs") if pid not in local_ids]
-
-# 5️⃣ Delete missing ones in batches
-if to_delete:
-    print(f"\n🗑️ Deleting {len(to_delete)} entries missing locally...")
-    batch_size = 100
-    for i in tqdm(range(0, len(to_delete), batch_size), desc="🧹 Deleting"):
-        batch = to_delete[i:i + batch_size]
-        index.delete(ids=batch)
-    print(f"\n✅ Cleaned {len(to_delete)} invalid vectors successfully.\n")
+
+def is_orphan(vid):
+    if vid in manifest_ids:
+        return False
+    return vid.split(CHUNK_SEPARATOR, 1)[0] not in local_ids
+
+
+# 3️⃣ Stream ID pages from the index and keep only orphans (never materializes the full ID list)
+def orphan_ids():
+    with tqdm(total=total_vectors, desc="🧩 Checking IDs") as progress:
+        for ids_page in index.list():  # ✅ yields list of IDs
+            progress.update(len(ids_page))
+            for vid in ids_page:
+                if is_orphan(vid):
+                    yield vid
+
+
+# 4️⃣ Delete orphans in concurrent batches while the listing is still streaming
+if args.dry_run:
+    orphans = list(orphan_ids())
+    print(f"\n🔎 Dry run: {len(orphans)} entries would be deleted.")
+    for vid in orphans[:20]:
+        print(f"   - {vid}")
 else:
-    print("✅ No missing or invalid files found!\n")
+    deleted = delete_in_batches(index, orphan_ids(), batch_size=100, max_workers=args.workers)
+    if deleted:
+        flush(index)
+        bump_index_version(INDEX_NAME)
+        print(f"\n✅ Cleaned {deleted} invalid vectors successfully.\n")
+    else:
+        print("✅ No missing or invalid files found!\n")
 
-print("🎯 Pinecone index is now fully in sync with your uploads folder.\n")
+    print("🎯 Pinecone index is now fully in sync with your uploads folder.\n")
@@ -0,0 +1,266 @@
+import io
+import os
+import re
+import json
+import gzip
+import sqlite3
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+CORPUS_DIR = os.getenv("CORPUS_DIR", "kaggle_corpus")
+# A new shard is started once the current one reaches this size (compressed)
+CORPUS_SHARD_MB = float(os.getenv("CORPUS_SHARD_MB", "256"))
+CORPUS_WORKERS = int(os.getenv("CORPUS_WORKERS", str(os.cpu_count() or 2)))
+
+PAGE_SEPARATOR = "\n"
+_YEAR = re.compile(r"(?<!\d)(19[5-9]\d|20[0-4]\d)(?!\d)")
+
+
+def year_of(name):
+    """First plausible judgment year (1950-2049) in a member path, e.g. ``1987/xyz.pdf``."""
+    m = _YEAR.search(name)
+    return int(m.group(1)) if m else None
+
+
+def doc_id_of(source, member):
+    base = os.path.splitext(member.replace("\\", "/"))[0].strip("/").replace("/", "_")
+    return base or os.path.splitext(os.path.basename(source))[0]
+
+
+# ----------------------------------------------
+# PDF parsing (runs in worker processes)
+# ----------------------------------------------
+_zips = {}
+
+
+def _read_member(source, member):
+    if member is None:
+        with open(source, "rb") as f:
+            return f.read()
+    zf = _zips.get(source)
+    if zf is None:
+        zf = _zips[source] = zipfile.ZipFile(source)  # one open handle per archive per worker
+    return zf.read(member)
+
+
+def parse_pdf(source, member=None):
+    """Page texts of a PDF inside a zip (``member``) or on disk; ``None`` if unreadable."""
+    from PyPDF2 import PdfReader
+    try:
+        reader = PdfReader(io.BytesIO(_read_member(source, member)))
+        return [page.extract_text() or "" for page in reader.pages]
+    except Exception as e:
+        print(f"❌ Failed {member or source}: {e}")
+        return None
+
+
+# ----------------------------------------------
+# Shard writer / reader
+# ----------------------------------------------
+class CorpusWriter:
+    """
+    Append-only corpus of extracted judgments in gzip-compressed JSONL shards.
+
+    Every document is its own gzip member, so a shard is still one valid
+    ``.jsonl.gz`` stream for sequential readers, while ``index.sqlite``
+    records each document's shard, byte offset and length for random
+    access. Records hold ``doc_id``, ``year``, ``source``, ``text`` and
+    ``page_offsets`` (character offset of each page in ``text``).
+    """
+
+    def __init__(self, root=CORPUS_DIR, shard_max_bytes=CORPUS_SHARD_MB * 1024 * 1024):
+        self.root = root
+        self.shard_max_bytes = shard_max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                year INTEGER,
+                source TEXT,
+                pages INTEGER,
+                chars INTEGER
+            )""")
+        self.db.commit()
+        row = self.db.execute("SELECT shard FROM docs ORDER BY shard DESC LIMIT 1").fetchone()
+        self._shard_no = int(row[0].split("-")[1].split(".")[0]) if row else 0
+        self._file = None
+        self._pending = 0
+
+    def __contains__(self, doc_id):
+        return self.db.execute("SELECT 1 FROM docs WHERE doc_id = ?", (doc_id,)).fetchone() is not None
+
+    def _open(self):
+        while True:
+            name = f"shard-{self._shard_no:05d}.jsonl.gz"
+            path = os.path.join(self.root, name)
+            if not os.path.exists(path) or os.path.getsize(path) < self.shard_max_bytes:
+                break
+            self._shard_no += 1
+        # drop bytes a crash left after the last indexed document, keeping the shard one valid gzip stream
+        end = self.db.execute("SELECT MAX(offset + length) FROM docs WHERE shard = ?", (name,)).fetchone()[0] or 0
+        if os.path.exists(path) and os.path.getsize(path) > end:
+            os.truncate(path, end)
+        self._file = open(path, "ab")
+        self._name = name
+
+    def add(self, doc_id, pages, year=None, source=None):
+        if self._file is None:
+            self._open()
+        offsets, pos = [], 0
+        for page in pages:
+            offsets.append(pos)
+            pos += len(page) + len(PAGE_SEPARATOR)
+        text = PAGE_SEPARATOR.join(pages)
+        record = {"doc_id": doc_id, "year": year, "source": source, "text": text, "page_offsets": offsets}
+        blob = gzip.compress(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n", compresslevel=6)
+        offset = self._file.tell()
+        self._file.write(blob)
+        self.db.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (doc_id, self._name, offset, len(blob), year, source, len(pages), len(text)))
+        self._pending += 1
+        if self._pending >= 200:
+            self.commit()
+        if offset + len(blob) >= self.shard_max_bytes:
+            self.commit()
+            self._file.close()
+            self._file = None
+            self._shard_no += 1
+
+    def commit(self):
+        """Make everything written so far durable (data first, then the index rows pointing at it)."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.db.commit()
+        self._pending = 0
+
+    def close(self):
+        self.commit()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.db.close()
+
+
+class CorpusReader:
+    """Stream or randomly access a corpus written by :class:`CorpusWriter`."""
+
+    def __init__(self, root=CORPUS_DIR):
+        self.root = root
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def shards(self):
+        return [r[0] for r in self.db.execute("SELECT DISTINCT shard FROM docs ORDER BY shard")]
+
+    def __iter__(self):
+        """Documents in shard order, read sequentially (indexed documents only)."""
+        for shard in self.shards():
+            rows = self.db.execute("SELECT offset, length FROM docs WHERE shard = ? ORDER BY offset",
+                                   (shard,)).fetchall()
+            with open(os.path.join(self.root, shard), "rb") as f:
+                for offset, length in rows:
+                    f.seek(offset)
+                    yield json.loads(gzip.decompress(f.read(length)))
+
+    def get(self, doc_id):
+        row = self.db.execute("SELECT shard, offset, length FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return None
+        with open(os.path.join(self.root, row[0]), "rb") as f:
+            f.seek(row[1])
+            return json.loads(gzip.decompress(f.read(row[2])))
+
+    def stats(self):
+        docs, pages, chars = self.db.execute("SELECT COUNT(*), SUM(pages), SUM(chars) FROM docs").fetchone()
+        size = sum(os.path.getsize(os.path.join(self.root, s)) for s in self.shards())
+        return {"documents": docs, "pages": pages or 0, "chars": chars or 0, "shards": len(self.shards()),
+                "bytes": size}
+
+
+# ----------------------------------------------
+# Zip / folder -> shards
+# ----------------------------------------------
+def iter_pdf_sources(paths):
+    """``(source, member)`` for every PDF inside the given zips or under the given folders."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    if name.lower().endswith(".pdf"):
+                        yield full, None
+                    elif name.lower().endswith(".zip"):
+                        yield from iter_pdf_sources([full])
+        elif path.lower().endswith(".zip"):
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                        yield path, info.filename
+        elif path.lower().endswith(".pdf"):
+            yield path, None
+
+
+def convert(paths, root=CORPUS_DIR, workers=CORPUS_WORKERS, progress=None):
+    """
+    Parse every PDF in ``paths`` (zips read in place, never extracted) in a
+    process pool and append the text to the shards under ``root``. Documents
+    already in the corpus are skipped, so an interrupted run just resumes.
+    """
+    writer = CorpusWriter(root)
+    counts = {"converted": 0, "skipped": 0, "failed": 0}
+    max_in_flight = max(1, workers) * 4  # bounded: never holds the whole archive's texts
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            running, submitted = {}, set()
+
+            def drain():
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    doc_id, source, member = running.pop(future)
+                    pages = future.result()
+                    if pages is None:
+                        counts["failed"] += 1
+                    else:
+                        writer.add(doc_id, pages, year=year_of(member or source),
+                                   source=f"{os.path.basename(source)}:{member}" if member else source)
+                        counts["converted"] += 1
+                    if progress:
+                        progress.update(1)
+
+            for source, member in iter_pdf_sources(paths):
+                # loose PDFs: parent folder + name, e.g. 1987/abc.pdf -> 1987_abc
+                doc_id = doc_id_of(source, member or os.path.join(os.path.basename(os.path.dirname(source)),
+                                                                  os.path.basename(source)))
+                if doc_id in submitted or doc_id in writer:
+                    counts["skipped"] += 1
+                    if progress:
+                        progress.update(1)
+                    continue
+                submitted.add(doc_id)
+                running[pool.submit(parse_pdf, source, member)] = (doc_id, source, member)
+                if len(running) >= max_in_flight:
+                    drain()
+            while running:
+                drain()
+    finally:
+        writer.close()
+    return counts
+
+
+def iter_documents(root=CORPUS_DIR):
+    """Stream ``(doc_id, text, record)`` from a shard corpus (for indexers)."""
+    for record in CorpusReader(root):
+        yield record["doc_id"], record["text"], record
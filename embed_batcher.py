@@ -0,0 +1,151 @@
+import os
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+import numpy as np
+from metrics import ENCODE_BATCH_SIZE
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("texts", "single", "future", "enqueued")
+
+    def __init__(self, texts, single):
+        self.texts = texts
+        self.single = single
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching front end for a SentenceTransformer.
+
+    Request threads call :meth:`submit` (or the blocking :meth:`encode`) and
+    get a ``Future``. A single dispatcher thread waits up to ``max_wait_ms``
+    after the first pending request, or until ``max_batch_size`` texts are
+    queued, and runs them through the model as one padded batch. Under
+    concurrency this replaces N batch-size-1 forward passes fighting over
+    the CPU with a few well-filled ones.
+    """
+
+    def __init__(self, model, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._carry = None
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._texts = 0
+        self._max_depth = 0
+        self._wait_total = 0.0
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    # ---------- client side ----------
+    def submit(self, texts):
+        """Queue ``texts`` (a string or list of strings); the future resolves to an ndarray."""
+        single = isinstance(texts, str)
+        req = _Request([texts] if single else list(texts), single)
+        if not req.texts:
+            req.future.set_result(np.zeros((0, self.dimension), dtype="float32"))
+            return req.future
+        self._queue.put(req)
+        depth = self._queue.qsize()
+        with self._lock:
+            self._max_depth = max(self._max_depth, depth)
+        return req.future
+
+    def encode(self, sentences, timeout=None, **kwargs):
+        """Drop-in for ``SentenceTransformer.encode`` (numpy output; batching kwargs are ignored)."""
+        return self.submit(sentences).result(timeout=timeout)
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # ---------- dispatcher ----------
+    def _collect(self):
+        """Block for the first request, then gather more until the size or time limit."""
+        first = self._carry if self._carry is not None else self._queue.get()
+        self._carry = None
+        if first is _STOP:
+            return None
+        batch, n = [first], len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if req is _STOP or n + len(req.texts) > self.max_batch_size:
+                self._carry = req  # goes first in the next batch
+                break
+            batch.append(req)
+            n += len(req.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            batch = [req for req in batch if req.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [t for req in batch for t in req.texts]
+            now = time.monotonic()
+            with self._lock:
+                self._batch_sizes[len(texts)] += 1
+                self._requests += len(batch)
+                self._texts += len(texts)
+                self._wait_total += sum(now - req.enqueued for req in batch)
+            ENCODE_BATCH_SIZE.observe(len(texts))
+            try:
+                vectors = self.model.encode(texts, batch_size=self.max_batch_size,
+                                            convert_to_numpy=True, show_progress_bar=False)
+            except Exception as e:
+                for req in batch:
+                    req.future.set_exception(e)
+                continue
+            offset = 0
+            for req in batch:
+                out = vectors[offset:offset + len(req.texts)]
+                offset += len(req.texts)
+                req.future.set_result(out[0] if req.single else out)
+
+    # ---------- observability ----------
+    def stats(self):
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "batches": batches,
+                "requests": self._requests,
+                "texts": self._texts,
+                "mean_batch_size": self._texts / batches if batches else 0.0,
+                "mean_queue_wait_ms": 1000 * self._wait_total / self._requests if self._requests else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
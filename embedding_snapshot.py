@@ -0,0 +1,376 @@
+import os
+import json
+import time
+import shutil
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.getenv("VECTOR_STORE_DIR", "vector_data"), "snapshots"))
+# Write a snapshot on every ingestion run (reindex_cases.py, scripts/index_pdf_cases.py, indexer.py,
+# scripts/index_kaggle_texts.py)
+EMBEDDING_SNAPSHOT = os.getenv("EMBEDDING_SNAPSHOT", "1") == "1"
+# float16 halves the size; scores change in the 3rd-4th decimal, rankings almost never
+SNAPSHOT_DTYPE = os.getenv("SNAPSHOT_DTYPE", "float16")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+SNAPSHOT_BATCH = int(os.getenv("SNAPSHOT_BATCH", "1000"))
+
+
+def _root(name, root=SNAPSHOT_DIR):
+    return os.path.join(root, name)
+
+
+def _values(vector):
+    return vector["values"] if isinstance(vector, dict) else vector.values
+
+
+def _metadata(vector):
+    meta = vector.get("metadata") if isinstance(vector, dict) else getattr(vector, "metadata", None)
+    return dict(meta or {})
+
+
+# ----------------------------------------------
+# Snapshot reader
+# ----------------------------------------------
+class Snapshot:
+    """
+    One published snapshot: ``vectors.bin`` (memory-mapped ``count x dim``
+    matrix), ``ids.json``, ``metadata.jsonl`` with a row offset table, and
+    ``meta.json`` (model, dimension, dtype, metric, count, index version).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "ids.json"), encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.dimension = self.meta["dimension"]
+        count = self.meta["count"]
+        self.vectors = np.memmap(os.path.join(path, "vectors.bin"), dtype=self.meta["dtype"], mode="r",
+                                 shape=(count, self.dimension)) if count else \
+            np.zeros((0, self.dimension), dtype=self.meta["dtype"])
+        self._offsets = np.fromfile(os.path.join(path, "metadata.idx"), dtype="<u8")
+        self._rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row_of(self, vid):
+        if self._rows is None:
+            self._rows = {v: i for i, v in enumerate(self.ids)}
+        return self._rows.get(vid)
+
+    def metadata(self, row):
+        with open(os.path.join(self.path, "metadata.jsonl"), "rb") as f:
+            f.seek(int(self._offsets[row]))
+            return json.loads(f.readline())
+
+    def iter_batches(self, batch_size=SNAPSHOT_BATCH, with_metadata=True):
+        """``(ids, float32 vectors, metadata list)`` in row order."""
+        meta_file = open(os.path.join(self.path, "metadata.jsonl"), "rb") if with_metadata else None
+        try:
+            for start in range(0, len(self.ids), batch_size):
+                end = min(start + batch_size, len(self.ids))
+                metas = [json.loads(meta_file.readline()) for _ in range(end - start)] if meta_file else None
+                yield self.ids[start:end], np.asarray(self.vectors[start:end], dtype="float32"), metas
+        finally:
+            if meta_file:
+                meta_file.close()
+
+    def search(self, query, top_k=10, metric=None, block_rows=65536):
+        """
+        Exact brute-force search (the ground truth for ANN recall). ``query``
+        is one vector or a ``(q, dim)`` matrix; returns one ``[{id, score}]``
+        list per query vector.
+        """
+        metric = metric or self.meta.get("metric", "cosine")
+        q = np.atleast_2d(np.asarray(query, dtype="float32"))
+        if metric == "cosine":
+            q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        best_scores = np.full((len(q), 0), -np.inf, dtype="float32")
+        best_rows = np.zeros((len(q), 0), dtype="int64")
+        for start in range(0, len(self.ids), block_rows):
+            block = np.asarray(self.vectors[start:start + block_rows], dtype="float32")
+            if metric == "cosine":
+                block = block / np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+            if metric == "euclidean":
+                scores = -(np.sum(block ** 2, axis=1)[None, :] - 2 * q @ block.T + np.sum(q ** 2, axis=1)[:, None])
+            else:
+                scores = q @ block.T
+            scores = np.concatenate([best_scores, scores], axis=1)
+            block_rows_idx = np.broadcast_to(np.arange(start, start + len(block)), (len(q), len(block)))
+            rows = np.concatenate([best_rows, block_rows_idx], axis=1)
+            k = min(top_k, scores.shape[1])
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+        out = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            out.append([{"id": self.ids[rows[i]], "score": float(scores[i])} for i in order])
+        return out
+
+
+def list_versions(name, root=SNAPSHOT_DIR):
+    base = _root(name, root)
+    if not os.path.isdir(base):
+        return []
+    return sorted(d for d in os.listdir(base) if d.startswith("v") and not d.endswith(".building")
+                  and os.path.exists(os.path.join(base, d, "meta.json")))
+
+
+def open_snapshot(name, version=None, root=SNAPSHOT_DIR):
+    """The ``CURRENT`` (or a given) snapshot of an index; ``None`` if there is none."""
+    base = _root(name, root)
+    if version is None:
+        try:
+            with open(os.path.join(base, "CURRENT"), encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+    path = os.path.join(base, version)
+    return Snapshot(path) if os.path.exists(os.path.join(path, "meta.json")) else None
+
+
+# ----------------------------------------------
+# Snapshot writer
+# ----------------------------------------------
+class SnapshotWriter:
+    """
+    Builds a new snapshot version next to the current one and publishes it
+    atomically (``CURRENT`` is switched with ``os.replace``).
+
+    With ``base`` (default: the current snapshot), rows of the base that
+    were neither rewritten nor deleted in this run are carried over on
+    :meth:`close`, so an incremental ingest still yields a complete snapshot.
+    An ID written more than once keeps its last row.
+
+    Used as a context manager it publishes on a clean exit and aborts
+    (removing the ``.building`` directory) on any exception; the published
+    :class:`Snapshot` is then :attr:`snapshot`.
+    """
+
+    def __init__(self, name, model=None, dtype=SNAPSHOT_DTYPE, metric="cosine", root=SNAPSHOT_DIR,
+                 base="current", index_version=None):
+        self.name = name
+        self.model = model
+        self.dtype = np.dtype(dtype).name
+        self.metric = metric
+        self.root = root
+        self.index_version = index_version
+        self.base = open_snapshot(name, root=root) if base == "current" else base
+        if self.base is not None and model and self.base.meta.get("model") not in (None, model):
+            self.base = None  # vectors of another model can't be mixed in
+        self.version = time.strftime("v%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+        self.path = os.path.join(_root(name, root), self.version + ".building")
+        os.makedirs(self.path, exist_ok=True)
+        self.dimension = self.base.dimension if self.base else None
+        self._vectors = open(os.path.join(self.path, "vectors.bin"), "wb")
+        self._meta = open(os.path.join(self.path, "metadata.jsonl"), "wb")
+        self._ids, self._offsets = [], []
+        self._written, self._deleted = set(), set()
+        self._lock = threading.Lock()  # the ingest pipeline upserts from several threads
+        self.changed = False
+        self.snapshot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, ids, vectors, metadatas=None):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype="float32"))
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"❌ Snapshot dimension is {self.dimension}, got {vectors.shape[1]}")
+            self._append(ids, vectors, metadatas or [{}] * len(ids))
+            self._written.update(ids)
+            self._deleted.difference_update(ids)
+            self.changed = True
+
+    def add_records(self, records):
+        """Upsert-style records (``{"id", "values", "metadata"}``)."""
+        if records:
+            self.add([r["id"] for r in records], [r["values"] for r in records],
+                     [r.get("metadata") or {} for r in records])
+
+    def delete(self, ids):
+        ids = set(ids)
+        if ids:
+            with self._lock:
+                self._deleted.update(ids)
+                self.changed = True
+
+    def _append(self, ids, vectors, metadatas):
+        self._vectors.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+        for meta in metadatas:
+            self._offsets.append(self._meta.tell())
+            self._meta.write(json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._ids.extend(ids)
+
+    def _deduplicate(self):
+        """Rewrite this run's rows keeping the last row per ID and dropping IDs deleted afterwards."""
+        last = {vid: row for row, vid in enumerate(self._ids)}
+        keep = sorted(row for vid, row in last.items() if vid not in self._deleted)
+        if len(keep) == len(self._ids):
+            return
+        self._vectors.close()
+        self._meta.close()
+        vectors_path = os.path.join(self.path, "vectors.bin")
+        meta_path = os.path.join(self.path, "metadata.jsonl")
+        vectors = np.memmap(vectors_path, dtype=self.dtype, mode="r", shape=(len(self._ids), self.dimension))
+        offsets = self._offsets + [os.path.getsize(meta_path)]
+        ids, self._ids, self._offsets = self._ids, [], []
+        with open(vectors_path + ".tmp", "wb") as out_vectors, open(meta_path + ".tmp", "wb") as out_meta, \
+                open(meta_path, "rb") as src:
+            for start in range(0, len(keep), SNAPSHOT_BATCH):
+                rows = keep[start:start + SNAPSHOT_BATCH]
+                out_vectors.write(np.ascontiguousarray(vectors[rows]).tobytes())
+                for row in rows:
+                    src.seek(offsets[row])
+                    self._offsets.append(out_meta.tell())
+                    out_meta.write(src.read(offsets[row + 1] - offsets[row]))
+                    self._ids.append(ids[row])
+        del vectors
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._vectors = open(vectors_path, "ab")
+        self._meta = open(meta_path, "ab")
+
+    def close(self):
+        """Carry over untouched base rows and publish; returns the :class:`Snapshot`."""
+        try:
+            return self._publish()
+        except BaseException:
+            self.abort()
+            raise
+
+    def _publish(self):
+        self._deduplicate()
+        if self.base is not None:
+            skip = self._written | self._deleted
+            for ids, vectors, metas in self.base.iter_batches():
+                keep = [i for i, vid in enumerate(ids) if vid not in skip]
+                if keep:
+                    self._append([ids[i] for i in keep], vectors[keep], [metas[i] for i in keep])
+        self._vectors.close()
+        self._meta.close()
+        np.asarray(self._offsets, dtype="<u8").tofile(os.path.join(self.path, "metadata.idx"))
+        with open(os.path.join(self.path, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self._ids, f)
+        meta = {"name": self.name, "model": self.model or (self.base.meta.get("model") if self.base else None),
+                "dimension": self.dimension or 0, "dtype": self.dtype, "metric": self.metric,
+                "count": len(self._ids), "created_at": time.time(), "index_version": self.index_version,
+                "base": os.path.basename(self.base.path) if self.base else None}
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        final = os.path.join(_root(self.name, self.root), self.version)
+        os.replace(self.path, final)
+        current = os.path.join(_root(self.name, self.root), "CURRENT")
+        with open(current + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.version)
+        os.replace(current + ".tmp", current)
+        self._prune()
+        print(f"📸 Embedding snapshot {self.name}/{self.version}: {len(self._ids):,} vectors "
+              f"({self.dimension}d {self.dtype})")
+        self.snapshot = Snapshot(final)
+        return self.snapshot
+
+    def abort(self):
+        for f in (self._vectors, self._meta):
+            f.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _prune(self):
+        for old in list_versions(self.name, self.root)[:-SNAPSHOT_KEEP]:
+            shutil.rmtree(os.path.join(_root(self.name, self.root), old), ignore_errors=True)
+
+
+# ----------------------------------------------
+# Export / import / recall against any vector backend
+# ----------------------------------------------
+def export_index(index, name, model=None, batch_size=SNAPSHOT_BATCH, root=SNAPSHOT_DIR):
+    """Pull every vector out of an index (``list`` + ``fetch``) into a fresh snapshot."""
+    from vector_store import index_version
+    with SnapshotWriter(name, model=model, root=root, base=None, index_version=index_version(name)) as writer:
+        for page in index.list(limit=min(batch_size, 100)):  # Pinecone pages hold at most 100 IDs
+            res = index.fetch(ids=list(page))
+            vectors = res["vectors"] if isinstance(res, dict) else res.vectors
+            if vectors:
+                ids = list(vectors)
+                writer.add(ids, [_values(vectors[v]) for v in ids], [_metadata(vectors[v]) for v in ids])
+    return writer.snapshot
+
+
+def import_snapshot(snapshot, index, batch_size=SNAPSHOT_BATCH):
+    """Bulk-load a snapshot into an index (any backend); returns the writer stats."""
+    from bulk_writer import BulkWriter
+    writer = BulkWriter(index)
+    for ids, vectors, metas in snapshot.iter_batches(batch_size):
+        writer.add_many({"id": vid, "values": vec.tolist(), "metadata": meta}
+                        for vid, vec, meta in zip(ids, vectors, metas))
+    return writer.close()
+
+
+def recall_at_k(index, snapshot, n_queries=200, k=10, seed=0):
+    """ANN recall@k of ``index`` against exact search over the snapshot, using snapshot rows as queries."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(snapshot), size=min(n_queries, len(snapshot)), replace=False)
+    queries = np.asarray(snapshot.vectors[np.sort(rows)], dtype="float32")
+    exact = snapshot.search(queries, top_k=k)
+    hits = total = 0
+    t0 = time.perf_counter()
+    for q, truth in zip(queries, exact):
+        res = index.query(vector=q.tolist(), top_k=k)
+        found = {m["id"] for m in res["matches"]}
+        hits += len(found & {t["id"] for t in truth})
+        total += len(truth)
+    return {"recall": hits / total if total else 0.0, "queries": len(queries), "k": k,
+            "ann_ms_per_query": (time.perf_counter() - t0) * 1000 / max(len(queries), 1)}
+
+
+if __name__ == "__main__":
+    import argparse
+    from vector_store import get_index, flush, bump_index_version
+    parser = argparse.ArgumentParser(description="Embedding snapshots: inspect, export, import, exact search.")
+    parser.add_argument("command", choices=["info", "export", "import", "recall"])
+    parser.add_argument("--name", default=os.getenv("PINECONE_INDEX", "legal-cases"), help="Snapshot / index name")
+    parser.add_argument("--index", help="Target (import) or source (export/recall) index; defaults to --name")
+    parser.add_argument("--backend", help="Vector backend for --index (pinecone / faiss); defaults to VECTOR_BACKEND")
+    parser.add_argument("--version", help="Snapshot version (default: CURRENT)")
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME"))
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    index_name = args.index or args.name
+
+    if args.command == "export":
+        snap = export_index(get_index(index_name, backend=args.backend), args.name, model=args.model)
+        print(json.dumps(snap.meta, indent=2))
+    else:
+        snap = open_snapshot(args.name, args.version)
+        if snap is None:
+            raise SystemExit(f"❌ No snapshot for '{args.name}' under {SNAPSHOT_DIR}")
+        if args.command == "info":
+            print(json.dumps({**snap.meta, "versions": list_versions(args.name)}, indent=2))
+        elif args.command == "import":
+            t0 = time.time()
+            index = get_index(index_name, dimension=snap.dimension, metric=snap.meta.get("metric", "cosine"),
+                              backend=args.backend)
+            stats = import_snapshot(snap, index)
+            flush(index)
+            bump_index_version(index_name)
+            print(f"✅ Imported {len(snap):,} vectors into '{index_name}' in {time.time() - t0:.1f}s: {stats}")
+        else:
+            print(json.dumps(recall_at_k(get_index(index_name, backend=args.backend), snap, k=args.k), indent=2))
@@ -0,0 +1,388 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+# torch | torch-int8 | onnx | onnx-int8
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch").lower()
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", "0"))  # 0 = library default
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join("models", "onnx"))
+ENCODER_MIN_AGREEMENT = float(os.getenv("ENCODER_MIN_AGREEMENT", "0.98"))
+
+# Sample passages used to check an optimized encoder against the original model
+AGREEMENT_SAMPLES = [
+    "The appellant was convicted under Section 302 IPC and sentenced to life imprisonment.",
+    "Whether the High Court erred in reversing the order of acquittal passed by the trial court.",
+    "The writ petition challenges the constitutional validity of the amended provisions.",
+    "Bail granted subject to the accused furnishing a personal bond of Rs. 50,000.",
+    "The land acquisition compensation was enhanced having regard to the market value.",
+    "Article 21 guarantees the right to life and personal liberty to every person.",
+    "The tenant failed to pay arrears of rent despite service of notice under the Act.",
+    "The contract stood frustrated on account of the supervening impossibility of performance.",
+    "Dying declaration recorded by the Magistrate inspires confidence and can be relied upon.",
+    "The assessee claimed deduction under Section 80-IA of the Income Tax Act, 1961.",
+    "Specific performance of the agreement to sell was refused as the plaintiff was not ready and willing.",
+    "The service rules did not permit retrospective promotion of the respondent.",
+]
+
+
+def _set_torch_threads():
+    if ENCODER_THREADS:
+        import torch
+        torch.set_num_threads(ENCODER_THREADS)
+
+
+def _source_dir(model_name):
+    """Local directory holding ``model_name``'s files: the path itself, or its Hugging Face cache snapshot."""
+    if os.path.isdir(model_name):
+        return model_name
+    try:
+        from huggingface_hub import snapshot_download
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        return snapshot_download(repo_id, local_files_only=True)
+    except Exception:
+        return None
+
+
+def source_fingerprint(model_name):
+    """
+    Short hash of the source model's files (relative path, size, mtime), so
+    an export is redone when a fine-tuned model is retrained in place or a
+    hub model is updated. Falls back to the bare name when no local copy is found.
+    """
+    h = hashlib.sha256(model_name.encode("utf-8"))
+    source = _source_dir(model_name)
+    if source:
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                st = os.stat(path)  # follows the hub cache's blob symlinks
+                h.update(f"{os.path.relpath(path, source)}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _cache_dir(model_name, fingerprint):
+    safe = model_name.strip("/").replace("/", "__").replace("\\", "__")
+    return os.path.join(ONNX_CACHE_DIR, f"{safe}-{fingerprint}")
+
+
+def _publish(tmp_dir, out_dir):
+    """Move a finished export into place; a concurrent export of the same source may already be there."""
+    try:
+        os.rename(tmp_dir, out_dir)
+        return
+    except OSError:
+        if not os.path.isdir(out_dir):
+            raise
+    # replace the existing export (e.g. fp32-only, now with int8) without ever exposing a half-written one
+    old = f"{out_dir}.old-{uuid.uuid4().hex[:8]}"
+    try:
+        os.rename(out_dir, old)
+        os.rename(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # another worker swapped first; keep theirs
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def cosine_agreement(reference, candidate):
+    """Row-wise cosine similarity between two embedding matrices."""
+    a = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    b = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+
+# ----------------------------------------------
+# ONNX Runtime encoder
+# ----------------------------------------------
+class OnnxEncoder:
+    """
+    SentenceTransformer-compatible ``encode`` over an exported ONNX graph.
+
+    The graph produces token embeddings; pooling (mean or CLS) and optional
+    L2 normalisation are replayed in NumPy from the original model's config.
+    """
+
+    def __init__(self, model_dir, int8=False, threads=ENCODER_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        with open(os.path.join(model_dir, "encoder.json"), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        path = os.path.join(model_dir, "model.int8.onnx" if int8 else "model.onnx")
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_seq_length = self.config["max_seq_length"]
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dimension"]
+
+    def _encode_batch(self, texts):
+        features = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length,
+                                  return_tensors="np")
+        feeds = {k: v.astype("int64") for k, v in features.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = features["attention_mask"][..., None].astype("float32")
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled.astype("float32")
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False,
+               normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        # length-sorted batches keep padding small, like SentenceTransformer does
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype="float32")
+        for i in range(0, len(texts), batch_size):
+            rows = order[i:i + batch_size]
+            out[rows] = self._encode_batch([texts[r] for r in rows])
+        if normalize_embeddings or self.config["normalize"]:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+
+def _describe(st_model):
+    """Pooling / normalisation settings of a SentenceTransformer pipeline."""
+    from sentence_transformers import models
+    pooling, normalize = "mean", False
+    for module in st_model._modules.values():
+        if isinstance(module, models.Pooling):
+            if module.pooling_mode_cls_token:
+                pooling = "cls"
+            elif not module.pooling_mode_mean_tokens:
+                raise ValueError("❌ Only mean or CLS pooling can be exported to ONNX")
+        elif isinstance(module, models.Normalize):
+            normalize = True
+        elif not isinstance(module, models.Transformer):
+            raise ValueError(f"❌ Unsupported module for ONNX export: {type(module).__name__}")
+    return pooling, normalize
+
+
+def export_onnx(model_name, int8=True, min_agreement=ENCODER_MIN_AGREEMENT, opset=14):
+    """
+    Export ``model_name`` (hub name or local path, e.g. a ``train_similarity.py``
+    output) to ONNX, optionally add an int8 dynamically-quantized copy, and
+    verify both against the original model. Raises if agreement is too low.
+
+    The export is built in a temporary directory and renamed into place, so
+    workers exporting at the same time never read each other's partial files.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    fingerprint = source_fingerprint(model_name)
+    final_dir = _cache_dir(model_name, fingerprint)
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    out_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(final_dir)}.tmp-", dir=ONNX_CACHE_DIR)
+    try:
+        st_model = SentenceTransformer(model_name, device="cpu")
+        st_model.eval()
+        pooling, normalize = _describe(st_model)
+        transformer = st_model._first_module()
+        hf_model, tokenizer = transformer.auto_model, transformer.tokenizer
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+        class _TokenEmbeddings(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs)), return_dict=False)[0]
+
+        fp32_path = os.path.join(out_dir, "model.onnx")
+        dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic["token_embeddings"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(_TokenEmbeddings(hf_model), tuple(sample[n] for n in input_names), fp32_path,
+                              input_names=input_names, output_names=["token_embeddings"],
+                              dynamic_axes=dynamic, opset_version=opset)
+        tokenizer.save_pretrained(out_dir)
+
+        if int8:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(fp32_path, os.path.join(out_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+        config = {
+            "model_name": model_name,
+            "source_fingerprint": fingerprint,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+            "max_seq_length": st_model.max_seq_length,
+            "pooling": pooling,
+            "normalize": normalize,
+            "agreement": {},
+        }
+        with open(os.path.join(out_dir, "encoder.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+        reference = st_model.encode(AGREEMENT_SAMPLES, convert_to_numpy=True)
+        for variant in ([False, True] if int8 else [False]):
+            candidate = OnnxEncoder(out_dir, int8=variant).encode(AGREEMENT_SAMPLES)
+            score = float(cosine_agreement(reference, candidate).min())
+            config["agreement"]["int8" if variant else "fp32"] = score
+            print(f"🔎 ONNX {'int8' if variant else 'fp32'} min cosine agreement: {score:.4f}")
+        with open(os.path.join(out_dir, "encoder.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        # published even when below threshold, so the failed check is cached rather than re-run at every start
+        _publish(out_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise
+
+    failed = {k: v for k, v in config["agreement"].items() if v < min_agreement}
+    if failed:
+        raise ValueError(f"❌ ONNX export of {model_name} below agreement threshold {min_agreement}: {failed}")
+    return final_dir
+
+
+# ----------------------------------------------
+# Backend selection
+# ----------------------------------------------
+def _load_onnx(model_name, int8):
+    fingerprint = source_fingerprint(model_name)
+    out_dir = _cache_dir(model_name, fingerprint)
+    config_path = os.path.join(out_dir, "encoder.json")
+    variant = "int8" if int8 else "fp32"
+    config = None
+    if os.path.exists(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    if (not config or config.get("source_fingerprint") != fingerprint
+            or variant not in config.get("agreement", {})):
+        print(f"🔧 Exporting {model_name} to ONNX ({variant})...")
+        out_dir = export_onnx(model_name, int8=int8)
+    elif config["agreement"][variant] < ENCODER_MIN_AGREEMENT:
+        raise ValueError(f"❌ Cached ONNX {variant} export of {model_name} failed agreement check")
+    return OnnxEncoder(out_dir, int8=int8)
+
+
+def _torch_int8(model_name, model):
+    """
+    ``model`` with int8 dynamic quantization of its Linear layers, or
+    ``model`` itself if the quantized copy disagrees with it. The agreement
+    score is recorded per source fingerprint next to the ONNX exports, so
+    only the first process to start on a given model pays for the check.
+    """
+    import torch
+    fingerprint = source_fingerprint(model_name)
+    path = _cache_dir(model_name, fingerprint) + ".torch-int8.json"
+    score = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        if record.get("source_fingerprint") == fingerprint:
+            score = float(record["agreement"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if score is not None and score < ENCODER_MIN_AGREEMENT:
+        print(f"⚠️ Recorded torch-int8 agreement {score:.4f} < {ENCODER_MIN_AGREEMENT}; using fp32 model")
+        return model
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if score is None:
+        reference = model.encode(AGREEMENT_SAMPLES, convert_to_numpy=True)
+        score = float(cosine_agreement(reference, quantized.encode(AGREEMENT_SAMPLES, convert_to_numpy=True)).min())
+        os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model_name": model_name, "source_fingerprint": fingerprint, "agreement": score}, f, indent=2)
+        os.replace(tmp, path)
+        print(f"🔎 torch-int8 min cosine agreement: {score:.4f}")
+        if score < ENCODER_MIN_AGREEMENT:
+            print(f"⚠️ torch-int8 agreement {score:.4f} < {ENCODER_MIN_AGREEMENT}; using fp32 model")
+            return model
+    return quantized
+
+
+def load_base(model_name, backend=None):
+    """
+    The plain SentenceTransformer weights for ``backend``, with no forward
+    pass, quantization or ORT session: all a gunicorn master may build
+    before forking. ``None`` for the ONNX backends, which need nothing from
+    the PyTorch model once exported.
+    """
+    backend = (backend or ENCODER_BACKEND).lower()
+    if backend in ("onnx", "onnx-int8"):
+        return None
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu" if backend == "torch-int8" else None)
+
+
+def load_encoder(model_name, backend=None, base=None):
+    """
+    Return an object with SentenceTransformer's ``encode`` /
+    ``get_sentence_embedding_dimension`` for ``model_name``.
+
+    ``ENCODER_BACKEND`` picks eager PyTorch (``torch``), PyTorch with int8
+    dynamic quantization of Linear layers (``torch-int8``), or ONNX Runtime
+    (``onnx`` / ``onnx-int8``). Optimized backends that fail to export or
+    to match the original model fall back to ``torch`` with a warning.
+    ``base`` is a model from :func:`load_base` (e.g. preloaded before fork)
+    to build on instead of loading the weights again.
+    """
+    backend = (backend or ENCODER_BACKEND).lower()
+    if backend in ("onnx", "onnx-int8"):
+        try:
+            return _load_onnx(model_name, int8=backend == "onnx-int8")
+        except Exception as e:
+            print(f"⚠️ ONNX encoder unavailable ({e}); falling back to PyTorch")
+            backend = "torch"
+
+    _set_torch_threads()
+    model = base if base is not None else load_base(model_name, backend)
+    if backend == "torch-int8":
+        return _torch_int8(model_name, model)
+    elif backend != "torch":
+        raise ValueError(f"❌ Unknown ENCODER_BACKEND '{backend}' (use torch, torch-int8, onnx or onnx-int8)")
+    return model
+
+
+# ----------------------------------------------
+# CLI: export + throughput comparison
+# ----------------------------------------------
+def _throughput(model, texts, batch_size):
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    model.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export an encoder to ONNX and compare CPU throughput.")
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--texts", type=int, default=512)
+    args = parser.parse_args()
+
+    texts = (AGREEMENT_SAMPLES * (args.texts // len(AGREEMENT_SAMPLES) + 1))[:args.texts]
+    reference = load_encoder(args.model, backend="torch")
+    ref_emb = reference.encode(AGREEMENT_SAMPLES, convert_to_numpy=True)
+    base = None
+    print(f"\n{'backend':<12}{'texts/s':>10}{'speedup':>9}{'min cos':>9}")
+    for name in args.backends.split(","):
+        model = reference if name == "torch" else load_encoder(args.model, backend=name)
+        rate = _throughput(model, texts, args.batch)
+        base = base or rate
+        agreement = float(cosine_agreement(ref_emb, np.asarray(model.encode(AGREEMENT_SAMPLES))).min())
+        print(f"{name:<12}{rate:>10.1f}{rate / base:>8.2f}x{agreement:>9.4f}")
@@ -0,0 +1,33 @@
+import os
+import shutil
+
+# ----------------------------------------------
+# gunicorn -c gunicorn.conf.py app:app
+# ----------------------------------------------
+# The master imports the app once and loads the embedding model; workers are
+# forked from it and share the weights copy-on-write instead of each loading
+# (and holding) their own copy.
+os.environ.setdefault("APP_PRELOAD", "1")
+# workers write their metrics to files here and /metrics sums them; it is
+# emptied before the app (and prometheus_client) is imported by the master
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join("logs", "prometheus"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# threads let the embedding batcher coalesce concurrent requests within a worker
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = os.environ["APP_PRELOAD"] == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    # threads, index clients and connection pools don't survive fork()
+    from services import services
+    services.after_fork()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,29 +1,57 @@
 import os
-from utils import pdf_to_text, chunk_document, get_embeddings
-from pinecone import Pinecone
+from contextlib import nullcontext
+from utils import PINECONE_EMBED_MODEL, iter_pdf_pages, get_embeddings
+from chunker import chunk_pages, provenance
+from vector_store import get_index, flush, bump_index_version
+from chunk_retrieval import chunk_records, chunk_units
+from lexical_index import LEXICAL_INDEX, WrittenUnits, get_lexical_index
+from bulk_writer import BulkWriter
+from embedding_snapshot import EMBEDDING_SNAPSHOT, SnapshotWriter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX")
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+index = get_index(PINECONE_INDEX)
+writer = BulkWriter(index)
+lexical = get_lexical_index(PINECONE_INDEX) if LEXICAL_INDEX else None
+feed = WrittenUnits(lexical) if lexical else None
+snapshot = None
+
+def on_written(batch):
+    # only chunks the index accepted reach the snapshot and BM25
+    if snapshot:
+        snapshot.add_records(batch)
+    if feed:
+        feed.written(batch)
+
+writer.on_written = on_written
 
 def index_pdf(file_path):
     print(f"Indexing: {file_path}")
-    text = pdf_to_text(file_path)
-    chunks = chunk_document(text)
+    pieces = list(chunk_pages(iter_pdf_pages(file_path)))
+    chunks = [c.text for c in pieces]
+    pages = [provenance(c) for c in pieces]
     embeddings = get_embeddings(chunks)
 
-    for i, emb in enumerate(embeddings):
-        vector_id = f"{os.path.basename(file_path)}_{i}"
-        index.upsert(vectors=[(vector_id, emb, {"text": chunks[i]})])
+    doc_id = os.path.splitext(os.path.basename(file_path))[0]
+    records = chunk_records(doc_id, chunks, embeddings, {"filename": os.path.basename(file_path)}, pages)
+    if feed:
+        feed.extracted(chunk_units(doc_id, chunks))
+    writer.add_many(records)  # sent in byte-sized batches in the background
     print("✅ Indexed:", file_path)
 
 if __name__ == "__main__":
     folder = "uploads"
-    for pdf in os.listdir(folder):
-        if pdf.endswith(".pdf"):
-            index_pdf(os.path.join(folder, pdf))
+    # re-upserted documents replace their rows; the rest of the current snapshot is carried over
+    snapshot = SnapshotWriter(PINECONE_INDEX, model=PINECONE_EMBED_MODEL) if EMBEDDING_SNAPSHOT else None
+    with snapshot or nullcontext():
+        for pdf in os.listdir(folder):
+            if pdf.endswith(".pdf"):
+                index_pdf(os.path.join(folder, pdf))
+        print(f"📊 Upsert stats: {writer.close()}")
+    if lexical:
+        lexical.build()
+    flush(index)
+    bump_index_version(PINECONE_INDEX)
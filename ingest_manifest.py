@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import nullcontext
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+INGEST_MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST_PATH",
+    os.path.join(os.getenv("VECTOR_STORE_DIR", "vector_data"), "ingest_manifest.sqlite"))
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _norm(path):
+    return os.path.abspath(path).replace("\\", "/")
+
+
+class IngestManifest:
+    """
+    Persistent record of what has been ingested into an index.
+
+    One row per ``(index, path)`` with the file's size, mtime, SHA-256, the
+    vector IDs written for it and the model / retrieval mode that produced
+    them. :meth:`plan` compares a directory listing against it so a reindex
+    only touches new, changed and removed files.
+    """
+
+    def __init__(self, index_name, path=INGEST_MANIFEST_PATH):
+        self.index_name = index_name
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                index_name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                sha256 TEXT,
+                vector_ids TEXT,
+                model_name TEXT,
+                retrieval_mode TEXT,
+                indexed_at REAL,
+                PRIMARY KEY (index_name, path)
+            )""")
+        self._db.commit()
+
+    def _rows(self, prefix=None):
+        query = "SELECT path, size, mtime, sha256, vector_ids, model_name, retrieval_mode FROM files WHERE index_name = ?"
+        args = [self.index_name]
+        if prefix:
+            # exact prefix match: LIKE would treat "_" / "%" in paths as wildcards and ignore case
+            root = _norm(prefix).rstrip("/") + "/"
+            query += " AND substr(path, 1, ?) = ?"
+            args += [len(root), root]
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        return {r[0]: {"size": r[1], "mtime": r[2], "sha256": r[3], "vector_ids": json.loads(r[4] or "[]"),
+                       "model_name": r[5], "retrieval_mode": r[6]} for r in rows}
+
+    def plan(self, paths, model_name, retrieval_mode, root=None, full=False):
+        """
+        Split ``paths`` into work for this run.
+
+        Returns ``(todo, unchanged, removed)``: files to (re)ingest, the number
+        left alone, and ``{path: vector_ids}`` for manifest entries under
+        ``root`` whose file no longer exists.
+        """
+        known = self._rows(prefix=root)
+        todo, unchanged = [], 0
+        seen = set()
+        for path in paths:
+            key = _norm(path)
+            seen.add(key)
+            row = known.get(key)
+            if full or row is None or row["model_name"] != model_name or row["retrieval_mode"] != retrieval_mode:
+                todo.append(path)
+                continue
+            st = os.stat(path)
+            if st.st_size == row["size"] and st.st_mtime == row["mtime"]:
+                unchanged += 1
+                continue
+            # touched but identical content: refresh the stat fields only
+            if st.st_size == row["size"] and file_sha256(path) == row["sha256"]:
+                self._touch(key, st)
+                unchanged += 1
+                continue
+            todo.append(path)
+        removed = {p: row["vector_ids"] for p, row in known.items() if p not in seen}
+        return todo, unchanged, removed
+
+    def _touch(self, key, st):
+        with self._lock:
+            self._db.execute("UPDATE files SET size = ?, mtime = ? WHERE index_name = ? AND path = ?",
+                             (st.st_size, st.st_mtime, self.index_name, key))
+            self._db.commit()
+
+    def vector_ids(self, path):
+        with self._lock:
+            row = self._db.execute("SELECT vector_ids FROM files WHERE index_name = ? AND path = ?",
+                                   (self.index_name, _norm(path))).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def all_vector_ids(self):
+        """Every vector ID the manifest accounts for in this index."""
+        with self._lock:
+            rows = self._db.execute("SELECT vector_ids FROM files WHERE index_name = ?",
+                                    (self.index_name,)).fetchall()
+        ids = set()
+        for (raw,) in rows:
+            ids.update(json.loads(raw or "[]"))
+        return ids
+
+    def record(self, path, vector_ids, model_name, retrieval_mode, sha256=None):
+        st = os.stat(path)
+        sha256 = sha256 or file_sha256(path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.index_name, _norm(path), st.st_size, st.st_mtime, sha256,
+                 json.dumps(list(vector_ids)), model_name, retrieval_mode, time.time()))
+            self._db.commit()
+
+    def remove(self, path):
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE index_name = ? AND path = ?",
+                             (self.index_name, _norm(path)))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ----------------------------------------------
+# Incremental ingest driver
+# ----------------------------------------------
+def incremental_ingest(index, manifest, paths, root, extract_fn, make_encode_fn, model_name,
+                       retrieval_mode, full=False, **pipeline_kwargs):
+    """
+    Ingest only new or changed files and drop vectors of removed ones.
+
+    ``make_encode_fn`` is only called when there is something to encode, so
+    a no-change run never loads the model. With ``LEXICAL_INDEX`` on, the
+    units the index accepted feed the BM25 index, which is recompiled after
+    any change.
+    With ``EMBEDDING_SNAPSHOT`` on, every vector the index accepted also goes
+    into a new embedding snapshot version (see :mod:`embedding_snapshot`).
+    Returns the pipeline report (or
+    ``None`` if nothing needed ingesting) plus the plan counts.
+    """
+    from vector_store import delete_in_batches
+    from ingest_pipeline import IngestPipeline
+    from bulk_writer import BulkWriter
+    from lexical_index import LEXICAL_INDEX, WrittenUnits, get_lexical_index
+    from embedding_snapshot import EMBEDDING_SNAPSHOT, SnapshotWriter
+
+    lexical = get_lexical_index(manifest.index_name) if LEXICAL_INDEX else None
+    todo, unchanged, removed = manifest.plan(paths, model_name, retrieval_mode, root=root, full=full)
+    print(f"🧾 Manifest: {len(todo)} new/changed, {unchanged} unchanged, {len(removed)} removed")
+    # a full run rebuilds the snapshot from scratch; an incremental one carries the rest over
+    snapshot = SnapshotWriter(manifest.index_name, model=model_name, base=None if full else "current") \
+        if EMBEDDING_SNAPSHOT and (todo or removed) else None
+
+    # published once everything below succeeded; any exception removes the half-built version
+    with snapshot or nullcontext():
+        if removed:
+            stale = [vid for ids in removed.values() for vid in ids]
+            deleted = delete_in_batches(index, stale)
+            if lexical:
+                lexical.delete(stale)
+            if snapshot:
+                snapshot.delete(stale)
+            for path in removed:
+                manifest.remove(path)
+            print(f"🗑️ Deleted {deleted} vectors of {len(removed)} removed files")
+
+        report = None
+        if todo:
+            def on_document(path, vector_ids):
+                # a shorter re-chunked document leaves old trailing chunk IDs behind
+                stale = set(manifest.vector_ids(path)) - set(vector_ids)
+                if stale:
+                    index.delete(ids=list(stale))
+                    if lexical:
+                        lexical.delete(stale)
+                    if snapshot:
+                        snapshot.delete(stale)
+                manifest.record(path, vector_ids, model_name, retrieval_mode)
+
+            def on_skipped(path):
+                stale = manifest.vector_ids(path)
+                if stale:
+                    index.delete(ids=stale)
+                    if lexical:
+                        lexical.delete(stale)
+                    if snapshot:
+                        snapshot.delete(stale)
+                manifest.record(path, [], model_name, retrieval_mode)
+
+            # only records the index accepted reach the snapshot and BM25; dead-lettered ones stay out
+            feed = WrittenUnits(lexical) if lexical else None
+
+            def on_written(batch):
+                if snapshot:
+                    snapshot.add_records(batch)
+                if feed:
+                    feed.written(batch)
+
+            writer = BulkWriter(index, on_written=on_written)
+            pipeline = IngestPipeline(extract_fn=extract_fn, encode_fn=make_encode_fn(),
+                                      upsert_fn=writer.write,
+                                      on_document=on_document, on_skipped=on_skipped,
+                                      on_extracted=(lambda path, units: feed.extracted(units)) if feed else None,
+                                      **pipeline_kwargs)
+            report = pipeline.run(todo)
+    if lexical and (todo or removed or not lexical.available()):
+        lexical.build()
+    return report, {"todo": len(todo), "unchanged": unchanged, "removed": len(removed)}
@@ -0,0 +1,284 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tqdm import tqdm
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 4)))
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "32"))
+UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "100"))
+UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "4"))
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "256"))
+
+_DONE = object()
+
+
+class StageStats:
+    """Item count and busy time for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def add(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def fail(self, items=1):
+        with self._lock:
+            self.failed += items
+
+    def as_dict(self, wall):
+        return {
+            "items": self.items,
+            "failed": self.failed,
+            "busy_sec": round(self.busy, 3),
+            "items_per_sec": round(self.items / wall, 2) if wall else 0.0,
+        }
+
+
+class IngestPipeline:
+    """
+    Three-stage ingestion engine connected by bounded queues:
+
+    1. **extract** — ``extract_fn(path)`` runs in a process pool (PDF parsing
+       is GIL-bound) and returns a list of ``(vector_id, text, metadata)``
+       units; an empty list means "nothing to index".
+    2. **encode** — a single thread buffers units, sorts a window of them by
+       text length and calls ``encode_fn(texts)`` on batches of similar
+       length so padding stays small.
+    3. **upsert** — records are grouped into ``upsert_batch_size`` batches and
+       written by ``upsert_fn(records)`` from a small thread pool.
+
+    Every hand-off is bounded, so a slow stage stalls the ones before it
+    instead of buffering the whole corpus in memory.
+
+    ``on_extracted(path, units)`` sees every file's units as soon as they
+    are extracted (e.g. to feed the lexical index).
+    ``on_document(path, vector_ids)`` is called once every vector of a file
+    has been written, and ``on_skipped(path)`` when a file yields no text;
+    files with a failed extraction or upsert trigger neither, so callers
+    that record progress (e.g. the ingest manifest) retry them next run.
+    """
+
+    def __init__(self, extract_fn, encode_fn, upsert_fn, extract_workers=EXTRACT_WORKERS,
+                 encode_batch_size=ENCODE_BATCH_SIZE, upsert_batch_size=UPSERT_BATCH_SIZE,
+                 upsert_workers=UPSERT_WORKERS, queue_size=QUEUE_SIZE, sort_window=8,
+                 on_document=None, on_skipped=None, on_extracted=None):
+        self.extract_fn = extract_fn
+        self.encode_fn = encode_fn
+        self.upsert_fn = upsert_fn
+        self.extract_workers = max(1, extract_workers)
+        self.encode_batch_size = encode_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_workers = max(1, upsert_workers)
+        self.queue_size = queue_size
+        self.sort_window = sort_window
+        self.on_document = on_document
+        self.on_skipped = on_skipped
+        self.on_extracted = on_extracted
+        self.stats = {name: StageStats(name) for name in ("extract", "encode", "upsert")}
+        self.skipped = 0
+        self._abort = threading.Event()
+        self._errors = []
+        self._docs_lock = threading.Lock()
+        self._outstanding = {}  # path -> vectors not yet written
+        self._doc_ids = {}      # path -> vector IDs
+        self._doc_failed = set()
+
+    # ---------- queue helpers that give up when another stage failed ----------
+    def _put(self, q, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _guard(self, target, *args):
+        try:
+            target(*args)
+        except BaseException as e:
+            self._errors.append(e)
+            self._abort.set()
+
+    # ---------- stage 1: extraction (process pool) ----------
+    def _extract_stage(self, paths, out_q, progress):
+        stats = self.stats["extract"]
+        max_pending = 2 * self.extract_workers
+        it = iter(paths)
+        pending = {}
+        exhausted = False
+        with ProcessPoolExecutor(max_workers=self.extract_workers) as executor:
+            while not self._abort.is_set():
+                while not exhausted and len(pending) < max_pending:
+                    path = next(it, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    pending[executor.submit(self.extract_fn, path)] = (path, time.time())
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, started = pending.pop(future)
+                    progress.update(1)
+                    try:
+                        units = future.result()
+                    except Exception as e:
+                        stats.fail()
+                        print(f"❌ Extraction failed for {path}: {e}")
+                        continue
+                    stats.add(1, time.time() - started)
+                    if not units:
+                        self.skipped += 1
+                        if self.on_skipped:
+                            self.on_skipped(path)
+                        continue
+                    with self._docs_lock:
+                        self._outstanding[path] = len(units)
+                        self._doc_ids[path] = [vid for vid, _, _ in units]
+                    if self.on_extracted:
+                        self.on_extracted(path, units)
+                    self._put(out_q, (path, units))  # blocks when the encoder falls behind
+        self._put(out_q, _DONE)
+
+    # ---------- stage 2: length-sorted batched encoding ----------
+    def _encode_batch(self, units, out_q):
+        stats = self.stats["encode"]
+        started = time.time()
+        vectors = self.encode_fn([text for _, (_, text, _) in units])
+        stats.add(len(units), time.time() - started)
+        for (path, (vid, _, meta)), vec in zip(units, vectors):
+            values = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+            self._put(out_q, (path, {"id": vid, "values": values, "metadata": meta}))
+
+    def _flush_window(self, window, out_q):
+        window.sort(key=lambda entry: len(entry[1][1]))
+        for i in range(0, len(window), self.encode_batch_size):
+            self._encode_batch(window[i:i + self.encode_batch_size], out_q)
+        window.clear()
+
+    def _encode_stage(self, in_q, out_q):
+        window = []
+        window_size = self.encode_batch_size * self.sort_window
+        while True:
+            item = self._get(in_q)
+            if item is _DONE:
+                break
+            path, units = item
+            window.extend((path, unit) for unit in units)
+            if len(window) >= window_size:
+                self._flush_window(window, out_q)
+        if window and not self._abort.is_set():
+            self._flush_window(window, out_q)
+        self._put(out_q, _DONE)
+
+    # ---------- stage 3: concurrent upsert ----------
+    def _settle(self, paths, ok):
+        """Count written vectors per file and report files that are complete."""
+        finished = []
+        with self._docs_lock:
+            for path in paths:
+                if not ok:
+                    self._doc_failed.add(path)
+                self._outstanding[path] -= 1
+                if self._outstanding[path] == 0:
+                    del self._outstanding[path]
+                    ids = self._doc_ids.pop(path)
+                    if path not in self._doc_failed:
+                        finished.append((path, ids))
+                    self._doc_failed.discard(path)
+        if self.on_document:
+            for path, ids in finished:
+                self.on_document(path, ids)
+
+    def _upsert_one(self, batch, slots):
+        stats = self.stats["upsert"]
+        started = time.time()
+        ok = True
+        try:
+            self.upsert_fn([record for _, record in batch])
+            stats.add(len(batch), time.time() - started)
+        except Exception as e:
+            ok = False
+            stats.fail(len(batch))
+            print(f"❌ Upsert of {len(batch)} vectors failed: {e}")
+        finally:
+            slots.release()
+        try:
+            self._settle([path for path, _ in batch], ok)
+        except Exception as e:
+            print(f"⚠️ Progress callback failed: {e}")
+
+    def _upsert_stage(self, in_q):
+        slots = threading.BoundedSemaphore(self.upsert_workers)
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.upsert_workers) as executor:
+            def submit(records):
+                slots.acquire()  # at most upsert_workers requests in flight
+                executor.submit(self._upsert_one, records, slots)
+
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= self.upsert_batch_size:
+                    submit(batch)
+                    batch = []
+            if batch and not self._abort.is_set():
+                submit(batch)
+
+    # ---------- driver ----------
+    def run(self, paths):
+        """Ingest ``paths`` and return per-stage statistics."""
+        paths = list(paths)
+        units_q = queue.Queue(maxsize=max(1, self.queue_size // 16))
+        records_q = queue.Queue(maxsize=self.queue_size)
+        start = time.time()
+        with tqdm(total=len(paths), desc="📄 Ingesting") as progress:
+            threads = [
+                threading.Thread(target=self._guard, args=(self._extract_stage, paths, units_q, progress)),
+                threading.Thread(target=self._guard, args=(self._encode_stage, units_q, records_q)),
+                threading.Thread(target=self._guard, args=(self._upsert_stage, records_q)),
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        if self._errors:
+            raise self._errors[0]
+        wall = time.time() - start
+        return {
+            "files": len(paths),
+            "skipped": self.skipped,
+            "wall_sec": round(wall, 2),
+            "stages": {name: s.as_dict(wall) for name, s in self.stats.items()},
+        }
+
+
+def print_report(report):
+    print("\n===============================")
+    print(f"🎉 Ingest completed in {report['wall_sec']:.2f} sec ({report['files']} files)")
+    for name, s in report["stages"].items():
+        print(f"  {name:<8} {s['items']:>8} items  {s['items_per_sec']:>9.2f}/s  "
+              f"busy {s['busy_sec']:>8.2f}s  failed {s['failed']}")
+    print(f"⚠️ Skipped (no text): {report['skipped']}")
+    print("===============================")
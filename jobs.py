@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(os.getenv("VECTOR_STORE_DIR", "vector_data"), "jobs.sqlite"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# at most this many workers per process may run OCR jobs, so text-layer jobs always find a free worker
+JOB_OCR_WORKERS = int(os.getenv("JOB_OCR_WORKERS", "1"))
+# a running job whose lease expired (worker died) is picked up again
+JOB_LEASE_SEC = float(os.getenv("JOB_LEASE_SEC", "1800"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+PRIORITY_TEXT = 0
+PRIORITY_OCR = 1
+FINAL_STATES = ("done", "failed")
+
+
+class JobQueue:
+    """
+    Persistent job queue in SQLite with a bounded pool of worker threads.
+
+    Jobs are claimed in ``(priority, created_at)`` order inside an
+    ``IMMEDIATE`` transaction, so several processes (e.g. gunicorn workers)
+    can share one database. Submitting a job whose ``dedup_key`` matches a
+    queued, running or finished job returns that job instead. Each worker
+    holds a lease on its job; a job whose lease expires is retried up to
+    ``max_attempts`` times.
+
+    ``handler(job)`` receives the job dict and returns a JSON-able result.
+    """
+
+    def __init__(self, handler, path=JOBS_DB_PATH, workers=JOB_WORKERS, ocr_workers=JOB_OCR_WORKERS,
+                 lease_sec=JOB_LEASE_SEC, max_attempts=JOB_MAX_ATTEMPTS):
+        self.handler = handler
+        self.path = path
+        self.workers = max(1, workers)
+        self.ocr_workers = max(1, min(ocr_workers, self.workers))
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._ocr_running = 0
+        self._ocr_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    dedup_key TEXT,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    lease_until REAL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key)")
+
+    def _conn(self):
+        # one connection per thread; SQLite connections must not cross threads (or forks)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return _Transaction(conn)
+
+    # ---------- client side ----------
+    def submit(self, payload, priority=PRIORITY_TEXT, dedup_key=None):
+        """Queue a job; returns ``(job, deduplicated)``."""
+        with self._conn() as db:
+            if dedup_key:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE dedup_key = ? AND status != 'failed' ORDER BY created_at DESC LIMIT 1",
+                    (dedup_key,)).fetchone()
+                if row:
+                    return _as_dict(row), True
+            job_id = uuid.uuid4().hex
+            db.execute("INSERT INTO jobs (id, dedup_key, priority, status, payload, created_at) "
+                       "VALUES (?, ?, ?, 'queued', ?, ?)",
+                       (job_id, dedup_key, priority, json.dumps(payload), time.time()))
+        self._wake.set()
+        self.start()
+        return self.get(job_id), False
+
+    def get(self, job_id):
+        with self._conn() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = _as_dict(row)
+        if job["status"] == "queued":
+            with self._conn() as db:
+                job["queue_position"] = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority < ? OR (priority = ? AND created_at < ?))",
+                    (job["priority"], job["priority"], job["created_at"])).fetchone()[0]
+        return job
+
+    def stats(self):
+        with self._conn() as db:
+            rows = db.execute("SELECT status, priority, COUNT(*) FROM jobs GROUP BY status, priority").fetchall()
+        out = {}
+        for status, priority, count in rows:
+            out.setdefault(status, {})["ocr" if priority == PRIORITY_OCR else "text"] = count
+        return out
+
+    # ---------- worker side ----------
+    def _claim(self, allow_ocr):
+        now = time.time()
+        with self._conn() as db:
+            db.execute("BEGIN IMMEDIATE")  # serialize claims across threads and processes
+            row = db.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?)) "
+                "AND priority <= ? ORDER BY priority, created_at LIMIT 1",
+                (now, PRIORITY_OCR if allow_ocr else PRIORITY_TEXT)).fetchone()
+            if row is None:
+                return None
+            if row["attempts"] >= self.max_attempts:
+                db.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                           ("gave up after repeated worker failures", now, row["id"]))
+                return None
+            db.execute("UPDATE jobs SET status = 'running', started_at = ?, lease_until = ?, "
+                       "attempts = attempts + 1 WHERE id = ?", (now, now + self.lease_sec, row["id"]))
+        job = _as_dict(row)
+        job["status"] = "running"
+        return job
+
+    def _finish(self, job_id, result=None, error=None):
+        with self._conn() as db:
+            db.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                       "WHERE id = ?",
+                       ("failed" if error else "done", json.dumps(result) if error is None else None,
+                        error, time.time(), job_id))
+
+    def _work(self):
+        while not self._stop.is_set():
+            # reserve an OCR slot before claiming, so two threads can't both see a free slot and take OCR jobs
+            with self._ocr_lock:
+                allow_ocr = self._ocr_running < self.ocr_workers
+                if allow_ocr:
+                    self._ocr_running += 1
+            try:
+                job = self._claim(allow_ocr)
+            except sqlite3.OperationalError as e:  # database busy: try again shortly
+                print(f"⚠️ Job claim failed: {e}")
+                job = None
+            ocr = job is not None and job["priority"] == PRIORITY_OCR
+            if allow_ocr and not ocr:
+                with self._ocr_lock:
+                    self._ocr_running -= 1
+            if job is None:
+                self._wake.wait(timeout=1.0)  # other processes may queue work too, so also poll
+                self._wake.clear()
+                continue
+            try:
+                self._finish(job["id"], result=self.handler(job))
+            except Exception as e:
+                self._finish(job["id"], error=getattr(e, "message", None) or repr(e))
+            finally:
+                if ocr:
+                    with self._ocr_lock:
+                        self._ocr_running -= 1
+
+    def start(self):
+        """Start the worker threads (idempotent; call after fork, never in a preloading master)."""
+        with self._start_lock:
+            if self._threads and all(t.is_alive() for t in self._threads):
+                return
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for t in self._threads:
+                t.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+
+class _Transaction:
+    """``with`` wrapper that commits or rolls back an autocommit-mode connection's explicit transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, *exc):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _as_dict(row):
+    job = dict(row)
+    for key in ("payload", "result"):
+        if job.get(key):
+            job[key] = json.loads(job[key])
+    return job
@@ -0,0 +1,325 @@
+import os
+import re
+import json
+import math
+import time
+import shutil
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from metrics import span
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+LEXICAL_INDEX = os.getenv("LEXICAL_INDEX", "1") == "1"
+LEXICAL_DIR = os.getenv("LEXICAL_DIR", os.path.join(os.getenv("VECTOR_STORE_DIR", "vector_data"), "lexical"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# an uploaded judgment is a very long query; keep only its most selective terms
+LEXICAL_MAX_QUERY_TERMS = int(os.getenv("LEXICAL_MAX_QUERY_TERMS", "64"))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were which with
+not no but if then than so such there their they he she his her him we our you your i
+shall said under any all also been into upon may other those these being
+""".split())
+
+
+def tokenize(text):
+    """Lowercased alphanumeric tokens; numbers are kept so "Section 302 IPC" stays searchable."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index stored next to the vector index.
+
+    Writers keep per-unit term counts in SQLite (``add`` / ``delete``);
+    :meth:`build` compiles them into a read-only generation of flat arrays:
+
+    * ``postings_docs.npy`` / ``postings_tf.npy`` — all postings lists,
+      concatenated term by term (int32 row, uint16 term frequency);
+    * ``doc_lens.npy`` — token count per row;
+    * ``terms.json`` — term -> ``[offset, df]``, plus ``ids.json`` and ``meta.json``.
+
+    Postings are memory-mapped, so a query only touches the pages of its own
+    terms. Generations are published through an atomically replaced
+    ``CURRENT`` file and readers pick up a new one on their next query.
+    """
+
+    def __init__(self, index_name, root=LEXICAL_DIR, k1=BM25_K1, b=BM25_B):
+        self.index_name = index_name
+        self.dir = os.path.join(root, index_name)
+        self.k1 = k1
+        self.b = b
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._gen = None
+        self._loaded = None
+
+    # ---------- write side ----------
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(self.dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.dir, "terms.sqlite"), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS units (id TEXT PRIMARY KEY, length INTEGER, tf TEXT)")
+            self._db.commit()
+        return self._db
+
+    def add(self, units):
+        """Add or replace ``(vector_id, text, ...)`` units (the ingest pipeline's unit shape)."""
+        rows = []
+        for unit in units:
+            tokens = tokenize(unit[1] or "")
+            rows.append((unit[0], len(tokens), json.dumps(Counter(tokens), separators=(",", ":"))))
+        with self._db_lock:
+            db = self._conn()
+            db.executemany("INSERT OR REPLACE INTO units VALUES (?, ?, ?)", rows)
+            db.commit()
+
+    def delete(self, ids):
+        ids = list(ids)
+        with self._db_lock:
+            db = self._conn()
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                db.execute(f"DELETE FROM units WHERE id IN ({','.join('?' * len(batch))})", batch)
+            db.commit()
+
+    def build(self):
+        """Compile the term counts into a new memory-mappable generation and publish it."""
+        started = time.time()
+        with self._db_lock:
+            cursor = self._conn().execute("SELECT id, length, tf FROM units ORDER BY id")
+            vocab, ids, lengths = {}, [], array("i")
+            term_col, row_col, tf_col = array("i"), array("i"), array("H")
+            for row, (vid, length, raw) in enumerate(cursor):
+                ids.append(vid)
+                lengths.append(length)
+                for term, tf in json.loads(raw).items():
+                    term_col.append(vocab.setdefault(term, len(vocab)))
+                    row_col.append(row)
+                    tf_col.append(min(tf, 65535))
+
+        terms = np.array(term_col, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")  # group postings by term, rows stay ascending
+        df = np.bincount(terms, minlength=len(vocab))
+        offsets = np.concatenate([[0], np.cumsum(df)[:-1]]) if len(vocab) else np.zeros(0, dtype=np.int64)
+
+        gen = f"gen-{int(time.time() * 1000)}"
+        out = os.path.join(self.dir, gen)
+        os.makedirs(out, exist_ok=True)
+        np.save(os.path.join(out, "postings_docs.npy"), np.array(row_col, dtype=np.int32)[order])
+        np.save(os.path.join(out, "postings_tf.npy"), np.array(tf_col, dtype=np.uint16)[order])
+        doc_lens = np.array(lengths, dtype=np.int32)
+        np.save(os.path.join(out, "doc_lens.npy"), doc_lens)
+        with open(os.path.join(out, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump({t: [int(offsets[i]), int(df[i])] for t, i in vocab.items()}, f, separators=(",", ":"))
+        with open(os.path.join(out, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+        with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"units": len(ids), "terms": len(vocab), "postings": len(order),
+                       "avgdl": float(doc_lens.mean()) if len(ids) else 0.0}, f)
+
+        current = os.path.join(self.dir, "CURRENT")
+        with open(current + ".tmp", "w", encoding="utf-8") as f:
+            f.write(gen)
+        os.replace(current + ".tmp", current)
+        self._drop_old_generations(keep={gen})
+        print(f"🔤 Lexical index: {len(ids)} units, {len(vocab)} terms, {len(order)} postings "
+              f"in {time.time() - started:.1f}s")
+        return gen
+
+    def _drop_old_generations(self, keep):
+        gens = sorted(d for d in os.listdir(self.dir) if d.startswith("gen-"))
+        # keep the previous generation too: a reader may still have it mapped
+        for old in [g for g in gens if g not in keep][:-1]:
+            shutil.rmtree(os.path.join(self.dir, old), ignore_errors=True)
+
+    # ---------- read side ----------
+    def _current(self):
+        try:
+            with open(os.path.join(self.dir, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        gen = self._current()
+        if gen is None:
+            return None
+        if gen != self._gen:
+            path = os.path.join(self.dir, gen)
+            with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+                terms = json.load(f)
+            with open(os.path.join(path, "ids.json"), encoding="utf-8") as f:
+                ids = json.load(f)
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            self._loaded = {
+                "terms": terms,
+                "ids": ids,
+                "avgdl": meta["avgdl"] or 1.0,
+                "docs": np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r"),
+                "tf": np.load(os.path.join(path, "postings_tf.npy"), mmap_mode="r"),
+            }
+            lens = np.load(os.path.join(path, "doc_lens.npy"))
+            # BM25 length normalisation is per document, so it is computed once per generation
+            self._loaded["norm"] = (self.k1 * (1.0 - self.b + self.b * lens / self._loaded["avgdl"])).astype(np.float32)
+            self._gen = gen
+        return self._loaded
+
+    def available(self):
+        return self._current() is not None
+
+    def search(self, text, top_k=10):
+        """BM25 top-k as ``[{"id", "score"}]``; empty if no generation has been built."""
+        idx = self._load()
+        if idx is None or not idx["ids"]:
+            return []
+        n = len(idx["ids"])
+        query = Counter(tokenize(text))
+        weighted = []
+        for term, qtf in query.items():
+            entry = idx["terms"].get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            weighted.append((qtf * idf, idf, offset, df))
+        weighted.sort(reverse=True)
+
+        scores = np.zeros(n, dtype=np.float32)
+        norm = idx["norm"]
+        for _, idf, offset, df in weighted[:LEXICAL_MAX_QUERY_TERMS]:
+            rows = idx["docs"][offset:offset + df]
+            tf = idx["tf"][offset:offset + df].astype(np.float32)
+            scores[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm[rows])
+
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": idx["ids"][i], "score": float(scores[i])} for i in top if scores[i] > 0]
+
+
+class WrittenUnits:
+    """
+    Feed a lexical index only with units the vector index accepted.
+
+    Call :meth:`extracted` with units before their records are sent and pass
+    :meth:`written` as (part of) a ``BulkWriter`` ``on_written`` callback, so
+    a failed or dead-lettered upsert never leaves BM25 terms behind.
+    """
+
+    def __init__(self, lexical):
+        self.lexical = lexical
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def extracted(self, units):
+        with self._lock:
+            self._pending.update((unit[0], unit) for unit in units)
+
+    def written(self, records):
+        with self._lock:
+            units = [self._pending.pop(r["id"]) for r in records if r["id"] in self._pending]
+        if units:
+            self.lexical.add(units)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(index_name, root=LEXICAL_DIR):
+    with _indexes_lock:
+        key = (index_name, root)
+        if key not in _indexes:
+            _indexes[key] = LexicalIndex(index_name, root=root)
+        return _indexes[key]
+
+
+# ----------------------------------------------
+# Hybrid retrieval: reciprocal-rank fusion of lexical + dense
+# ----------------------------------------------
+_fusion_pool = ThreadPoolExecutor(max_workers=4)
+
+
+def rrf_fuse(rankings, k=RRF_K):
+    """
+    Reciprocal-rank fusion of several ranked document-ID lists:
+    ``score(d) = sum(1 / (k + rank))``. Returns ``[(doc_id, score)]``.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def hybrid_search(dense_fn, lexical, query_text, top_k=5, candidates=50, doc_of=lambda vid: vid):
+    """
+    Run ``dense_fn()`` (returning ``[{"doc_id", "score", ...}]`` best-first)
+    and a BM25 search concurrently, then merge them per document with RRF.
+
+    ``doc_of`` maps a lexical hit ID (e.g. a chunk ID) to its document.
+    Each result keeps the dense fields, but ``score`` is the fused RRF score
+    the list is ordered by; the dense cosine moves to ``dense_score``
+    (``None`` for lexical-only hits), next to ``dense_rank`` and ``lexical_rank``.
+    """
+    def lexical_search():
+        with span("lexical_search"):
+            return lexical.search(query_text, candidates)
+
+    lexical_future = _fusion_pool.submit(lexical_search)
+    dense = dense_fn()
+    lexical_hits = lexical_future.result()
+
+    lexical_docs = []
+    for hit in lexical_hits:
+        doc_id = doc_of(hit["id"])
+        if doc_id not in lexical_docs:
+            lexical_docs.append(doc_id)
+    dense_by_doc = {d["doc_id"]: d for d in dense}
+    dense_rank = {d["doc_id"]: r for r, d in enumerate(dense, start=1)}
+    lexical_rank = {d: r for r, d in enumerate(lexical_docs, start=1)}
+
+    results = []
+    for doc_id, fused in rrf_fuse([[d["doc_id"] for d in dense], lexical_docs])[:top_k]:
+        entry = dict(dense_by_doc.get(doc_id) or {"doc_id": doc_id})
+        entry.update({"score": round(fused, 6), "dense_score": entry.get("score"),
+                      "dense_rank": dense_rank.get(doc_id), "lexical_rank": lexical_rank.get(doc_id)})
+        results.append(entry)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or query the BM25 lexical index.")
+    parser.add_argument("--index", default=os.getenv("PINECONE_INDEX", "legal-cases"))
+    parser.add_argument("--build", action="store_true", help="Recompile postings from stored term counts")
+    parser.add_argument("--query", help="Run a lexical query and print timing")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    lex = LexicalIndex(args.index)
+    if args.build:
+        lex.build()
+    if args.query:
+        lex.search(args.query, args.top_k)  # warm the mapped pages
+        t0 = time.perf_counter()
+        hits = lex.search(args.query, args.top_k)
+        print(f"⏱️ {(time.perf_counter() - t0) * 1000:.2f} ms")
+        for hit in hits:
+            print(f"   {hit['score']:.3f}  {hit['id']}")
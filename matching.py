@@ -0,0 +1,222 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from pdf_extract import extract_pdf_text  # PyPDF2 text layer + per-page OCR fallback
+from vector_store import index_version
+from upload_cache import get_upload_cache
+from chunk_retrieval import RETRIEVAL_MODE, CHUNK_SEPARATOR, ENCODE_BATCH_SIZE, search_documents
+from lexical_index import HYBRID_SEARCH, HYBRID_CANDIDATES, get_lexical_index, hybrid_search
+from services import services
+from app_config import INDEX_NAME, EMBED_MODEL
+from metrics import span, INDEX_ERRORS
+
+# ----------------------------------------------
+# Case matching shared by the sync, async-job and batch endpoints
+# ----------------------------------------------
+load_dotenv()
+TOP_K = 5
+# /batch_match: documents per request, parallel extractions (OCR runs in tesseract subprocesses) and index queries
+BATCH_MAX_DOCS = int(os.getenv("BATCH_MAX_DOCS", "200"))
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", "4"))
+BATCH_QUERY_WORKERS = int(os.getenv("BATCH_QUERY_WORKERS", "8"))
+
+upload_cache = get_upload_cache()
+# BM25 index built at ingest time (exact section numbers, citations, party names)
+lexical = get_lexical_index(INDEX_NAME)
+
+
+class MatchError(Exception):
+    """A document could not be matched; ``status`` is the HTTP status to report."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def matches_kind(top_k=TOP_K):
+    """Upload-cache kind for results: changes with mode, model, index version and k."""
+    use_hybrid = HYBRID_SEARCH and lexical.available()
+    # "-fused": hybrid results score by RRF (dense cosine in dense_score); older cached lists don't
+    mode_tag = f"{RETRIEVAL_MODE}+bm25-fused" if use_hybrid else RETRIEVAL_MODE
+    return f"matches:{mode_tag}:{EMBED_MODEL}:{INDEX_NAME}:v{index_version(INDEX_NAME)}:top{top_k}", use_hybrid
+
+
+def embedding_kind():
+    return f"emb:{RETRIEVAL_MODE}:{EMBED_MODEL}"
+
+
+def embed_texts(texts):
+    """
+    Embed several documents in one encoder call. Chunk mode returns one
+    ``(n_chunks, dim)`` matrix per document, document mode one vector.
+    """
+    encoder = services.encoder
+    if RETRIEVAL_MODE == "chunk":
+        from chunker import chunk_text
+        with span("chunk"):
+            per_doc = [chunk_text(text) or [text] for text in texts]
+        flat = [chunk for chunks in per_doc for chunk in chunks]
+        vectors = encoder.encode(flat, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True,
+                                 show_progress_bar=False)
+        out, start = [], 0
+        for chunks in per_doc:
+            out.append(np.asarray(vectors[start:start + len(chunks)]))
+            start += len(chunks)
+        return out
+    vectors = encoder.encode(list(texts), batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True,
+                             show_progress_bar=False)
+    return [np.asarray(v) for v in vectors]
+
+
+def rank(text, vectors, use_hybrid, top_k=TOP_K):
+    """Query the vector index (and the BM25 index concurrently, fused with RRF) for one document."""
+    index = services.index
+    dense_k = HYBRID_CANDIDATES if use_hybrid else top_k
+
+    if RETRIEVAL_MODE == "chunk":
+        def dense_search():
+            with span("dense_search"):
+                return search_documents(index, vectors, top_k=dense_k)
+    else:
+        def dense_search():
+            with span("dense_search"):
+                res = index.query(vector=vectors.tolist(), top_k=dense_k, include_metadata=True)
+            return [{"doc_id": match["id"], "score": match["score"]} for match in res["matches"]]
+
+    try:
+        with span("query"):
+            if use_hybrid:
+                ranked = hybrid_search(dense_search, lexical, text, top_k=top_k, candidates=HYBRID_CANDIDATES,
+                                       doc_of=lambda vid: vid.split(CHUNK_SEPARATOR, 1)[0])
+            else:
+                ranked = dense_search()[:top_k]
+    except Exception as e:
+        INDEX_ERRORS.labels(op="query").inc()
+        print(f"❌ Index query failed: {e}")
+        raise MatchError("Failed to query vector index", 500)
+
+    # Format results
+    results = []
+    for r in ranked:
+        entry = {"file": r["doc_id"], "score": r["score"]}
+        entry.update({k: v for k, v in r.items() if k not in ("doc_id", "score")})
+        results.append(entry)
+    return results
+
+
+def match_text(text, sha=None, top_k=TOP_K, check_cache=True):
+    """Match extracted text; with a content ``sha`` the embedding and results are cached."""
+    kind, use_hybrid = matches_kind(top_k)
+    if sha and check_cache:
+        results = upload_cache.get(sha, kind)
+        if results is not None:
+            return results
+    with span("encode"):
+        if sha:
+            vectors = upload_cache.get_or_compute(sha, embedding_kind(), lambda: embed_texts([text])[0])
+        else:
+            vectors = embed_texts([text])[0]
+    results = rank(text, vectors, use_hybrid, top_k)
+    if sha:
+        upload_cache.put(sha, kind, results)
+    return results
+
+
+def extract_cached(sha, path):
+    """Extracted text (cached by content hash, so OCR runs once per document)."""
+    with span("extract"):
+        text = upload_cache.get_or_compute(sha, "text", lambda: extract_pdf_text(path))
+    if not text:
+        print("❌ No text extracted from PDF.")
+        raise MatchError("Unable to extract readable text from PDF", 400)
+    return text
+
+
+def match_pdf(sha, path, top_k=TOP_K):
+    """Match a saved PDF. Returns ``(results, from_cache)``; raises :class:`MatchError`."""
+    # Repeat uploads of the same judgment against the same index are free
+    kind, _ = matches_kind(top_k)
+    with span("cache_lookup"):
+        results = upload_cache.get(sha, kind)
+    if results is not None:
+        return results, True
+    return match_text(extract_cached(sha, path), sha, top_k, check_cache=False), False
+
+
+def match_batch(items, top_k=TOP_K):
+    """
+    Match many documents, yielding one result dict per document as it completes.
+
+    ``items`` are dicts with an ``id`` and a content ``sha`` plus either a
+    saved PDF ``path`` or raw ``text``. Cached results are yielded first;
+    the rest are extracted in parallel, embedded together in one encoder
+    call (so batches fill the model's forward passes) and queried against
+    the index concurrently.
+    """
+    kind, use_hybrid = matches_kind(top_k)
+
+    def failed(item, e):
+        return {"id": item["id"], "error": e.message if isinstance(e, MatchError) else "Matching failed"}
+
+    # everything below is keyed by position: caller ids may repeat and only label the output
+    # 1. result cache
+    pending = []
+    for pos, item in enumerate(items):
+        results = upload_cache.get(item["sha"], kind)
+        if results is None:
+            pending.append(pos)
+        else:
+            yield {"id": item["id"], "results": results, "cached": True}
+
+    # 2. text extraction, in parallel
+    texts = {}
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_EXTRACT_WORKERS)) as pool:
+        futures = {pool.submit(extract_cached, items[pos]["sha"], items[pos]["path"]): pos
+                   for pos in pending if "path" in items[pos]}
+        for pos in pending:
+            if "path" not in items[pos]:
+                texts[pos] = items[pos]["text"]
+        for future in as_completed(futures):
+            pos = futures[future]
+            try:
+                texts[pos] = future.result()
+            except Exception as e:
+                yield failed(items[pos], e)
+    pending = [pos for pos in pending if texts.get(pos)]
+
+    # 3. embeddings: cached ones reused, the rest encoded in one call
+    vectors, to_encode = {}, []
+    for pos in pending:
+        cached = upload_cache.get(items[pos]["sha"], embedding_kind())
+        if cached is None:
+            to_encode.append(pos)
+        else:
+            vectors[pos] = cached
+    if to_encode:
+        try:
+            with span("encode"):
+                encoded = embed_texts([texts[pos] for pos in to_encode])
+        except Exception as e:
+            print(f"❌ Batch encode failed: {e}")
+            for pos in to_encode:
+                yield failed(items[pos], MatchError("Failed to embed document", 500))
+            to_encode, encoded = [], []
+            pending = [pos for pos in pending if pos in vectors]
+        for pos, vec in zip(to_encode, encoded):
+            upload_cache.put(items[pos]["sha"], embedding_kind(), vec)
+            vectors[pos] = vec
+
+    # 4. index queries, concurrently; results streamed in completion order
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_QUERY_WORKERS)) as pool:
+        futures = {pool.submit(rank, texts[pos], vectors[pos], use_hybrid, top_k): pos for pos in pending}
+        for future in as_completed(futures):
+            item = items[futures[future]]
+            try:
+                results = future.result()
+            except Exception as e:
+                yield failed(item, e)
+                continue
+            upload_cache.put(item["sha"], kind, results)
+            yield {"id": item["id"], "results": results, "cached": False}
@@ -0,0 +1,146 @@
+import os
+import time
+import json
+import random
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Requests slower than this log their per-stage timings as one JSON line
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+# Fraction of requests run under cProfile; a profile is kept only if the request was slow
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("logs", "profiles"))
+# Set (gunicorn.conf.py does) to share metrics across worker processes; read by prometheus_client at import
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,  # noqa: E402
+                               generate_latest, multiprocess)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+CHARS_BUCKETS = (0, 1000, 5000, 20000, 50000, 100000, 250000, 500000, 1000000)
+
+
+def render_prometheus():
+    """
+    All metrics in the Prometheus text exposition format: this process's, or
+    with ``PROMETHEUS_MULTIPROC_DIR`` set, the sum over every worker process.
+    """
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+# ----------------------------------------------
+# Metrics
+# ----------------------------------------------
+REQUEST_SECONDS = Histogram("echo_request_seconds", "HTTP request latency, to the end of a streamed body",
+                            ("endpoint", "status"), buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("echo_stage_seconds", "Latency of one processing stage", ("stage",),
+                          buckets=LATENCY_BUCKETS)
+PDF_PAGES = Counter("echo_pdf_pages", "PDF pages seen by text extraction")
+OCR_PAGES = Counter("echo_ocr_pages", "PDF pages that fell back to OCR")
+OCR_DOCUMENTS = Counter("echo_ocr_documents", "PDFs with at least one OCR page")
+PDF_DOCUMENTS = Counter("echo_pdf_documents", "PDFs seen by text extraction")
+TEXT_CHARS = Histogram("echo_extracted_text_chars", "Characters of extracted text per PDF", buckets=CHARS_BUCKETS)
+ENCODE_BATCH_SIZE = Histogram("echo_encode_batch_size", "Texts per model forward pass", buckets=SIZE_BUCKETS)
+CACHE_REQUESTS = Counter("echo_cache_requests", "Cache lookups by cache, kind and result", ("cache", "kind", "result"))
+INDEX_ERRORS = Counter("echo_index_errors", "Failed vector / lexical index operations", ("op",))
+
+
+# ----------------------------------------------
+# Timing spans
+# ----------------------------------------------
+_local = threading.local()
+
+
+@contextmanager
+def span(stage):
+    """Time a stage into ``echo_stage_seconds`` and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if METRICS_ENABLED:
+            STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+            trace = getattr(_local, "trace", None)
+            if trace is not None:
+                trace.append((stage, round(elapsed * 1000, 2)))
+
+
+def begin_request():
+    _local.trace = []
+    _local.started = time.perf_counter()
+    _local.profiler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            _local.profiler = profiler
+        except ValueError:
+            pass  # another request on this process is already being profiled
+
+
+def current_request():
+    """The running request's trace state, to finish it later with :func:`end_request`."""
+    return getattr(_local, "started", None), getattr(_local, "trace", None), getattr(_local, "profiler", None)
+
+
+def end_request(endpoint, status, state=None):
+    started, trace, profiler = state or current_request()
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if getattr(_local, "trace", None) is trace:
+        _local.started = _local.trace = _local.profiler = None
+    if profiler is not None:
+        profiler.disable()
+    if METRICS_ENABLED:
+        REQUEST_SECONDS.labels(endpoint=endpoint, status=status).observe(elapsed)
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        print(json.dumps({"slow_request": endpoint, "status": status, "ms": round(elapsed * 1000, 1),
+                          "stages": trace}))
+        if profiler is not None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            print(f"🧪 Profile of slow request written to {path}")
+
+
+def init_app(app):
+    """
+    Wrap every Flask request in a trace and expose ``/metrics``.
+
+    A streamed response (NDJSON, server-sent events) is timed until the
+    server closes its body, not until the view returns. Under gunicorn set
+    ``PROMETHEUS_MULTIPROC_DIR`` so ``/metrics`` reports all workers.
+    """
+    from flask import Response, request
+
+    @app.before_request
+    def _begin():
+        begin_request()
+
+    @app.after_request
+    def _end(response):
+        endpoint, status = request.endpoint or "unknown", response.status_code
+        if response.is_streamed:
+            state = current_request()
+            response.call_on_close(lambda: end_request(endpoint, status, state))
+        else:
+            end_request(endpoint, status)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render_prometheus(), mimetype=CONTENT_TYPE_LATEST)
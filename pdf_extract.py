@@ -0,0 +1,147 @@
+import os
+import re
+import time
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PyPDF2 import PdfReader
+from dotenv import load_dotenv
+from metrics import span, PDF_DOCUMENTS, PDF_PAGES, OCR_DOCUMENTS, OCR_PAGES, TEXT_CHARS
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "300"))
+OCR_TIME_BUDGET_SEC = float(os.getenv("OCR_TIME_BUDGET_SEC", "120"))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "40"))
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+
+_WORD = re.compile(r"[A-Za-z]{2,}")
+
+
+def needs_ocr(page_text):
+    """True if a page's text layer is missing or looks like extraction garbage."""
+    text = (page_text or "").strip()
+    if len(text) < MIN_PAGE_CHARS:
+        return True
+    # broken font maps yield symbol soup: few real words per character
+    words = _WORD.findall(text)
+    return sum(len(w) for w in words) < 0.4 * len(text.replace(" ", ""))
+
+
+def _tesseract(image, lang=OCR_LANG, timeout=None):
+    """OCR one image with the tesseract CLI."""
+    # tesseract's own OpenMP threads fight with our page-level pool; limit them in
+    # the child only, never in this process, where torch shares the OpenMP runtime
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+    with tempfile.TemporaryDirectory(prefix="ocr-") as tmp:
+        path = os.path.join(tmp, "page.png")
+        image.save(path)
+        proc = subprocess.run([TESSERACT_CMD, path, "stdout", "-l", lang], env=env, capture_output=True,
+                              timeout=timeout)
+    if proc.returncode:
+        raise RuntimeError(f"tesseract exited with {proc.returncode}: {proc.stderr.decode(errors='replace')[:200]}")
+    return proc.stdout.decode("utf-8", errors="replace")
+
+
+def ocr_page(file_path, page_number, dpi=OCR_DPI, timeout=None):
+    """Rasterize and OCR a single 1-based page; only that page's image is in memory."""
+    from pdf2image import convert_from_path
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number,
+                               timeout=timeout)
+    try:
+        return "".join(_tesseract(img, timeout=timeout) for img in images)
+    finally:
+        for img in images:
+            img.close()
+
+
+def ocr_pages(file_path, page_indexes, dpi=OCR_DPI, workers=OCR_WORKERS,
+              max_pages=OCR_MAX_PAGES, time_budget=OCR_TIME_BUDGET_SEC):
+    """
+    OCR the given 0-based pages in a bounded worker pool.
+
+    At most ``workers`` pages are rasterized at once. Pages beyond
+    ``max_pages``, or not finished when ``time_budget`` seconds elapse,
+    are skipped; each page's subprocesses also time out at the deadline.
+    Returns ``{page_index: text}`` for the pages that were done.
+    """
+    page_indexes = list(page_indexes)
+    todo = page_indexes[:max_pages]
+    deadline = time.monotonic() + time_budget
+    results, pending, failed = {}, {}, 0
+    # pdftoppm and tesseract run as subprocesses, so threads parallelize fine
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        it = iter(todo)
+        while True:
+            while len(pending) < workers and time.monotonic() < deadline:
+                i = next(it, None)
+                if i is None:
+                    break
+                remaining = max(1.0, deadline - time.monotonic())
+                pending[executor.submit(ocr_page, file_path, i + 1, dpi, remaining)] = i
+            if not pending:
+                break
+            done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                break  # out of time: keep what finished
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"⚠️ OCR failed on page {i + 1}: {e}")
+    finally:
+        # don't wait for pages still running past the deadline; queued ones never start
+        executor.shutdown(wait=False, cancel_futures=True)
+    if len(page_indexes) > len(todo):
+        print(f"⚠️ OCR page cap ({max_pages}): {len(page_indexes) - len(todo)} page(s) not OCR'd")
+    timed_out = len(todo) - len(results) - failed
+    if timed_out:
+        print(f"⚠️ OCR budget reached: {timed_out} page(s) left without text")
+    return results
+
+
+def probe_needs_ocr(file_path, max_pages=3):
+    """Cheap check of the first pages' text layer: will this PDF likely need OCR?"""
+    try:
+        reader = PdfReader(file_path)
+        pages = reader.pages[:max_pages]
+        return not pages or any(needs_ocr(page.extract_text() or "") for page in pages)
+    except Exception:
+        return True
+
+
+# ----------------------------------------------
+# PDF text extraction (with per-page OCR fallback)
+# ----------------------------------------------
+def extract_pdf_text(file_path):
+    text = ""
+    try:
+        reader = PdfReader(file_path)
+        with span("extract_text_layer"):
+            pages = [page.extract_text() or "" for page in reader.pages]
+        missing = [i for i, t in enumerate(pages) if needs_ocr(t)]
+        PDF_DOCUMENTS.inc()
+        PDF_PAGES.inc(len(pages))
+        if missing:
+            OCR_DOCUMENTS.inc()
+            OCR_PAGES.inc(len(missing))
+            print(f"🔍 Using OCR fallback on {len(missing)}/{len(pages)} pages...")
+            with span("ocr"):
+                for i, page_text in ocr_pages(file_path, missing).items():
+                    if page_text.strip():
+                        pages[i] = page_text
+        text = " ".join(p for p in pages if p)
+    except Exception as e:
+        print(f"⚠️ PDF extraction failed: {e}")
+    text = text.strip()
+    TEXT_CHARS.observe(len(text))
+    return text
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import numpy as np
+from vector_store import LocalIndex, VECTOR_STORE_DIR, INDEX_NAME
+
+# ----------------------------------------------
+# Memory footprint vs recall@k for each storage mode
+# ----------------------------------------------
+MODES = ["none", "int8", "binary"]
+
+
+def load_vectors(args):
+    path = args.vectors or os.path.join(VECTOR_STORE_DIR, args.index, "vectors.npy")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ No vectors found at {path} (run a local-backend ingest first or pass --vectors)")
+    return np.load(path, mmap_mode="r")
+
+
+def exact_top_k(base, queries, k, block=65536):
+    """Ground-truth neighbours by blocked brute-force inner product."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype="float32")
+    best_rows = np.zeros((len(queries), k), dtype="int64")
+    for start in range(0, len(base), block):
+        chunk = np.asarray(base[start:start + block], dtype="float32")
+        scores = queries @ chunk.T
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, np.arange(start, start + len(chunk))[None, :].repeat(len(queries), 0)], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+    return best_rows
+
+
+def evaluate_mode(base, queries, truth, k, index_type, quantization, workdir):
+    name = f"{index_type}-{quantization}"
+    idx = LocalIndex(name, root=workdir, dimension=base.shape[1], index_type=index_type,
+                     quantization=quantization)
+    start = time.time()
+    for i in range(0, len(base), 10000):
+        block = np.asarray(base[i:i + 10000], dtype="float32")
+        idx.upsert(vectors=[(str(i + j), vec, {}) for j, vec in enumerate(block)])
+    idx.persist()
+    build_sec = time.time() - start
+
+    # reopen so quantized modes serve from the memory-mapped float store
+    idx = LocalIndex(name, root=workdir, index_type=index_type, quantization=quantization)
+    latencies, hits = [], 0
+    for qi, q in enumerate(queries):
+        t0 = time.perf_counter()
+        res = idx.query(vector=q, top_k=k)
+        latencies.append(time.perf_counter() - t0)
+        found = {int(m["id"]) for m in res["matches"]}
+        hits += len(found & set(truth[qi].tolist()))
+    footprint = idx.memory_footprint()
+    lat = np.array(latencies) * 1000
+    return {
+        "mode": name,
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "index_mb": round(footprint["index_bytes"] / 2 ** 20, 2),
+        "float_store_mb": round(footprint["float_store_bytes"] / 2 ** 20, 2),
+        "float_store_mmapped": footprint["float_store_mmapped"],
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p99_ms": round(float(np.percentile(lat, 99)), 3),
+        "build_sec": round(build_sec, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare quantized index storage modes (memory vs recall@k).")
+    parser.add_argument("--index", default=INDEX_NAME, help="Local index whose vectors.npy to sample")
+    parser.add_argument("--vectors", help="Explicit .npy matrix instead of a local index")
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf", "hnsw"])
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many base vectors")
+    parser.add_argument("--out", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    if args.limit:
+        vectors = vectors[:args.limit]
+    rng = np.random.default_rng(42)
+    query_rows = rng.choice(len(vectors), size=min(args.queries, len(vectors) // 10 or 1), replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[query_rows] = False
+    base = np.asarray(vectors, dtype="float32")[mask]  # held-out queries are not in the index
+    base /= np.maximum(np.linalg.norm(base, axis=1, keepdims=True), 1e-12)
+    queries = np.asarray(vectors[np.sort(query_rows)], dtype="float32")
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    print(f"📊 {len(base)} base vectors × {base.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    truth = exact_top_k(base, queries, args.k)
+
+    workdir = tempfile.mkdtemp(prefix="quant-report-")
+    try:
+        rows = [evaluate_mode(base, queries, truth, args.k, args.index_type, mode, workdir)
+                for mode in args.modes.split(",")]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'mode':<16}{'recall@' + str(args.k):>10}{'index MB':>10}{'floats MB':>11}{'p50 ms':>9}{'p99 ms':>9}")
+    for r in rows:
+        print(f"{r['mode']:<16}{r[f'recall@{args.k}']:>10}{r['index_mb']:>10}{r['float_store_mb']:>11}"
+              f"{r['p50_ms']:>9}{r['p99_ms']:>9}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n✅ Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
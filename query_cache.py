@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from vector_store import index_version, query_many
+from metrics import CACHE_REQUESTS
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+QUERY_CACHE = os.getenv("QUERY_CACHE", "1") == "1"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+QUERY_CACHE_TTL_SEC = float(os.getenv("QUERY_CACHE_TTL_SEC", "3600"))
+# Share results between gunicorn workers through a local SQLite file
+QUERY_CACHE_SHARED = os.getenv("QUERY_CACHE_SHARED", "0") == "1"
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", os.path.join("cache", "query_cache.sqlite"))
+# How often the index version file is re-read (ingestion bumps it)
+QUERY_CACHE_VERSION_CHECK_SEC = float(os.getenv("QUERY_CACHE_VERSION_CHECK_SEC", "1.0"))
+
+
+def fingerprint(vector):
+    """Stable hash of a query vector (float32 bytes)."""
+    return hashlib.sha1(np.ascontiguousarray(vector, dtype="float32").tobytes()).hexdigest()
+
+
+def _plain(res, include_values):
+    """A query response (dict or Pinecone object) as JSON-able data."""
+    matches = []
+    for m in res["matches"]:
+        match = {"id": m["id"], "score": float(m["score"])}
+        if m.get("metadata") is not None:
+            match["metadata"] = dict(m["metadata"])
+        if include_values and m.get("values") is not None:
+            match["values"] = [float(v) for v in m["values"]]
+        matches.append(match)
+    namespace = res.get("namespace", "") if isinstance(res, dict) else getattr(res, "namespace", "")
+    return {"matches": matches, "namespace": namespace or ""}
+
+
+class QueryCache:
+    """
+    Result cache in front of a vector index.
+
+    Wraps an index and answers ``query`` / ``query_many`` from an
+    in-memory LRU with a TTL, optionally backed by a SQLite file shared
+    by every worker process. Entries are keyed by the query vector's
+    fingerprint, ``top_k``, filter and include flags, and tagged with the
+    index version: once ingestion calls :func:`vector_store.bump_index_version`
+    every older entry is ignored (and the memory tier cleared). All other
+    attributes are passed through to the wrapped index.
+    """
+
+    def __init__(self, index, index_name=None, max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_SEC,
+                 shared=QUERY_CACHE_SHARED, path=QUERY_CACHE_PATH):
+        self.index = index
+        self.index_name = index_name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path if shared else None
+        self._memory = OrderedDict()  # key -> (stored_at, json)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._version = index_version(index_name)
+        self._version_checked = time.monotonic()
+        self.hits = self.misses = 0
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = self._db()
+            db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version INTEGER, "
+                       "stored_at REAL, value TEXT)")
+            db.commit()
+
+    def __getattr__(self, name):
+        if name == "index":
+            raise AttributeError(name)
+        return getattr(self.index, name)
+
+    # ---------- keys and versions ----------
+    def _db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def version(self):
+        now = time.monotonic()
+        if now - self._version_checked >= QUERY_CACHE_VERSION_CHECK_SEC:
+            self._version_checked = now
+            version = index_version(self.index_name)
+            if version != self._version:
+                with self._lock:
+                    self._memory.clear()
+                self._version = version
+                if self.path:
+                    try:
+                        db = self._db()
+                        db.execute("DELETE FROM results WHERE version < ?", (version,))
+                        db.commit()
+                    except sqlite3.Error as e:
+                        print(f"⚠️ Query cache cleanup failed: {e}")
+        return self._version
+
+    def key(self, vector, top_k, filter=None, include_metadata=False, include_values=False, namespace=None):
+        params = json.dumps([top_k, filter, bool(include_metadata), bool(include_values), namespace or ""],
+                            sort_keys=True, default=str)
+        return f"{fingerprint(vector)}:{hashlib.sha1(params.encode('utf-8')).hexdigest()[:16]}"
+
+    # ---------- tiers ----------
+    def _get(self, key, version):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.labels(cache="query", kind="query", result="memory_hit").inc()
+                return json.loads(entry[1])
+        if self.path:
+            try:
+                row = self._db().execute("SELECT stored_at, value FROM results WHERE key = ? AND version = ?",
+                                         (key, version)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None and now - row[0] <= self.ttl:
+                with self._lock:
+                    self.hits += 1
+                    self._remember(key, row[0], row[1])
+                CACHE_REQUESTS.labels(cache="query", kind="query", result="disk_hit").inc()
+                return json.loads(row[1])
+        with self._lock:
+            self.misses += 1
+        CACHE_REQUESTS.labels(cache="query", kind="query", result="miss").inc()
+        return None
+
+    def _remember(self, key, stored_at, value):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _put(self, key, version, result):
+        value = json.dumps(result)
+        now = time.time()
+        if version != self._version:
+            return  # index changed while we were querying; don't cache a stale answer
+        with self._lock:
+            self._remember(key, now, value)
+        if self.path:
+            try:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, version, now, value))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Query cache write failed: {e}")
+
+    # ---------- index API ----------
+    def query(self, vector=None, top_k=10, include_metadata=False, include_values=False, filter=None,
+              namespace=None, **kwargs):
+        if vector is None or kwargs:  # query by id, sparse vectors, ...: not cached
+            return self.index.query(vector=vector, top_k=top_k, include_metadata=include_metadata,
+                                    include_values=include_values, filter=filter, namespace=namespace, **kwargs)
+        version = self.version()
+        key = self.key(vector, top_k, filter, include_metadata, include_values, namespace)
+        result = self._get(key, version)
+        if result is None:
+            res = self.index.query(vector=vector, top_k=top_k, include_metadata=include_metadata,
+                                   include_values=include_values, filter=filter, namespace=namespace)
+            result = _plain(res, include_values)
+            self._put(key, version, result)
+        return result
+
+    def query_many(self, vectors, top_k=10, include_metadata=False, include_values=False, filter=None,
+                   namespace=None, **kwargs):
+        """Cached results per vector; the misses go to the index as one batch."""
+        if kwargs:  # same rule as query(): anything beyond the keyed arguments is not cached
+            return query_many(self.index, vectors, top_k=top_k, include_metadata=include_metadata,
+                              include_values=include_values, filter=filter, namespace=namespace, **kwargs)
+        version = self.version()
+        keys = [self.key(v, top_k, filter, include_metadata, include_values, namespace) for v in vectors]
+        out = [self._get(k, version) for k in keys]
+        missing = [i for i, r in enumerate(out) if r is None]
+        if missing:
+            fresh = query_many(self.index, [vectors[i] for i in missing], top_k=top_k,
+                               include_metadata=include_metadata, include_values=include_values,
+                               filter=filter, namespace=namespace)
+            for i, res in zip(missing, fresh):
+                out[i] = _plain(res, include_values)
+                self._put(keys[i], version, out[i])
+        return out
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._memory),
+                "index_version": self._version,
+                "shared": bool(self.path),
+            }
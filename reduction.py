@@ -0,0 +1,367 @@
+import os
+import io
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+from dotenv import load_dotenv
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+PROJECTION_DIR = os.getenv("PROJECTION_DIR",
+                           os.path.join(os.getenv("VECTOR_STORE_DIR", "vector_data"), "projections"))
+# Apply an index's stored projection in get_index (ingestion and queries alike)
+DIM_REDUCTION = os.getenv("DIM_REDUCTION", "1") == "1"
+REDUCTION_DIMS = os.getenv("REDUCTION_DIMS", "64,128,256,384,512,768")
+REDUCTION_SAMPLE = int(os.getenv("REDUCTION_SAMPLE", "50000"))  # rows the PCA is fitted on
+REDUCTION_EVAL_ROWS = int(os.getenv("REDUCTION_EVAL_ROWS", "100000"))
+# A projection is only installed if recall@k against full-dimension search stays above this
+REDUCTION_MIN_RECALL = float(os.getenv("REDUCTION_MIN_RECALL", "0.95"))
+
+METHODS = ("pca", "truncate")
+
+
+def _normalize(x):
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+# ----------------------------------------------
+# Projection artifact
+# ----------------------------------------------
+class Projection:
+    """
+    Linear map from model vectors to index vectors.
+
+    ``pca`` centres on the sample mean and projects onto the top principal
+    components; ``truncate`` keeps the first ``output_dim`` coordinates (for
+    Matryoshka-trained models, see ``train_similarity.py --matryoshka``).
+    Outputs are L2-normalised. Vectors that already have ``output_dim``
+    coordinates pass through unchanged, so re-importing an exported reduced
+    index is safe.
+    """
+
+    def __init__(self, method, input_dim, output_dim, mean=None, components=None, info=None):
+        if method not in METHODS:
+            raise ValueError(f"❌ Unknown reduction method '{method}' (use pca or truncate)")
+        if output_dim >= input_dim:
+            raise ValueError(f"❌ Target dimension {output_dim} must be below the model's {input_dim}")
+        self.method = method
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.mean = None if mean is None else np.asarray(mean, dtype="float32")
+        self.components = None if components is None else np.ascontiguousarray(components, dtype="float32")
+        self.info = dict(info or {})
+
+    @classmethod
+    def fit(cls, sample, output_dim, method="pca", info=None):
+        sample = _normalize(np.asarray(sample, dtype="float32"))
+        if method == "truncate":
+            return cls("truncate", sample.shape[1], output_dim, info=info)
+        mean = sample.mean(axis=0)
+        centered = sample - mean
+        # eigenvectors of the dim x dim covariance: cheaper than an SVD of the sample
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered / max(len(sample) - 1, 1))
+        order = np.argsort(eigenvalues)[::-1]
+        explained = float(eigenvalues[order[:output_dim]].sum() / max(eigenvalues.sum(), 1e-12))
+        info = {**(info or {}), "explained_variance": round(explained, 4), "fit_rows": len(sample)}
+        return cls("pca", sample.shape[1], output_dim, mean, eigenvectors[:, order[:output_dim]].T, info)
+
+    def apply(self, vectors):
+        """``(n, input_dim)`` (or one vector) -> normalised ``(n, output_dim)`` float32."""
+        x = np.atleast_2d(np.asarray(vectors, dtype="float32"))
+        if x.shape[1] == self.output_dim:
+            return x
+        if x.shape[1] != self.input_dim:
+            raise ValueError(f"❌ Vector dimension {x.shape[1]} does not match the projection "
+                             f"({self.input_dim} -> {self.output_dim})")
+        if self.method == "truncate":
+            return _normalize(x[:, :self.output_dim])
+        return _normalize((_normalize(x) - self.mean) @ self.components.T)
+
+    def describe(self):
+        return {"method": self.method, "input_dim": self.input_dim, "output_dim": self.output_dim, **self.info}
+
+    def save(self, index_name, root=PROJECTION_DIR):
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, f"{index_name}.npz")
+        arrays = {"meta": np.array(json.dumps(self.describe()))}
+        if self.method == "pca":
+            arrays.update(mean=self.mean, components=self.components)
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        with open(path + ".tmp", "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            mean = data["mean"] if "mean" in data else None
+            components = data["components"] if "components" in data else None
+        info = {k: v for k, v in meta.items() if k not in ("method", "input_dim", "output_dim")}
+        return cls(meta["method"], meta["input_dim"], meta["output_dim"], mean, components, info)
+
+
+def load_projection(index_name, root=PROJECTION_DIR):
+    """The projection stored for an index, or ``None``."""
+    path = os.path.join(root, f"{index_name}.npz")
+    return Projection.load(path) if os.path.exists(path) else None
+
+
+# ----------------------------------------------
+# Index wrapper
+# ----------------------------------------------
+class ProjectedIndex:
+    """
+    Applies a :class:`Projection` to everything written to or queried from
+    an index, so ingestion and query paths can't disagree on the space.
+    :func:`vector_store.get_index` returns one whenever a projection is
+    stored for the index. Other attributes pass through.
+    """
+
+    def __init__(self, index, projection):
+        self.index = index
+        self.projection = projection
+
+    def __getattr__(self, name):
+        if name == "index":
+            raise AttributeError(name)
+        return getattr(self.index, name)
+
+    def _reduce(self, vectors):
+        values = [v["values"] if isinstance(v, dict) else v[1] for v in vectors]
+        reduced = self.projection.apply(values)
+        out = []
+        for v, r in zip(vectors, reduced):
+            if isinstance(v, dict):
+                out.append({**v, "values": r.tolist()})
+            else:
+                out.append((v[0], r.tolist(), *v[2:]))
+        return out
+
+    def upsert(self, vectors, **kwargs):
+        vectors = list(vectors)
+        return self.index.upsert(vectors=self._reduce(vectors) if vectors else vectors, **kwargs)
+
+    def query(self, vector=None, **kwargs):
+        if vector is not None:
+            vector = self.projection.apply(vector)[0].tolist()
+        return self.index.query(vector=vector, **kwargs)
+
+    def query_many(self, vectors, **kwargs):
+        from vector_store import query_many
+        return query_many(self.index, self.projection.apply(vectors) if len(vectors) else vectors, **kwargs)
+
+
+# ----------------------------------------------
+# Recall / latency report
+# ----------------------------------------------
+def load_vectors(name, vectors_path=None):
+    """
+    Model-space vectors: an explicit ``.npy``, the index's embedding snapshot,
+    a local index's store, or (Pinecone) a snapshot exported from the index.
+    """
+    if vectors_path:
+        return np.load(vectors_path, mmap_mode="r"), None
+    from embedding_snapshot import open_snapshot, export_index
+    snapshot = open_snapshot(name)
+    if snapshot is not None:
+        return snapshot.vectors, snapshot
+    from vector_store import VECTOR_BACKEND, VECTOR_STORE_DIR, get_index
+    if VECTOR_BACKEND == "pinecone":
+        if load_projection(name) is not None:
+            raise FileNotFoundError(f"❌ '{name}' already holds reduced vectors and has no snapshot of the model-space "
+                                    f"ones; pass --vectors")
+        print(f"📥 No snapshot for '{name}'; exporting one from Pinecone (list + fetch of every vector)...")
+        snapshot = export_index(get_index(name), name)
+        return snapshot.vectors, snapshot
+    path = os.path.join(VECTOR_STORE_DIR, name, "vectors.npy")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ No snapshot or local vectors for '{name}' (run embedding_snapshot.py export "
+                                f"or pass --vectors)")
+    return np.load(path, mmap_mode="r"), None
+
+
+def split_queries(vectors, n_queries, limit=REDUCTION_EVAL_ROWS, seed=42):
+    """Held-out query rows and the remaining base rows (both normalised float32)."""
+    vectors = vectors[:limit] if limit else vectors
+    rng = np.random.default_rng(seed)
+    query_rows = np.sort(rng.choice(len(vectors), size=min(n_queries, len(vectors) // 10 or 1), replace=False))
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[query_rows] = False
+    base = _normalize(np.asarray(vectors, dtype="float32")[mask])
+    return base, _normalize(np.asarray(vectors[query_rows], dtype="float32"))
+
+
+def _recall(found, truth):
+    return float(np.mean([len(set(f.tolist()) & set(t.tolist())) / len(t) for f, t in zip(found, truth)]))
+
+
+def evaluate(base, queries, truth, projection, k, index_type=None, workdir=None):
+    """
+    recall@k of exact search in the reduced space against exact full-dimension
+    search, plus (with ``index_type``) recall and latency through a
+    :class:`vector_store.LocalIndex` built on the reduced vectors.
+    """
+    from quantization_report import exact_top_k
+    t0 = time.time()
+    rb = np.concatenate([projection.apply(base[i:i + 65536]) for i in range(0, len(base), 65536)])
+    rq = projection.apply(queries)
+    row = {
+        "method": projection.method,
+        "dim": projection.output_dim,
+        f"recall@{k}": round(_recall(exact_top_k(rb, rq, k), truth), 4),
+        "vectors_mb": round(rb.nbytes / 2 ** 20, 1),
+        "project_sec": round(time.time() - t0, 2),
+    }
+    if "explained_variance" in projection.info:
+        row["explained_variance"] = projection.info["explained_variance"]
+    if index_type:
+        row.update(_serve(rb, rq, truth, k, index_type, workdir, f"{projection.method}-{projection.output_dim}"))
+    return row
+
+
+def _serve(base, queries, truth, k, index_type, workdir, name):
+    from vector_store import LocalIndex
+    idx = LocalIndex(name, root=workdir, dimension=base.shape[1], index_type=index_type, quantization="none")
+    for i in range(0, len(base), 10000):
+        idx.upsert(vectors=[(str(i + j), vec, {}) for j, vec in enumerate(base[i:i + 10000])])
+    idx.query(vector=queries[0], top_k=k)  # build the FAISS structure outside the timing
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        res = idx.query(vector=q, top_k=k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append(np.array([int(m["id"]) for m in res["matches"]]))
+    return {f"ann_recall@{k}": round(_recall(found, truth), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3)}
+
+
+def report(base, queries, dims, methods=METHODS, k=10, sample=REDUCTION_SAMPLE, index_type="flat", model=None):
+    """One row per (method, dim) plus the full-dimension baseline."""
+    from quantization_report import exact_top_k
+    truth = exact_top_k(base, queries, k)
+    rng = np.random.default_rng(0)
+    fit_rows = base[np.sort(rng.choice(len(base), size=min(sample, len(base)), replace=False))]
+    workdir = tempfile.mkdtemp(prefix="reduction-report-")
+    try:
+        rows = [{"method": "none", "dim": base.shape[1], f"recall@{k}": 1.0,
+                 "vectors_mb": round(base.nbytes / 2 ** 20, 1)}]
+        if index_type:
+            rows[0].update(_serve(base, queries, truth, k, index_type, workdir, "full"))
+        for method in methods:
+            for dim in dims:
+                if dim >= base.shape[1]:
+                    continue
+                projection = Projection.fit(fit_rows, dim, method, info={"model": model})
+                rows.append(evaluate(base, queries, truth, projection, k, index_type, workdir))
+                print(f"   {method:<9}{dim:>5} dims: recall@{k} {rows[-1][f'recall@{k}']}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def print_report(rows, k):
+    ann = f"ann_recall@{k}" in rows[0]
+    print(f"\n{'method':<10}{'dim':>6}{'recall@' + str(k):>11}" + (f"{'ann@' + str(k):>9}{'p50 ms':>9}{'p99 ms':>9}"
+                                                               if ann else "") + f"{'vectors MB':>12}")
+    for r in rows:
+        print(f"{r['method']:<10}{r['dim']:>6}{r[f'recall@{k}']:>11}"
+              + (f"{r[f'ann_recall@{k}']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}" if ann else "")
+              + f"{r['vectors_mb']:>12}")
+
+
+def _matryoshka_dims(model):
+    """Dimensions a ``train_similarity.py --matryoshka`` model was trained to be truncated at."""
+    try:
+        with open(os.path.join(model or "", "matryoshka.json"), encoding="utf-8") as f:
+            return json.load(f)["dims"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reduce index vector dimensions (PCA / Matryoshka truncation).")
+    parser.add_argument("command", choices=["report", "fit", "info"])
+    parser.add_argument("--name", default=os.getenv("PINECONE_INDEX", "legal-cases"),
+                        help="Index whose snapshot (or local vectors) supplies the model-space vectors")
+    parser.add_argument("--vectors", help="Explicit .npy matrix of model vectors instead of the snapshot")
+    parser.add_argument("--dims", default=REDUCTION_DIMS, help="report: target dimensions")
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--dim", type=int, help="fit: target dimension")
+    parser.add_argument("--method", default="pca", choices=METHODS)
+    parser.add_argument("--target", help="fit: index to install the projection on (default <name>-<dim>)")
+    parser.add_argument("--min-recall", type=float, default=REDUCTION_MIN_RECALL)
+    parser.add_argument("--force", action="store_true", help="fit: install even below --min-recall")
+    parser.add_argument("--rebuild", action="store_true", help="fit: load the snapshot into the target index")
+    parser.add_argument("--index-type", default="flat", help="report: LocalIndex type for latency ('' to skip)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=REDUCTION_EVAL_ROWS, help="Evaluate on at most this many rows")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--out", help="report: write the rows as JSON")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        projection = load_projection(args.target or args.name)
+        print(json.dumps(projection.describe() if projection else None, indent=2))
+        raise SystemExit(0)
+
+    vectors, snapshot = load_vectors(args.name, args.vectors)
+    model = snapshot.meta.get("model") if snapshot else None
+    base, queries = split_queries(vectors, args.queries, args.limit)
+    print(f"📊 {len(base):,} base vectors x {base.shape[1]} dims, {len(queries)} held-out queries, k={args.k}")
+    trained = _matryoshka_dims(model)
+    truncating = args.method == "truncate" if args.command == "fit" else "truncate" in args.methods
+    if truncating and not trained:
+        print("⚠️ The model has no matryoshka.json: truncation will likely lose much more recall than PCA")
+
+    if args.command == "report":
+        dims = [int(d) for d in args.dims.split(",") if d.strip()]
+        rows = report(base, queries, dims, args.methods.split(","), args.k, index_type=args.index_type or None,
+                      model=model)
+        print_report(rows, args.k)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+            print(f"\n✅ Report written to {args.out}")
+    else:
+        if not args.dim:
+            raise SystemExit("❌ fit needs --dim")
+        target = args.target or f"{args.name}-{args.dim}"
+        if target == args.name:
+            raise SystemExit("❌ Reducing an index in place would mix dimensions; build --target and switch "
+                             "APP_INDEX to it")
+        from quantization_report import exact_top_k
+        rng = np.random.default_rng(0)
+        fit_rows = base[np.sort(rng.choice(len(base), size=min(REDUCTION_SAMPLE, len(base)), replace=False))]
+        projection = Projection.fit(fit_rows, args.dim, args.method,
+                                    info={"model": model, "source": args.name, "fitted_at": time.time()})
+        row = evaluate(base, queries, exact_top_k(base, queries, args.k), projection, args.k)
+        recall = row[f"recall@{args.k}"]
+        projection.info[f"recall@{args.k}"] = recall
+        print(f"🔎 {args.method} {base.shape[1]} -> {args.dim}: recall@{args.k} {recall} (guard {args.min_recall})")
+        if recall < args.min_recall and not args.force:
+            raise SystemExit(f"❌ Recall {recall} below {args.min_recall}; not installed "
+                             f"(use a larger --dim or --force)")
+        print(f"✅ Projection saved to {projection.save(target)}")
+
+        if args.rebuild:
+            if snapshot is None:
+                raise SystemExit("❌ --rebuild needs an embedding snapshot (ids + metadata) for --name")
+            from embedding_snapshot import import_snapshot
+            from vector_store import get_index, flush, bump_index_version
+            t0 = time.time()
+            index = get_index(target, dimension=snapshot.dimension, metric=snapshot.meta.get("metric", "cosine"))
+            stats = import_snapshot(snapshot, index)
+            flush(index)
+            bump_index_version(target)
+            print(f"✅ Rebuilt '{target}' ({len(snapshot):,} vectors, {args.dim} dims) in {time.time() - t0:.1f}s: "
+                  f"{stats}")
+        print(f"➡️ Set APP_INDEX={target} (and PINECONE_INDEX for ingestion) to serve the reduced index")
@@ -1,35 +1,24 @@
 import os
-import time
 import gzip
 import base64
-import concurrent.futures
-from tqdm import tqdm
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
+from vector_store import get_index, flush, bump_index_version
+from chunk_retrieval import RETRIEVAL_MODE, chunk_units
+from ingest_pipeline import print_report
+from ingest_manifest import IngestManifest, incremental_ingest
+from utils import chunk_document
 from PyPDF2 import PdfReader
 
 # ------------------------------
 # 1️⃣ Load Environment
 # ------------------------------
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX", "legal-cases")
 MODEL_NAME = os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
 UPLOADS_DIR = "uploads/filesssss"
 
 # ------------------------------
-# 2️⃣ Initialize Model + Pinecone
-# ------------------------------
-print("🔹 Connecting to Pinecone...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
-
-print("🔹 Loading model...")
-model = SentenceTransformer(MODEL_NAME)
-
-# ------------------------------
-# 3️⃣ Helper Functions
+# 2️⃣ Helper Functions (run inside extraction worker processes)
 # ------------------------------
 def extract_text_from_pdf(pdf_path):
     try:
@@ -43,57 +32,64 @@ def compress_text(text):
     """Compress extracted text to save bandwidth."""
     return base64.b64encode(gzip.compress(text.encode("utf-8"))).decode("utf-8")
 
-def process_pdf(pdf_path):
+def extract_units(pdf_path):
+    """Return ``(vector_id, text, metadata)`` units for one PDF (one per chunk in chunk mode)."""
     filename = os.path.basename(pdf_path)
     doc_id = os.path.splitext(filename)[0]
     text = extract_text_from_pdf(pdf_path)
     if not text:
-        return None
-    vector = model.encode(text).tolist()
+        return []
 
-    compressed_preview = compress_text(text[:3000])  # compress first 3k chars
     metadata = {
         "filename": filename,
-        "text_preview": compressed_preview,
         "local_path": pdf_path.replace("\\", "/"),
     }
-    return {"id": doc_id, "values": vector, "metadata": metadata}
+    if RETRIEVAL_MODE == "chunk":
+        return chunk_units(doc_id, chunk_document(text) or [text], metadata)
 
-# ------------------------------
-# 4️⃣ Collect all PDFs
-# ------------------------------
-all_pdfs = []
-for root, _, files in os.walk(UPLOADS_DIR):
-    for f in files:
-        if f.lower().endswith(".pdf"):
-            all_pdfs.append(os.path.join(root, f))
-print(f"📁 Found {len(all_pdfs)} PDFs to index.")
+    metadata["text_preview"] = compress_text(text[:3000])  # compress first 3k chars
+    return [(doc_id, text, metadata)]
+
+def collect_pdfs(folder):
+    all_pdfs = []
+    for root, _, files in os.walk(folder):
+        for f in files:
+            if f.lower().endswith(".pdf"):
+                all_pdfs.append(os.path.join(root, f))
+    return all_pdfs
 
 # ------------------------------
-# 5️⃣ Fast Multi-thread + Batching
+# 3️⃣ Incremental staged pipeline: only new/changed PDFs are extracted and encoded
 # ------------------------------
-start = time.time()
-batch_size = 100
-to_upsert, done, skipped = [], 0, 0
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Incrementally (re)index case PDFs.")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and reindex every PDF")
+    args = parser.parse_args()
+
+    print("🔹 Connecting to vector index...")
+    index = get_index(INDEX_NAME)
+    manifest = IngestManifest(INDEX_NAME)
+
+    all_pdfs = collect_pdfs(UPLOADS_DIR)
+    print(f"📁 Found {len(all_pdfs)} PDFs under {UPLOADS_DIR}.")
 
-with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-    for record in tqdm(executor.map(process_pdf, all_pdfs), total=len(all_pdfs)):
-        if record:
-            to_upsert.append(record)
-            if len(to_upsert) >= batch_size:
-                index.upsert(vectors=to_upsert)
-                done += len(to_upsert)
-                to_upsert = []
-        else:
-            skipped += 1
+    def make_encode_fn():
+        from encoder import load_encoder
+        print("🔹 Loading model...")
+        model = load_encoder(MODEL_NAME)
+        return lambda texts: model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                          show_progress_bar=False)
 
-if to_upsert:
-    index.upsert(vectors=to_upsert)
-    done += len(to_upsert)
+    report, plan = incremental_ingest(index, manifest, all_pdfs, UPLOADS_DIR, extract_units, make_encode_fn,
+                                      MODEL_NAME, RETRIEVAL_MODE, full=args.full)
+    flush(index)
+    if plan["todo"] or plan["removed"]:
+        bump_index_version(INDEX_NAME)
+    if report:
+        print_report(report)
+    else:
+        print("✅ Index already up to date.")
 
-end = time.time()
-print("\n===============================")
-print(f"🎉 FAST Reindex completed in {end - start:.2f} sec")
-print(f"✅ Indexed: {done}")
-print(f"⚠️ Skipped (no text): {skipped}")
-print("===============================")
+if __name__ == "__main__":
+    main()
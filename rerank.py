@@ -1,46 +1,297 @@
 import os
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer, util
+import gzip
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from encoder import load_encoder
+from vector_store import get_index
+from chunk_retrieval import doc_id_of
+
+load_dotenv()
 
-# Load environment variables
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = "legal-cases"   # 👈 keep this same as your Pinecone index name
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+# Initialize the vector index (Pinecone or local FAISS)
+index = get_index(INDEX_NAME)
 
 # ✅ Use a model that outputs 1024-dimension embeddings
 MODEL_NAME = "intfloat/e5-large-v2"
-sim_model = SentenceTransformer(MODEL_NAME)
+sim_model = load_encoder(MODEL_NAME)
+
+# ----------------------------------------------
+# Second stage: cross-encoder over an over-fetched candidate set
+# ----------------------------------------------
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "400"))
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "2000"))  # cross-encoders truncate at ~512 tokens anyway
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+_warm_up_started = False
+_warm_up_lock = threading.Lock()  # not the load lock: a request must not wait on a loading model
+_per_pair_sec = None  # last measured cross-encoder cost per pair, so a query can budget its first batch
+
+
+def get_cross_encoder():
+    global _cross_encoder
+    with _cross_encoder_lock:
+        if _cross_encoder is None:
+            from sentence_transformers import CrossEncoder
+            _cross_encoder = CrossEncoder(RERANK_MODEL, max_length=512)
+    return _cross_encoder
+
+
+def warm_up():
+    """Load the cross-encoder and run one pair through it (first calls are much slower)."""
+    global _warm_up_started
+    try:
+        get_cross_encoder().predict([("warm-up", "warm-up")], show_progress_bar=False)
+        print(f"✅ Cross-encoder ready: {RERANK_MODEL}")
+    except Exception as e:
+        print(f"⚠️ Cross-encoder warm-up failed (reranking skipped until it loads): {e}")
+        with _warm_up_lock:
+            _warm_up_started = False  # the next rerank call retries
+
+
+def start_warm_up():
+    """Warm up in a background thread, once; :func:`rerank` never loads the model itself."""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up, name="rerank-warm-up", daemon=True).start()
+
+
+start_warm_up()
+
+
+class PairScoreCache:
+    """LRU of cross-encoder scores keyed by a hash of (model, query, passage)."""
+
+    def __init__(self, max_items=RERANK_CACHE_SIZE):
+        self.max_items = max_items
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query, passage):
+        h = hashlib.sha256()
+        for part in (RERANK_MODEL, query, passage):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._scores.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key, score):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_items:
+                self._scores.popitem(last=False)
+
+
+pair_cache = PairScoreCache()
+
+
+def passage_text(metadata):
+    """Best available passage for a match: chunk text, then the compressed preview."""
+    if metadata.get("text"):
+        return metadata["text"][:RERANK_MAX_CHARS]
+    preview = metadata.get("text_preview")
+    if preview:
+        try:
+            return gzip.decompress(base64.b64decode(preview)).decode("utf-8")[:RERANK_MAX_CHARS]
+        except Exception:
+            pass
+    return metadata.get("summary") or metadata.get("filename") or ""
+
 
-def semantic_search_and_rerank(query, top_k=3):
+def rerank(query, candidates, budget_ms=RERANK_BUDGET_MS, batch_size=RERANK_BATCH_SIZE):
     """
-    Search for semantically similar cases in Pinecone and rerank them.
+    Score ``(query, passage)`` pairs for first-stage ``candidates`` (sorted by
+    ANN score) with the cross-encoder, in batches, within ``budget_ms``.
+
+    Cached pairs are free. Uncached pairs are scored best-first; once the next
+    batch would overrun the budget, the remaining candidates keep their
+    first-stage order behind the reranked ones. The model load is never paid
+    inside the budget: until warm-up has finished, uncached candidates keep
+    their first-stage order. Returns ``(ranked, stats)``.
     """
+    global _per_pair_sec
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000.0
+    keys = [pair_cache.key(query, c["text"]) for c in candidates]
+    scores = [pair_cache.get(k) for k in keys]
+    cached = sum(s is not None for s in scores)
+    todo = [i for i, s in enumerate(scores) if s is None and candidates[i]["text"]]
+
+    model = _cross_encoder
+    if todo and model is None:
+        start_warm_up()
+    per_pair = _per_pair_sec
+    scored = 0
+    for start in range(0, len(todo) if model is not None else 0, batch_size):
+        batch = todo[start:start + batch_size]
+        now = time.perf_counter()
+        if now + (per_pair or 0.0) * len(batch) > deadline:
+            break
+        t0 = time.perf_counter()
+        values = model.predict([(query, candidates[i]["text"]) for i in batch], batch_size=len(batch),
+                               show_progress_bar=False)
+        per_pair = _per_pair_sec = (time.perf_counter() - t0) / len(batch)
+        for i, value in zip(batch, values):
+            scores[i] = float(value)
+            pair_cache.put(keys[i], scores[i])
+        scored += len(batch)
+
+    head = [dict(c, rerank_score=s) for c, s in zip(candidates, scores) if s is not None]
+    tail = [dict(c, rerank_score=None) for c, s in zip(candidates, scores) if s is None]
+    head.sort(key=lambda c: c["rerank_score"], reverse=True)
+    stats = {
+        "candidates": len(candidates),
+        "cached": cached,
+        "scored": scored,
+        "unscored": len(tail),
+        "budget_exhausted": model is not None and scored < len(todo),
+        "model_loading": model is None and bool(todo),
+        "rerank_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    return head + tail, stats
+
+
+def first_stage(query, candidates=RERANK_CANDIDATES):
+    """Over-fetch ``candidates`` matches from the vector index, best ANN score first."""
     # 1️⃣ Encode the query into 1024-dimensional vector
     query_vector = sim_model.encode(query).tolist()
 
-    # 2️⃣ Query Pinecone index
+    # 2️⃣ Query the vector index
     search_response = index.query(
         vector=query_vector,
-        top_k=top_k,
+        top_k=candidates,
         include_metadata=True
     )
+    out = []
+    for match in search_response.get("matches", []):
+        metadata = match.get("metadata") or {}
+        out.append({
+            "id": match["id"],
+            "doc_id": doc_id_of(match),
+            "text": passage_text(metadata),
+            "score": match.get("score", 0.0),
+        })
+    out.sort(key=lambda c: c["score"], reverse=True)
+    return out
 
-    # 3️⃣ Extract and structure the results
-    matches = search_response.get("matches", [])
-    if not matches:
-        return [{"text": "No similar cases found", "score": 0.0}]
 
+def semantic_search_and_rerank(query, top_k=3, candidates=RERANK_CANDIDATES, budget_ms=RERANK_BUDGET_MS,
+                               return_stats=False):
+    """
+    Search for semantically similar cases in the vector index and rerank them.
+
+    Results carry the cross-encoder ``score`` (or the ANN score where the time
+    budget ran out) plus the original ``ann_score``.
+    """
+    t0 = time.perf_counter()
+    pool = first_stage(query, max(candidates, top_k))
+    ann_ms = (time.perf_counter() - t0) * 1000
+    if not pool:
+        results = [{"text": "No similar cases found", "score": 0.0}]
+        return (results, {"ann_ms": round(ann_ms, 2)}) if return_stats else results
+
+    ranked, stats = rerank(query, pool, budget_ms=budget_ms)
+    stats["ann_ms"] = round(ann_ms, 2)
+
+    # 3️⃣ Extract and structure the results
     results = []
-    for match in matches:
-        metadata = match.get("metadata", {})
+    for c in ranked[:top_k]:
         results.append({
-            "text": metadata.get("text", "No text found"),
-            "score": match.get("score", 0.0)
+            "id": c["id"],
+            "doc_id": c["doc_id"],
+            "text": c["text"] or "No text found",
+            "score": c["rerank_score"] if c["rerank_score"] is not None else c["score"],
+            "ann_score": c["score"],
+            "reranked": c["rerank_score"] is not None,
         })
+    return (results, stats) if return_stats else results
+
+
+# ----------------------------------------------
+# Report: precision gain vs latency cost of the second stage
+# ----------------------------------------------
+def _precision(doc_ids, relevant, k):
+    seen, top = set(), []
+    for d in doc_ids:  # several chunks of one case count once
+        if d not in seen:
+            seen.add(d)
+            top.append(d)
+        if len(top) == k:
+            break
+    return sum(d in relevant for d in top) / k
+
+
+def evaluate(path, k=5, candidates=RERANK_CANDIDATES, budget_ms=RERANK_BUDGET_MS):
+    """
+    Compare first-stage and reranked precision@k on a JSONL file of
+    ``{"query": ..., "relevant": [doc_id, ...]}`` lines.
+    """
+    import numpy as np
+    with open(path, encoding="utf-8") as f:
+        labelled = [json.loads(line) for line in f if line.strip()]
+
+    p_ann, p_rerank, ann_ms, rerank_ms, degraded = [], [], [], [], 0
+    for item in labelled:
+        relevant = set(item["relevant"])
+        t0 = time.perf_counter()
+        pool = first_stage(item["query"], candidates)
+        ann_ms.append((time.perf_counter() - t0) * 1000)
+        ranked, stats = rerank(item["query"], pool, budget_ms=budget_ms)
+        rerank_ms.append(stats["rerank_ms"])
+        degraded += stats["budget_exhausted"]
+        p_ann.append(_precision([c["doc_id"] for c in pool], relevant, k))
+        p_rerank.append(_precision([c["doc_id"] for c in ranked], relevant, k))
+
+    return {
+        "queries": len(labelled),
+        "k": k,
+        "candidates": candidates,
+        "budget_ms": budget_ms,
+        f"precision@{k}_ann": round(float(np.mean(p_ann)), 4),
+        f"precision@{k}_rerank": round(float(np.mean(p_rerank)), 4),
+        "precision_gain": round(float(np.mean(p_rerank) - np.mean(p_ann)), 4),
+        "ann_p50_ms": round(float(np.percentile(ann_ms, 50)), 2),
+        "rerank_p50_ms": round(float(np.percentile(rerank_ms, 50)), 2),
+        "rerank_p95_ms": round(float(np.percentile(rerank_ms, 95)), 2),
+        "budget_exhausted": degraded,
+        "pair_cache_hits": pair_cache.hits,
+        "pair_cache_misses": pair_cache.misses,
+    }
+
 
-    # 4️⃣ Sort high → low by score
-    results = sorted(results, key=lambda x: x["score"], reverse=True)
-    return results
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure precision gain and latency cost of cross-encoder reranking.")
+    parser.add_argument("labels", help='JSONL of {"query": ..., "relevant": [doc_id, ...]}')
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES)
+    parser.add_argument("--budget-ms", type=float, default=RERANK_BUDGET_MS)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.labels, args.k, args.candidates, args.budget_ms), indent=2))
@@ -1,39 +1,35 @@
-import kagglehub
 import os
-import zipfile
+import sys
+import argparse
+import kagglehub
 from tqdm import tqdm
-import PyPDF2
-
-print("Downloading dataset from Kaggle...")
-path = kagglehub.dataset_download("adarshsingh0903/legal-dataset-sc-judgments-india-19502024")
-print("✅ Downloaded dataset at:", path)
-
-os.makedirs("kaggle_data", exist_ok=True)
-os.makedirs("kaggle_texts", exist_ok=True)
-
-# Extract PDFs if zipped
-for file in os.listdir(path):
-    if file.endswith(".zip"):
-        zip_path = os.path.join(path, file)
-        print("Extracting:", zip_path)
-        with zipfile.ZipFile(zip_path, 'r') as zf:
-            zf.extractall("kaggle_data")
-
-# Convert PDFs → text
-pdf_dir = "kaggle_data"
-txt_dir = "kaggle_texts"
-
-for pdf_file in tqdm(os.listdir(pdf_dir), desc="Converting PDFs to text"):
-    if pdf_file.lower().endswith(".pdf"):
-        pdf_path = os.path.join(pdf_dir, pdf_file)
-        txt_path = os.path.join(txt_dir, pdf_file.replace(".pdf", ".txt"))
-        try:
-            with open(pdf_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                text = "".join(page.extract_text() or "" for page in reader.pages)
-            with open(txt_path, "w", encoding="utf-8") as out:
-                out.write(text)
-        except Exception as e:
-            print(f"❌ Failed {pdf_file}: {e}")
-
-print("✅ All PDFs converted to text in:", txt_dir)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from corpus_shards import CORPUS_DIR, CORPUS_WORKERS, CorpusReader, convert, iter_pdf_sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the Kaggle SC judgments and convert them to text shards.")
+    parser.add_argument("--path", help="Already downloaded dataset (zips / PDFs); skips the download")
+    parser.add_argument("--out", default=CORPUS_DIR, help="Corpus directory (gzip JSONL shards + index.sqlite)")
+    parser.add_argument("--workers", type=int, default=CORPUS_WORKERS)
+    args = parser.parse_args()
+
+    path = args.path
+    if not path:
+        print("Downloading dataset from Kaggle...")
+        path = kagglehub.dataset_download("adarshsingh0903/legal-dataset-sc-judgments-india-19502024")
+        print("✅ Downloaded dataset at:", path)
+
+    # PDFs are read straight out of the zips (no extracted copy) and parsed in a process pool
+    total = sum(1 for _ in iter_pdf_sources([path]))
+    print(f"📄 {total:,} PDFs found; converting with {args.workers} workers into {args.out}")
+    with tqdm(total=total, desc="Converting PDFs to text shards") as progress:
+        counts = convert([path], root=args.out, workers=args.workers, progress=progress)
+
+    print(f"📊 {counts}")
+    print(f"✅ Corpus ready in {args.out}: {CorpusReader(args.out).stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,250 @@
 import os
+import sys
+import json
+import time
+import argparse
+from contextlib import nullcontext
 import pandas as pd
 from tqdm import tqdm
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_store import VECTOR_STORE_DIR, get_index, flush, bump_index_version
+from bulk_writer import BulkWriter
+from chunk_retrieval import RETRIEVAL_MODE, ENCODE_BATCH_SIZE, chunk_units
+from lexical_index import LEXICAL_INDEX, WrittenUnits, get_lexical_index
+from embedding_snapshot import EMBEDDING_SNAPSHOT, SnapshotWriter
+from app_config import EMBED_MODEL
+from corpus_shards import CorpusReader
+
 # -------------------------------
 # STEP 1: Load environment variables
 # -------------------------------
 load_dotenv()
 
-api_key = os.getenv("PINECONE_API_KEY")
 index_name = os.getenv("PINECONE_INDEX", "legal-cases")
-model_name = os.getenv("MODEL_NAME", "llama-text-embed-v2")
+dataset_path = os.getenv("KAGGLE_DATASET_DIR", os.path.join(
+    os.path.expanduser("~"),
+    "kagglehub/datasets/adarshsingh0903/legal-dataset-sc-judgments-india-19502024"
+))
+# Rows parsed per step: bounds memory whatever the size of the CSV
+CSV_CHUNK_ROWS = int(os.getenv("KAGGLE_CSV_CHUNK_ROWS", "2000"))
+# The encoder truncates long inputs anyway; don't tokenize a whole judgment for one vector
+DOCUMENT_MAX_CHARS = int(os.getenv("KAGGLE_DOCUMENT_MAX_CHARS", "5000"))
 
-if not api_key:
-    raise ValueError("⚠️ Set your PINECONE_API_KEY in environment variables first.")
+TEXT_COLUMNS = ("judgment_text", "text")
+META_COLUMNS = ("case_title", "date", "court")
 
-# -------------------------------
-# STEP 2: Initialize Pinecone
-# -------------------------------
-pc = Pinecone(api_key=api_key)
-
-# Check if index exists, if not — create one
-if index_name not in [i["name"] for i in pc.list_indexes()]:
-    print(f"🆕 Creating Pinecone index '{index_name}' ...")
-    pc.create_index(
-        name=index_name,
-        dimension=1024,  # since you’re using llama-text-embed-v2 (1024-dim)
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-else:
-    print(f"✅ Index '{index_name}' already exists!")
-
-index = pc.Index(index_name)
 
 # -------------------------------
-# STEP 3: Load your Kaggle dataset
+# STEP 2: Resumable checkpoint (row offset per CSV + index)
 # -------------------------------
-dataset_path = os.path.join(
-    os.path.expanduser("~"),
-    "kagglehub/datasets/adarshsingh0903/legal-dataset-sc-judgments-india-19502024"
-)
+class Checkpoint:
+    """Rows of a CSV already written to the index; saved atomically after every CSV chunk."""
+
+    def __init__(self, csv_path, index_name, append_only=False):
+        self.path = os.path.join(VECTOR_STORE_DIR, "checkpoints", f"kaggle-{index_name}.json")
+        self.source = {"csv": os.path.abspath(csv_path)}
+        if not append_only:  # a rewritten CSV invalidates the offset; a growing shard corpus does not
+            stat = os.stat(csv_path)
+            self.source.update(size=stat.st_size, mtime=stat.st_mtime)
+        self.state = {"rows_done": 0, "vectors": 0, "skipped": 0, "failed": 0}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("source") == self.source:
+                self.state.update(saved["state"])
+            else:
+                print("⚠️ CSV changed since the last run; starting from the first row")
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    @property
+    def rows_done(self):
+        return self.state["rows_done"]
+
+    def save(self, **counts):
+        for key, value in counts.items():
+            self.state[key] += value
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "state": self.state, "saved_at": time.time()}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def reset(self):
+        self.state = {"rows_done": 0, "vectors": 0, "skipped": 0, "failed": 0}
+        self.save()
 
-# Try to detect CSV
-csv_files = [f for f in os.listdir(dataset_path) if f.endswith(".csv")]
-if not csv_files:
-    raise FileNotFoundError("❌ No CSV files found in dataset path.")
-csv_path = os.path.join(dataset_path, csv_files[0])
-
-print(f"📄 Loading dataset: {csv_path}")
-df = pd.read_csv(csv_path)
-
-# Just pick a sample subset for now (to test)
-df = df.sample(n=min(100, len(df)), random_state=42).reset_index(drop=True)
 
 # -------------------------------
-# STEP 4: Load embedding model
+# STEP 3: Rows -> (vector_id, text, metadata) units
 # -------------------------------
-print("⚙️ Loading embedding model...")
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-print("✅ Model loaded successfully!")
+def find_csv(path):
+    if os.path.isfile(path):
+        return path
+    csv_files = sorted(f for f in os.listdir(path) if f.endswith(".csv"))
+    if not csv_files:
+        raise FileNotFoundError("❌ No CSV files found in dataset path.")
+    return os.path.join(path, csv_files[0])
+
+
+def row_units(row_number, row, text_column):
+    text = row.get(text_column)
+    text = "" if pd.isna(text) else str(text)
+    if not text.strip():
+        return []
+    doc_id = row.get("doc_id") or f"case-{row_number}"
+    metadata = {col: ("" if pd.isna(row.get(col)) else str(row.get(col))) for col in META_COLUMNS if col in row}
+    metadata["title"] = metadata.pop("case_title", "") or f"Case {row_number}"
+    if RETRIEVAL_MODE == "chunk":
+        from chunker import chunk_text
+        return chunk_units(doc_id, chunk_text(text) or [text[:DOCUMENT_MAX_CHARS]], metadata)
+    metadata["text"] = text[:1000]  # store first 1000 chars as preview
+    return [(doc_id, text[:DOCUMENT_MAX_CHARS], metadata)]
+
+
+def shard_frames(root, chunk_rows):
+    """Documents from a text-shard corpus (scripts/download_kaggle_dataset.py) as CSV-like frames."""
+    batch = []
+    for record in CorpusReader(root):
+        batch.append({"doc_id": record["doc_id"], "judgment_text": record["text"],
+                      "date": str(record.get("year") or ""), "case_title": record["doc_id"]})
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def commit(writer, index, checkpoint, counts):
+    """
+    Drain the writer and persist the index, then record the chunk as done;
+    a crash before the checkpoint is saved redoes the chunk.
+    """
+    failed = len(writer.flush())  # in the dead-letter file; replay from there
+    flush(index)  # a local index only reaches disk here; never checkpoint ahead of it
+    checkpoint.save(rows_done=counts["rows_done"], vectors=counts["vectors"] - failed,
+                    skipped=counts["skipped"], failed=failed)
+
 
 # -------------------------------
-# STEP 5: Generate embeddings & push to Pinecone
+# STEP 4: Stream the CSV: parse a chunk, encode it in batches while the previous one uploads
 # -------------------------------
-print("🚀 Generating embeddings and uploading to Pinecone...")
-
-for i, row in tqdm(df.iterrows(), total=len(df)):
-    text = str(row.get("judgment_text") or row.get("text") or "")
-    if not text.strip():
-        continue
-
-    # Create embedding vector (1024-dimension expected)
-    vector = embedder.encode(text).tolist()
-
-    # If dimension mismatch, pad/truncate to 1024
-    if len(vector) < 1024:
-        vector = vector + [0.0] * (1024 - len(vector))
-    elif len(vector) > 1024:
-        vector = vector[:1024]
-
-    # Upsert to Pinecone
-    index.upsert(vectors=[
-        {
-            "id": f"case-{i}",
-            "values": vector,
-            "metadata": {
-                "title": str(row.get("case_title") or f"Case {i}"),
-                "date": str(row.get("date") or ""),
-                "court": str(row.get("court") or ""),
-                "text": text[:1000]  # store first 1000 chars as preview
-            }
-        }
-    ])
-
-print("✅ All data uploaded successfully to Pinecone!")
+def main():
+    parser = argparse.ArgumentParser(description="Stream the Kaggle SC judgments CSV into the vector index.")
+    parser.add_argument("--csv", default=dataset_path, help="CSV file or the dataset directory containing it")
+    parser.add_argument("--shards", help="Read a text-shard corpus directory instead of the CSV")
+    parser.add_argument("--index", default=index_name)
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--chunk-rows", type=int, default=CSV_CHUNK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=ENCODE_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many rows (0 = whole file)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from row 0")
+    args = parser.parse_args()
+
+    # shards are append-only and read in a fixed order, so the row offset checkpoint works for both
+    csv_path = os.path.join(args.shards, "index.sqlite") if args.shards else find_csv(args.csv)
+    checkpoint = Checkpoint(csv_path, args.index, append_only=bool(args.shards))
+    if args.restart:
+        checkpoint.reset()
+
+    if args.shards:
+        text_column = "judgment_text"
+    else:
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+        text_column = next((c for c in TEXT_COLUMNS if c in columns), None)
+        if text_column is None:
+            raise ValueError(f"❌ No text column ({' / '.join(TEXT_COLUMNS)}) in {columns}")
+        usecols = [text_column] + [c for c in META_COLUMNS if c in columns]
+
+    from encoder import load_encoder
+    print(f"⚙️ Loading embedding model {args.model}...")
+    model = load_encoder(args.model)
+    dimension = model.get_sentence_embedding_dimension()
+    print(f"✅ Model loaded ({dimension} dims)")
+
+    index = get_index(args.index, dimension=dimension)  # native dimension, no zero-padding
+    lexical = get_lexical_index(args.index) if LEXICAL_INDEX else None
+    feed = WrittenUnits(lexical) if lexical else None
+    # rows re-read from the CSV replace their snapshot rows; anything else in the current snapshot is carried over
+    snapshot = SnapshotWriter(args.index, model=args.model) if EMBEDDING_SNAPSHOT else None
+
+    def on_written(batch):
+        if snapshot:
+            snapshot.add_records(batch)
+        if feed:
+            feed.written(batch)
+
+    writer = BulkWriter(index, on_written=on_written)
+    print(f"✅ Using index '{args.index}'")
+
+    start_row = checkpoint.rows_done
+    if start_row:
+        print(f"⏩ Resuming after row {start_row:,} ({checkpoint.state['vectors']:,} vectors already written)")
+        if snapshot:
+            print("⚠️ Rows written by the interrupted run are not in the embedding snapshot; "
+                  "run `python embedding_snapshot.py export` afterwards for a complete one")
+    print(f"📄 Streaming {args.shards or csv_path} in chunks of {args.chunk_rows:,} rows")
+
+    started = time.time()
+    rows_seen = vectors_written = 0
+    in_flight = None
+    progress = tqdm(unit="rows", initial=start_row)
+    if args.shards:
+        reader = shard_frames(args.shards, args.chunk_rows)
+    else:
+        reader = pd.read_csv(csv_path, usecols=usecols, chunksize=args.chunk_rows)
+    with snapshot or nullcontext():  # published at the end, removed if the run fails
+        offset = 0
+        for frame in reader:
+            first_row, offset = offset, offset + len(frame)
+            if offset <= start_row:
+                continue  # already indexed: parsed, but never encoded again
+            if first_row < start_row:
+                frame = frame.iloc[start_row - first_row:]
+                first_row = start_row
+            if args.limit and first_row - start_row >= args.limit:
+                break
+            if args.limit:
+                frame = frame.iloc[:args.limit - (first_row - start_row)]
+
+            units = []
+            for i, row in enumerate(frame.to_dict("records")):
+                units.extend(row_units(first_row + i, row, text_column))
+            skipped = len(frame) - len({u[2].get("doc_id", u[0]) for u in units})
+
+            vectors = model.encode([u[1] for u in units], batch_size=args.batch_size, convert_to_numpy=True,
+                                   show_progress_bar=False) if units else []
+            records = [{"id": vid, "values": vec.tolist(), "metadata": meta}
+                       for (vid, _, meta), vec in zip(units, vectors)]
+            # wait for the previous chunk's uploads (they overlapped this chunk's encoding), then checkpoint it
+            if in_flight:
+                commit(writer, index, checkpoint, in_flight)
+            if feed:
+                feed.extracted(units)  # BM25 terms are added once their vectors are written
+            writer.add_many(records)
+            in_flight = {"rows_done": len(frame), "vectors": len(records), "skipped": skipped}
+
+            rows_seen += len(frame)
+            vectors_written += len(records)
+            progress.update(len(frame))
+            elapsed = max(time.time() - started, 1e-9)
+            progress.set_postfix(rows_s=f"{rows_seen / elapsed:.1f}", vectors_s=f"{vectors_written / elapsed:.1f}",
+                                 failed=checkpoint.state["failed"])
+            del frame, units, vectors, records
+        progress.close()
+        if in_flight:
+            commit(writer, index, checkpoint, in_flight)
+
+    print(f"📊 Upsert stats: {writer.close()}")
+    if lexical:
+        lexical.build()
+    if vectors_written:
+        bump_index_version(args.index)
+    elapsed = max(time.time() - started, 1e-9)
+    print(f"✅ {rows_seen:,} rows ({vectors_written:,} vectors) in {elapsed:.1f}s — "
+          f"{rows_seen / elapsed:.1f} rows/s; checkpoint at row {checkpoint.rows_done:,}")
+
+
+if __name__ == "__main__":
+    main()
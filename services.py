@@ -0,0 +1,170 @@
+import os
+import gc
+import time
+import threading
+from dotenv import load_dotenv
+from app_config import INDEX_NAME, EMBED_MODEL, EMBED_DIMENSION
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+# Load the model at import (set by gunicorn.conf.py when preload_app is on)
+APP_PRELOAD = os.getenv("APP_PRELOAD", "0") == "1"
+# Warm up model + index in a background thread instead of on the first request
+APP_WARMUP = os.getenv("APP_WARMUP", "1") == "1"
+
+
+def memory_usage():
+    """RSS / PSS / shared memory of this process in MB (Linux ``/proc``; empty elsewhere)."""
+    out = {}
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_clean_mb", "Shared_Dirty": "shared_dirty_mb",
+              "Private_Clean": "private_clean_mb", "Private_Dirty": "private_dirty_mb"}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    out[fields[key]] = round(int(rest.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return out
+
+
+class Services:
+    """
+    Process-wide model, encoder front end and vector index, created on first use.
+
+    Nothing heavy happens at import. Under gunicorn with ``preload_app`` the
+    master calls :meth:`preload` so the model weights are loaded once and
+    shared copy-on-write by every forked worker; each worker then calls
+    :meth:`after_fork` to build what must not cross a fork (the batcher
+    thread, index clients and their connection pools) and warm up in the
+    background. :attr:`ready` is set once warm-up has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._base = None  # plain model weights loaded by preload(), shared with forked workers
+        self._embedder = None
+        self._encoder = None
+        self._index = None
+        self.ready = threading.Event()
+        self.error = None
+        self.timings = {}
+        self._started = time.time()
+        self._process_hooks = []
+
+    # ---------- lazily created resources ----------
+    def _timed(self, name, fn):
+        t0 = time.time()
+        value = fn()
+        self.timings[name] = round(time.time() - t0, 3)
+        return value
+
+    @property
+    def embedder(self):
+        with self._lock:
+            if self._embedder is None:
+                from encoder import load_encoder  # ENCODER_BACKEND: torch / torch-int8 / onnx / onnx-int8
+                print(f"🔹 Loading embedding model {EMBED_MODEL}...")
+                self._embedder = self._timed("encoder_init_sec" if self._base is not None else "model_load_sec",
+                                             lambda: load_encoder(EMBED_MODEL, base=self._base))
+                print(f"✅ Loaded model: {EMBED_MODEL}")
+            return self._embedder
+
+    @property
+    def encoder(self):
+        """Shared encoder; concurrent requests share padded forward passes when batching is on."""
+        with self._lock:
+            if self._encoder is None:
+                from embed_batcher import EmbeddingBatcher, EMBED_BATCHING
+                self._encoder = EmbeddingBatcher(self.embedder) if EMBED_BATCHING else self.embedder
+            return self._encoder
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                from vector_store import get_index  # Pinecone or local FAISS, see VECTOR_BACKEND
+                from query_cache import QUERY_CACHE, QueryCache
+                index = self._timed("index_connect_sec", lambda: get_index(INDEX_NAME, dimension=EMBED_DIMENSION))
+                # repeat queries (popular judgments) are answered without a vector store round trip
+                self._index = QueryCache(index, INDEX_NAME) if QUERY_CACHE else index
+            return self._index
+
+    # ---------- lifecycle ----------
+    def preload(self):
+        """Load the model weights in the gunicorn master, before workers fork."""
+        # weights only: quantization, agreement checks and ORT sessions run
+        # forward passes, and a torch/OpenMP thread pool started in the
+        # master can deadlock in forked children, so each worker builds the
+        # encoder itself (see the embedder property)
+        from encoder import load_base
+        print(f"🔹 Preloading embedding model weights {EMBED_MODEL}...")
+        self._base = self._timed("model_load_sec", lambda: load_base(EMBED_MODEL))
+        gc.collect()
+        gc.freeze()  # keep the GC from dirtying (and un-sharing) pre-fork objects
+
+    def warm_up(self):
+        try:
+            self._timed("warmup_sec", lambda: (self.encoder.encode("warm-up"), self.index))
+            self.timings["ready_after_sec"] = round(time.time() - self._started, 3)
+            self.ready.set()
+            print(f"✅ Ready in {self.timings['ready_after_sec']}s")
+        except Exception as e:
+            self.error = repr(e)
+            print(f"❌ Warm-up failed: {e}")
+
+    def on_process_start(self, hook):
+        """
+        Run ``hook()`` in every serving process (e.g. start background workers):
+        right away without preloading, otherwise in each worker after the fork.
+        Independent of warm-up, so a failed or disabled warm-up doesn't leave
+        the hook unrun.
+        """
+        self._process_hooks.append(hook)
+        if not APP_PRELOAD:
+            hook()
+
+    def wait_ready(self, timeout=None):
+        """Block until warm-up has finished or failed; returns whether the services are ready."""
+        if not APP_WARMUP:
+            return True  # nothing warms up; resources load on first use
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.ready.wait(1.0):
+            if self.error or (deadline is not None and time.time() >= deadline):
+                return False
+        return True
+
+    def start_warm_up(self):
+        threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+
+    def after_fork(self):
+        """Reset per-process state in a freshly forked worker and warm it up."""
+        self._lock = threading.RLock()
+        self._encoder = None
+        self._index = None
+        self.ready = threading.Event()
+        self.error = None
+        self._started = time.time()
+        if APP_WARMUP:
+            self.start_warm_up()
+        for hook in self._process_hooks:
+            hook()
+
+    def status(self):
+        return {
+            "ready": self.ready.is_set(),
+            "error": self.error,
+            "pid": os.getpid(),
+            "model_preloaded": APP_PRELOAD,
+            "timings": dict(self.timings),
+            "memory": memory_usage(),
+        }
+
+
+services = Services()
+
+if APP_PRELOAD:
+    services.preload()
@@ -1,8 +1,10 @@
 import os
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
-from PyPDF2 import PdfReader
+from encoder import load_encoder
+from vector_store import get_index, index_version, VECTOR_BACKEND
+from query_cache import QUERY_CACHE, QueryCache
+from upload_cache import digest, get_upload_cache, serializable_matches
+from pdf_extract import extract_pdf_text
 from dotenv import load_dotenv
 
 # -----------------------------------
@@ -23,17 +25,18 @@ st.title("⚖️ Legal Case Similarity Finder")
 st.markdown("Upload a legal case PDF to find **similar judgments** from the database instantly.")
 
 # -----------------------------------
-# CONNECT TO PINECONE
+# CONNECT TO VECTOR INDEX
 # -----------------------------------
-if not PINECONE_API_KEY:
+if VECTOR_BACKEND == "pinecone" and not PINECONE_API_KEY:
     st.error("❌ Pinecone API key missing. Add it to your `.env` file.")
     st.stop()
 
 try:
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(INDEX_NAME)
+    index = get_index(INDEX_NAME)
+    if QUERY_CACHE:
+        index = QueryCache(index, INDEX_NAME)
 except Exception as e:
-    st.error(f"🚨 Pinecone connection failed: {e}")
+    st.error(f"🚨 Vector index connection failed: {e}")
     st.stop()
 
 # -----------------------------------
@@ -41,10 +44,12 @@ except Exception as e:
 # -----------------------------------
 @st.cache_resource
 def load_model():
-    return SentenceTransformer(MODEL_NAME)
+    return load_encoder(MODEL_NAME)
 
 model = load_model()
 
+upload_cache = get_upload_cache()
+
 # -----------------------------------
 # FILE UPLOAD SECTION
 # -----------------------------------
@@ -52,12 +57,14 @@ uploaded_file = st.file_uploader("📄 Upload a legal case PDF", type=["pdf"])
 
 if uploaded_file is not None:
     with st.spinner("📖 Reading and analyzing PDF..."):
+        data = uploaded_file.read()
+        sha = digest(data)
         pdf_path = os.path.join(UPLOADS_DIR, uploaded_file.name)
         with open(pdf_path, "wb") as f:
-            f.write(uploaded_file.read())
+            f.write(data)
 
-        reader = PdfReader(pdf_path)
-        text = " ".join(page.extract_text() or "" for page in reader.pages)
+        # Shared with the Flask app (same extractor, OCR fallback included): repeat uploads skip extraction and encoding
+        text = upload_cache.get_or_compute(sha, "text", lambda: extract_pdf_text(pdf_path))
 
         if not text.strip():
             st.warning("⚠️ This PDF contains no readable text. Please upload a searchable PDF.")
@@ -65,15 +72,22 @@ if uploaded_file is not None:
             st.success(f"✅ {uploaded_file.name} uploaded successfully!")
 
             # Create query embedding
-            query_vector = model.encode(text).tolist()
+            query_vector = upload_cache.get_or_compute(
+                sha, f"emb:document:{MODEL_NAME}", lambda: model.encode(text))
 
-            # Query Pinecone
+            # Query the vector index
             st.info("🔍 Finding top 5 most similar cases...")
-            try:
-                res = index.query(vector=query_vector, top_k=5, include_metadata=True)
-            except Exception as e:
-                st.error(f"🚨 Pinecone query failed: {e}")
-                st.stop()
+            matches_kind = f"matches:raw:{MODEL_NAME}:{INDEX_NAME}:v{index_version(INDEX_NAME)}:top5"
+            matches = upload_cache.get(sha, matches_kind)
+            if matches is None:
+                try:
+                    res = index.query(vector=query_vector.tolist(), top_k=5, include_metadata=True)
+                except Exception as e:
+                    st.error(f"🚨 Index query failed: {e}")
+                    st.stop()
+                matches = serializable_matches(res)
+                upload_cache.put(sha, matches_kind, matches)
+            res = {"matches": matches}
 
             # Display results
             if res and "matches" in res and len(res["matches"]) > 0:
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+# modules create caches, databases and dead-letter files at import; keep them out of the working tree
+_TMP = tempfile.mkdtemp(prefix="legal-similarity-tests-")
+for key, name in (("VECTOR_STORE_DIR", "vector_data"), ("UPLOAD_CACHE_DIR", "uploads"),
+                  ("JOBS_DB_PATH", "jobs.sqlite"), ("BULK_DEAD_LETTER", "dead_letter.jsonl")):
+    os.environ.setdefault(key, os.path.join(_TMP, name))
+os.environ.setdefault("APP_WARMUP", "0")
@@ -0,0 +1,12 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+import app as app_module  # noqa: E402
+
+
+def test_batch_match_rejects_duplicate_ids():
+    client = app_module.app.test_client()
+    res = client.post("/batch_match", json={"texts": [{"id": "a", "text": "one"}, {"id": "a", "text": "two"}]})
+    assert res.status_code == 400
+    assert res.get_json()["duplicates"] == ["a"]
@@ -0,0 +1,48 @@
+import filecmp
+import json
+import random
+from PyPDF2 import PdfReader
+from synthetic_corpus import TOPICS, generate_corpus, synthetic_judgment
+from run_benchmarks import flatten, percentiles
+
+
+def test_synthetic_judgment_is_deterministic_for_a_seed():
+    topic = sorted(TOPICS)[0]
+    first = synthetic_judgment(random.Random(11), topic, pages=3)
+    assert synthetic_judgment(random.Random(11), topic, pages=3) == first
+    assert synthetic_judgment(random.Random(12), topic, pages=3) != first
+    lines, year = first
+    assert len(lines) == 3 * 48
+    assert 1990 <= year <= 2023
+    assert all(len(line) <= 92 for line in lines)
+
+
+def test_corpus_is_byte_identical_across_runs(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    cases = generate_corpus(str(a), n_cases=6, min_pages=1, max_pages=3, scan_fraction=0.5, seed=3)
+    generate_corpus(str(b), n_cases=6, min_pages=1, max_pages=3, scan_fraction=0.5, seed=3)
+    for case in cases:
+        assert filecmp.cmp(a / case["path"], b / case["path"], shallow=False)
+    assert json.loads((a / "corpus.json").read_text()) == {"seed": 3, "cases": cases}
+
+
+def test_text_and_scan_pdfs_differ_in_text_layer(tmp_path):
+    cases = generate_corpus(str(tmp_path), n_cases=8, min_pages=1, max_pages=2, scan_fraction=0.5, seed=5)
+    kinds = {c["kind"] for c in cases}
+    assert kinds == {"text", "scan"}
+    for case in cases:
+        reader = PdfReader(str(tmp_path / case["path"]))
+        assert len(reader.pages) == case["pages"]
+        text = "".join(page.extract_text() or "" for page in reader.pages)
+        if case["kind"] == "text":
+            assert "SUPREME COURT OF INDIA" in text
+        else:
+            assert not text.strip()
+
+
+def test_percentiles_and_flatten():
+    stats = percentiles([float(i) for i in range(1, 101)])
+    assert stats["p50_ms"] == 50.5 and stats["max_ms"] == 100.0
+    assert percentiles([]) == {}
+    assert flatten("", {"extract": {"p50_ms": 1.5, "ok": True, "name": "x"}, "n": 3}, {}) == \
+        {"extract.p50_ms": 1.5, "n": 3}
@@ -0,0 +1,78 @@
+import json
+import pytest
+from bulk_writer import BulkWriter, BulkWriteError, record_size
+
+
+class RejectingIndex:
+    """Accepts upserts unless a batch contains one of ``bad`` (400) or a 429 is scheduled."""
+
+    def __init__(self, bad=(), rate_limit_first=0):
+        self.bad = set(bad)
+        self.rate_limit_first = rate_limit_first
+        self.calls = 0
+        self.stored = {}
+
+    class Error(Exception):
+        def __init__(self, status):
+            super().__init__(f"({status})")
+            self.status = status
+
+    def upsert(self, vectors):
+        self.calls += 1
+        if self.calls <= self.rate_limit_first:
+            raise self.Error(429)
+        if any(r["id"] in self.bad for r in vectors):
+            raise self.Error(400)
+        self.stored.update((r["id"], r) for r in vectors)
+
+
+def records(ids, dim=4):
+    return [{"id": i, "values": [0.5] * dim, "metadata": {"n": n}} for n, i in enumerate(ids)]
+
+
+def writer_for(index, tmp_path, **kwargs):
+    return BulkWriter(index, base_delay=0, dead_letter_path=str(tmp_path / "dead.jsonl"), **kwargs)
+
+
+def test_rejected_batch_is_bisected_down_to_the_bad_record(tmp_path):
+    index = RejectingIndex(bad={"r5"})
+    writer = writer_for(index, tmp_path, max_batch_vectors=8)
+    with pytest.raises(BulkWriteError) as err:
+        writer.write(records([f"r{i}" for i in range(8)]))
+
+    assert [record["id"] for record, _ in err.value.failed] == ["r5"]
+    assert sorted(index.stored) == sorted(f"r{i}" for i in range(8) if i != 5)
+    lines = (tmp_path / "dead.jsonl").read_text().splitlines()
+    assert [json.loads(line)["record"]["id"] for line in lines] == ["r5"]
+    assert writer.stats()["dead_lettered"] == 1
+
+
+def test_rate_limited_request_is_retried(tmp_path):
+    index = RejectingIndex(rate_limit_first=2)
+    writer = writer_for(index, tmp_path)
+    writer.write(records(["a", "b", "c"]))
+    stats = writer.stats()
+    assert sorted(index.stored) == ["a", "b", "c"]
+    assert stats["retries"] == 2 and stats["rate_limited"] == 2
+    assert stats["concurrency_limit"] < writer.concurrency
+
+
+def test_batches_respect_the_byte_cap(tmp_path):
+    recs = records([f"r{i}" for i in range(50)], dim=32)
+    cap = 3 * record_size(recs[0])
+    writer = writer_for(RejectingIndex(), tmp_path, max_batch_bytes=cap)
+    batches = list(writer.batches(recs))
+    assert sum(len(b) for b, _ in batches) == 50
+    assert all(size <= cap for _, size in batches)
+
+
+def test_flush_reports_failures_and_on_written_sees_only_accepted_records(tmp_path):
+    written = []
+    index = RejectingIndex(bad={"bad"})
+    writer = writer_for(index, tmp_path, max_batch_vectors=3, on_written=lambda b: written.extend(r["id"] for r in b))
+    writer.add_many(records(["a", "b", "bad", "c", "d"]))
+    assert [r["id"] for r in writer.flush()] == ["bad"]
+    writer.add_many(records(["e"]))
+    assert writer.flush() == []  # failures are reported once, for the flush that covered them
+    writer.close()
+    assert sorted(written) == ["a", "b", "c", "d", "e"]
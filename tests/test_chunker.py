@@ -0,0 +1,51 @@
+import pytest
+import chunker
+from chunker import chunk_pages, chunk_text, _ApproxTokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_counts(monkeypatch):
+    # no tokenizer download in tests
+    monkeypatch.setattr(chunker, "_counter", _ApproxTokens())
+
+
+SENTENCES = [f"The appellant filed appeal number {i} before the High Court." for i in range(40)]
+
+
+def test_chunks_stay_within_the_budget():
+    chunks = list(chunk_pages([" ".join(SENTENCES)], max_tokens=64, overlap_tokens=16))
+    assert len(chunks) > 1
+    assert all(c.n_tokens <= 64 - chunker.SPECIAL_TOKENS for c in chunks)
+
+
+def test_consecutive_chunks_overlap_by_trailing_sentences():
+    chunks = chunk_text(" ".join(SENTENCES), max_tokens=64, overlap_tokens=16)
+    for prev, nxt in zip(chunks, chunks[1:]):
+        first_sentence = nxt.split(". ")[0] + "."
+        assert prev.endswith(first_sentence)
+    # every sentence survives, in order
+    seen = []
+    for chunk in chunks:
+        seen += [s for s in SENTENCES if s in chunk and s not in seen]
+    assert seen == SENTENCES
+
+
+def test_no_overlap_when_disabled():
+    chunks = chunk_text(" ".join(SENTENCES), max_tokens=64, overlap_tokens=0)
+    assert " ".join(chunks) == " ".join(SENTENCES)
+
+
+def test_overlong_sentence_is_cut_into_overlapping_windows():
+    words = [f"word{i}" for i in range(300)]
+    chunks = chunk_text(" ".join(words), max_tokens=64, overlap_tokens=8)
+    assert len(chunks) > 1
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert nxt.split()[0] in prev.split()
+    assert chunks[-1].split()[-1] == "word299"
+
+
+def test_pages_are_tracked():
+    pages = [" ".join(SENTENCES[:20]), " ".join(SENTENCES[20:])]
+    chunks = list(chunk_pages(pages, max_tokens=64, overlap_tokens=16))
+    assert chunks[0].page_start == 1 and chunks[-1].page_end == 2
+    assert all(c.page_start <= c.page_end for c in chunks)
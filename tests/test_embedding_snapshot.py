@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import pytest
+from embedding_snapshot import SnapshotWriter, open_snapshot
+
+
+def test_rewritten_ids_keep_their_last_row(tmp_path):
+    root = str(tmp_path)
+    with SnapshotWriter("test", root=root, base=None, dtype="float32") as writer:
+        writer.add(["a", "b"], [[1.0, 0.0], [0.0, 1.0]], [{"v": 1}, {"v": 1}])
+        writer.add(["a", "c"], [[0.5, 0.5], [1.0, 1.0]], [{"v": 2}, {"v": 2}])
+        writer.delete(["c"])
+    snapshot = writer.snapshot
+    assert snapshot.ids == ["b", "a"]
+    rows = {vid: (np.asarray(vec).tolist(), meta) for ids, vecs, metas in snapshot.iter_batches()
+            for vid, vec, meta in zip(ids, vecs, metas)}
+    assert rows == {"a": ([0.5, 0.5], {"v": 2}), "b": ([0.0, 1.0], {"v": 1})}
+
+    # an incremental run carries over the base and its own rows stay unique
+    with SnapshotWriter("test", root=root, dtype="float32") as writer:
+        writer.add(["b", "b"], [[2.0, 2.0], [3.0, 3.0]], [{"v": 3}, {"v": 4}])
+    current = open_snapshot("test", root=root)
+    assert sorted(current.ids) == ["a", "b"]
+    assert len(current) == 2
+
+
+def test_exception_removes_the_building_directory(tmp_path):
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter("test", root=str(tmp_path), base=None) as writer:
+            writer.add(["a"], [[1.0, 0.0]])
+            raise RuntimeError("upsert failed")
+    assert not any(name.endswith(".building") for name in os.listdir(os.path.join(str(tmp_path), "test")))
+    assert open_snapshot("test", root=str(tmp_path)) is None
@@ -0,0 +1,30 @@
+import math
+import pytest
+from eval_retrieval import pareto, score_ranking
+
+
+def test_score_ranking():
+    scores = score_ranking(["x", "a", "y", "b"], {"a", "b"}, k=4)
+    assert scores["recall"] == 1.0
+    assert scores["mrr"] == 0.5
+    ideal = 1 + 1 / math.log2(3)
+    assert scores["ndcg"] == pytest.approx((1 / math.log2(3) + 1 / math.log2(5)) / ideal)
+
+
+def test_score_ranking_cuts_at_k():
+    scores = score_ranking(["x", "y", "a"], {"a"}, k=2)
+    assert scores == {"recall": 0.0, "mrr": 0.0, "ndcg": 0.0}
+    assert score_ranking(["a"], {"a"}, k=10)["ndcg"] == pytest.approx(1.0)
+
+
+def test_pareto_flags_undominated_rows():
+    rows = [
+        {"name": "flat", "ndcg": 0.90, "p50_ms": 10.0, "index_mb": 100},
+        {"name": "ivf", "ndcg": 0.88, "p50_ms": 2.0, "index_mb": 100},
+        {"name": "worse", "ndcg": 0.85, "p50_ms": 3.0, "index_mb": 120},  # ivf beats it everywhere
+        {"name": "pq", "ndcg": 0.80, "p50_ms": 2.0, "index_mb": 20},
+        {"name": "tie", "ndcg": 0.80, "p50_ms": 2.0, "index_mb": 20},  # equal rows don't dominate each other
+        {"name": "broken", "error": "boom"},
+    ]
+    flags = {r["name"]: r["pareto"] for r in pareto(rows, "ndcg")}
+    assert flags == {"flat": True, "ivf": True, "worse": False, "pq": True, "tie": True, "broken": False}
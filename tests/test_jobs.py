@@ -0,0 +1,73 @@
+import time
+import threading
+import pytest
+from jobs import JobQueue, PRIORITY_OCR, PRIORITY_TEXT
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """A queue whose workers never start, so tests drive ``_claim`` themselves."""
+    q = JobQueue(lambda job: None, path=str(tmp_path / "jobs.sqlite"), workers=2, ocr_workers=1)
+    q.start = lambda: None
+    return q
+
+
+def test_text_jobs_are_claimed_before_ocr_jobs(queue):
+    ocr, _ = queue.submit({"n": 1}, priority=PRIORITY_OCR)
+    text, _ = queue.submit({"n": 2}, priority=PRIORITY_TEXT)
+    assert queue._claim(allow_ocr=True)["id"] == text["id"]
+    assert queue._claim(allow_ocr=False) is None  # only the OCR job is left
+    claimed = queue._claim(allow_ocr=True)
+    assert claimed["id"] == ocr["id"] and claimed["status"] == "running"
+
+
+def test_claimed_job_is_leased(queue):
+    queue.submit({"n": 1})
+    job = queue._claim(allow_ocr=True)
+    assert queue._claim(allow_ocr=True) is None  # leased to the first worker
+    row = queue.get(job["id"])
+    assert row["status"] == "running" and row["lease_until"] > time.time()
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(tmp_path):
+    q = JobQueue(lambda job: None, path=str(tmp_path / "jobs.sqlite"), lease_sec=-1, max_attempts=2)
+    q.start = lambda: None
+    job, _ = q.submit({"n": 1})
+    assert q._claim(True)["id"] == job["id"]
+    assert q._claim(True)["id"] == job["id"]  # worker "died": lease already expired
+    assert q._claim(True) is None
+    assert q.get(job["id"])["status"] == "failed"
+
+
+def test_dedup_key_returns_the_existing_job(queue):
+    first, dup = queue.submit({"n": 1}, dedup_key="sha-1")
+    again, dup_again = queue.submit({"n": 1}, dedup_key="sha-1")
+    assert (dup, dup_again) == (False, True)
+    assert again["id"] == first["id"]
+
+
+def test_workers_respect_the_ocr_cap(tmp_path):
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def handler(job):
+        if job["priority"] == PRIORITY_OCR:
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+        return job["payload"]
+
+    q = JobQueue(handler, path=str(tmp_path / "jobs.sqlite"), workers=4, ocr_workers=1)
+    try:
+        for i in range(12):
+            q.submit({"n": i}, priority=PRIORITY_OCR if i % 2 else PRIORITY_TEXT)
+        deadline = time.time() + 20
+        while sum(q.stats().get("done", {}).values()) < 12 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        q.stop()
+    assert q.stats()["done"] == {"text": 6, "ocr": 6}
+    assert peak[0] == 1
+    assert q._ocr_running == 0
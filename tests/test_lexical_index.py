@@ -0,0 +1,26 @@
+from lexical_index import LexicalIndex, WrittenUnits, hybrid_search
+
+
+def test_hybrid_results_are_scored_by_the_fused_rank(tmp_path):
+    lexical = LexicalIndex("test", root=str(tmp_path))
+    lexical.add([("a", "contract breach damages", {}), ("c", "breach of contract remedies", {})])
+    lexical.build()
+    dense = [{"doc_id": "b", "score": 0.9}, {"doc_id": "a", "score": 0.8}]
+
+    results = hybrid_search(lambda: dense, lexical, "breach of contract", top_k=3)
+
+    assert [r["doc_id"] for r in results][0] == "a"
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+    by_doc = {r["doc_id"]: r for r in results}
+    assert by_doc["a"]["dense_score"] == 0.8 and by_doc["b"]["dense_score"] == 0.9
+    assert by_doc["c"]["dense_score"] is None and by_doc["c"]["dense_rank"] is None
+
+
+def test_only_written_units_reach_the_lexical_index(tmp_path):
+    lexical = LexicalIndex("test", root=str(tmp_path))
+    feed = WrittenUnits(lexical)
+    feed.extracted([("a", "contract breach", {}), ("b", "contract breach", {})])
+    feed.written([{"id": "a", "values": [0.0], "metadata": {}}])  # "b" was dead-lettered
+    lexical.build()
+
+    assert [hit["id"] for hit in lexical.search("breach")] == ["a"]
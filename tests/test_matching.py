@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import matching
+from upload_cache import UploadCache
+
+KIND = "matches:test"
+
+
+@pytest.fixture
+def stubbed(monkeypatch, tmp_path):
+    """match_batch with the encoder and index replaced: a document's "match" is its own text."""
+    cache = UploadCache(root=str(tmp_path / "cache"))
+    monkeypatch.setattr(matching, "upload_cache", cache)
+    monkeypatch.setattr(matching, "matches_kind", lambda top_k=matching.TOP_K: (KIND, False))
+    monkeypatch.setattr(matching, "embed_texts", lambda texts: [np.full(4, len(t), dtype="float32") for t in texts])
+    monkeypatch.setattr(matching, "rank", lambda text, vector, use_hybrid, top_k: [{"id": text, "dim": int(vector[0])}])
+    return cache
+
+
+def test_duplicate_ids_keep_their_own_results(stubbed):
+    items = [{"id": "judgment.pdf", "sha": "a" * 64, "text": "first document"},
+             {"id": "judgment.pdf", "sha": "b" * 64, "text": "the second, longer document"}]
+    rows = list(matching.match_batch(items))
+
+    assert sorted(r["results"][0]["id"] for r in rows) == ["first document", "the second, longer document"]
+    for item in items:
+        assert stubbed.get(item["sha"], KIND) == [{"id": item["text"], "dim": len(item["text"])}]
+
+
+def test_cached_results_are_returned_without_encoding(stubbed, monkeypatch):
+    stubbed.put("c" * 64, KIND, [{"id": "cached"}])
+    monkeypatch.setattr(matching, "embed_texts", lambda texts: pytest.fail("should not encode"))
+    rows = list(matching.match_batch([{"id": "x", "sha": "c" * 64, "text": "anything"}]))
+    assert rows == [{"id": "x", "results": [{"id": "cached"}], "cached": True}]
+
+
+def test_encode_failure_is_reported_per_document(stubbed, monkeypatch):
+    def fail(texts):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(matching, "embed_texts", fail)
+    rows = list(matching.match_batch([{"id": "x", "sha": "d" * 64, "text": "doc"},
+                                      {"id": "y", "sha": "e" * 64, "text": "doc two"}]))
+    assert sorted(r["id"] for r in rows) == ["x", "y"]
+    assert all(r["error"] == "Failed to embed document" for r in rows)
@@ -0,0 +1,29 @@
+import time
+import pytest
+
+flask = pytest.importorskip("flask")
+import metrics  # noqa: E402
+
+
+def test_streamed_responses_are_timed_to_the_end_of_the_body():
+    app = flask.Flask("metrics-test")
+    metrics.init_app(app)
+
+    @app.route("/stream")
+    def stream():
+        def body():
+            with metrics.span("stream_test_chunk"):
+                time.sleep(0.2)
+            yield "done\n"
+        return flask.Response(body(), mimetype="application/x-ndjson")
+
+    def observed():
+        return metrics.REGISTRY.get_sample_value("echo_request_seconds_sum",
+                                                 {"endpoint": "stream", "status": "200"}) or 0.0
+
+    before = observed()
+    response = app.test_client().get("/stream")
+    assert response.get_data(as_text=True) == "done\n"
+    response.close()
+    assert observed() - before >= 0.2
+    assert b"echo_request_seconds_bucket" in app.test_client().get("/metrics").data
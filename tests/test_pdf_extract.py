@@ -0,0 +1,45 @@
+import os
+import time
+import importlib
+import pdf_extract
+
+
+def fake_ocr(slow=(), broken=()):
+    def ocr_page(file_path, page_number, dpi, timeout=None):
+        if page_number - 1 in broken:
+            raise RuntimeError("tesseract crashed")
+        if page_number - 1 in slow:
+            time.sleep(2)
+        return f"page {page_number}"
+    return ocr_page
+
+
+def test_failures_and_budget_skips_are_reported_separately(monkeypatch, capsys):
+    monkeypatch.setattr(pdf_extract, "ocr_page", fake_ocr(broken={1}))
+    results = pdf_extract.ocr_pages("x.pdf", [0, 1, 2], workers=2, time_budget=10)
+    assert results == {0: "page 1", 2: "page 3"}
+    out = capsys.readouterr().out
+    assert "OCR failed on page 2" in out
+    assert "budget" not in out
+
+
+def test_time_budget_does_not_wait_for_running_pages(monkeypatch, capsys):
+    monkeypatch.setattr(pdf_extract, "ocr_page", fake_ocr(slow={1, 2, 3}))
+    start = time.monotonic()
+    results = pdf_extract.ocr_pages("x.pdf", [0, 1, 2, 3], workers=2, time_budget=0.3)
+    assert time.monotonic() - start < 1.5
+    assert results == {0: "page 1"}
+    assert "OCR budget reached: 3 page(s)" in capsys.readouterr().out
+
+
+def test_page_cap(monkeypatch, capsys):
+    monkeypatch.setattr(pdf_extract, "ocr_page", fake_ocr())
+    assert sorted(pdf_extract.ocr_pages("x.pdf", range(5), workers=2, max_pages=3)) == [0, 1, 2]
+    assert "page cap (3): 2 page(s)" in capsys.readouterr().out
+
+
+def test_import_leaves_the_omp_limit_alone(monkeypatch):
+    # torch in the serving process shares the OpenMP runtime; only tesseract children get the limit
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    importlib.reload(pdf_extract)
+    assert "OMP_THREAD_LIMIT" not in os.environ
@@ -0,0 +1,33 @@
+from query_cache import QueryCache
+
+
+class RecordingIndex:
+    def __init__(self):
+        self.calls = []
+
+    def query(self, vector=None, **kwargs):
+        self.calls.append(kwargs)
+        return {"matches": [{"id": "a", "score": 0.5, "values": list(vector)}], "namespace": kwargs.get("namespace", "")}
+
+
+def test_query_many_misses_forward_values_and_namespace():
+    index = RecordingIndex()
+    cache = QueryCache(index, index_name="test-query-cache", shared=False)
+
+    first = cache.query_many([[1.0, 0.0]], top_k=3, include_values=True, namespace="ns")
+    assert first[0]["matches"][0]["values"] == [1.0, 0.0]
+    assert first[0]["namespace"] == "ns"
+    assert index.calls == [{"top_k": 3, "include_metadata": False, "include_values": True,
+                            "filter": None, "namespace": "ns"}]
+
+    assert cache.query_many([[1.0, 0.0]], top_k=3, include_values=True, namespace="ns") == first
+    cache.query_many([[1.0, 0.0]], top_k=3, include_values=True, namespace="other")
+    assert len(index.calls) == 2  # the namespace is part of the key
+
+
+def test_query_many_with_extra_arguments_bypasses_the_cache():
+    index = RecordingIndex()
+    cache = QueryCache(index, index_name="test-query-cache", shared=False)
+    cache.query_many([[1.0, 0.0]], sparse_vector={"indices": [1], "values": [0.5]})
+    cache.query_many([[1.0, 0.0]], sparse_vector={"indices": [1], "values": [0.5]})
+    assert len(index.calls) == 2 and index.calls[0]["sparse_vector"]
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("sentence_transformers")
+import train_similarity  # noqa: E402
+from train_similarity import BucketBatchSampler, collate, ranking_loss  # noqa: E402
+
+
+def test_bucket_sampler_covers_each_row_at_most_once():
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(5, 300, size=1000)
+    sampler = BucketBatchSampler(lengths, batch_size=32, bucket_batches=8, seed=1)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 1000 // 32
+    assert all(len(b) == 32 for b in batches)
+    rows = [r for b in batches for r in b]
+    assert len(rows) == len(set(rows))
+
+
+def test_bucket_sampler_groups_similar_lengths():
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(5, 300, size=2048)
+    bucketed = [np.ptp(lengths[b]) for b in BucketBatchSampler(lengths, batch_size=32, bucket_batches=16)]
+    shuffled = [np.ptp(lengths[b]) for b in rng.permutation(2048).reshape(-1, 32)]
+    assert np.mean(bucketed) < 0.25 * np.mean(shuffled)
+
+
+def test_bucket_sampler_reshuffles_per_epoch():
+    sampler = BucketBatchSampler(np.arange(256), batch_size=16, bucket_batches=2, seed=3)
+    first = list(sampler)
+    assert list(sampler) == first  # deterministic for a given epoch
+    sampler.set_epoch(1)
+    assert list(sampler) != first
+
+
+def _row(n, length):
+    return [n] * length  # every token of row n is n, so a padded row identifies itself
+
+
+def test_collate_restore_puts_rows_back_in_order():
+    lengths = [7, 2, 9, 4, 4, 1, 8]
+    items = [(_row(i, n), _row(100 + i, n + 1), None) for i, n in enumerate(lengths)]
+    features, stats = collate(items, pad_id=0, mini_batch=3)
+
+    assert "negative" not in features  # no negatives in the batch: skipped, not padded
+    for name, offset in (("anchor", 0), ("positive", 100)):
+        chunks = features[name]["chunks"]
+        assert [len(c["input_ids"]) for c in chunks] == [3, 3, 1]
+        for c in chunks:  # each mini-batch padded only to its own longest row
+            assert c["input_ids"].shape[1] == int(c["attention_mask"].sum(dim=1).max())
+        firsts = torch.cat([c["input_ids"][:, 0] for c in chunks])
+        assert firsts[features[name]["restore"]].tolist() == [offset + i for i in range(len(items))]
+    assert stats["rows"] == len(items)
+    assert stats["tokens"] == sum(lengths) + sum(n + 1 for n in lengths)
+    assert stats["tokens"] <= stats["padded"]
+
+
+def test_ranking_loss_prefers_aligned_pairs():
+    torch.manual_seed(0)
+    anchors = torch.randn(8, 32)
+    aligned = ranking_loss(anchors, anchors + 0.01 * torch.randn(8, 32))
+    shuffled = ranking_loss(anchors, anchors[torch.randperm(8)])
+    assert aligned < shuffled
+
+
+def test_matryoshka_loss_averages_over_truncations():
+    torch.manual_seed(0)
+    anchors, candidates = torch.randn(8, 64), torch.randn(8, 64)
+    expected = sum(ranking_loss(anchors[:, :d], candidates[:, :d]) for d in (16, 32, 64)) / 3
+    # dimensions at or above the full size collapse into the full-size term
+    got = ranking_loss(anchors, candidates, dims=[32, 16, 64, 128])
+    assert torch.allclose(got, expected)
+    assert torch.allclose(ranking_loss(anchors, candidates, dims=[]), ranking_loss(anchors, candidates))
+
+
+class _Encoder:
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 2), dtype="float32")
+
+
+def _mine(monkeypatch, tmp_path, metadatas):
+    import csv
+    import encoder
+    import vector_store
+    monkeypatch.setattr(encoder, "load_encoder", lambda name: _Encoder())
+    monkeypatch.setattr(vector_store, "get_index", lambda name, dimension=None: "index")
+    monkeypatch.setattr(vector_store, "query_many", lambda index, vectors, **kw: [
+        {"matches": [{"id": str(i), "score": 0.5, "metadata": m} for i, m in enumerate(metadatas)]}
+        for _ in vectors])
+    pairs = tmp_path / "pairs.csv"
+    pairs.write_text("anchor,positive\nthe anchor text,the positive text\n", encoding="utf-8")
+    out = train_similarity.mine_hard_negatives(str(pairs), index_name="test", model_name="m", skip=0)
+    with open(out, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_mining_falls_back_to_the_compressed_preview(monkeypatch, tmp_path):
+    import base64
+    import gzip
+    preview = base64.b64encode(gzip.compress("a different judgment".encode("utf-8"))).decode("ascii")
+    rows = _mine(monkeypatch, tmp_path, [{"filename": "a.pdf", "text_preview": preview}])
+    assert rows[0]["negative"] == "a different judgment"
+
+
+def test_mining_without_any_stored_text_fails_clearly(monkeypatch, tmp_path):
+    with pytest.raises(ValueError, match="stores no passage text"):
+        _mine(monkeypatch, tmp_path, [{"filename": "a.pdf"}, {"filename": "b.pdf"}])
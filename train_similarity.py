@@ -1,5 +1,11 @@
 from sentence_transformers import SentenceTransformer, InputExample, losses
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, Dataset, Sampler
+from functools import partial
+import numpy as np
+import hashlib
+import torch
+import json
+import time
 import csv
 import os
 from dotenv import load_dotenv
@@ -8,20 +14,52 @@ from dotenv import load_dotenv
 load_dotenv()
 MODEL_BASE = os.getenv("MODEL_NAME", "all-mpnet-base-v2")
 
-def load_pairs(csv_path):
+# ----------------------------------------------
+# Fast training mode (--fast)
+# ----------------------------------------------
+# Pre-tokenized datasets are cached here, keyed by CSV + tokenizer + max length
+TRAIN_CACHE_DIR = os.getenv("TRAIN_CACHE_DIR", os.path.join("cache", "train"))
+# Pairs per optimizer step: every other positive in the batch is a negative for each anchor
+TRAIN_BATCH_SIZE = int(os.getenv("TRAIN_BATCH_SIZE", "256"))
+# Rows per forward/backward pass; only this many activations are held at once
+TRAIN_MINI_BATCH = int(os.getenv("TRAIN_MINI_BATCH", "32"))
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "2"))
+TRAIN_THREADS = int(os.getenv("TRAIN_THREADS", "0"))  # 0 = torch default
+TRAIN_MAX_SEQ_LENGTH = int(os.getenv("TRAIN_MAX_SEQ_LENGTH", "0"))  # 0 = model default
+TRAIN_LR = float(os.getenv("TRAIN_LR", "2e-5"))
+TRAIN_LOG_EVERY = int(os.getenv("TRAIN_LOG_EVERY", "10"))
+# Batches sorted together by length; larger = less padding, less random batch composition
+TRAIN_BUCKET_BATCHES = int(os.getenv("TRAIN_BUCKET_BATCHES", "50"))
+# Hard negatives: ignore the top ranks (often near-duplicates of the positive) and very close scores
+HARD_NEGATIVE_SKIP = int(os.getenv("HARD_NEGATIVE_SKIP", "2"))
+HARD_NEGATIVE_MAX_SCORE = float(os.getenv("HARD_NEGATIVE_MAX_SCORE", "0.95"))
+
+SCALE = 20.0  # same similarity scale as losses.MultipleNegativesRankingLoss
+COLUMNS = ("anchor", "positive", "negative")
+
+
+def load_rows(csv_path):
     """
-    Load training pairs (anchor, positive) from a CSV file.
-    Format: anchor,positive
+    ``(anchor, positive, negative)`` rows from a training CSV; ``negative``
+    is an optional column and ``None`` where missing.
     """
-    examples = []
+    rows = []
     with open(csv_path, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            anchor = row['anchor'].strip()
-            positive = row['positive'].strip()
+            anchor = (row.get('anchor') or '').strip()
+            positive = (row.get('positive') or '').strip()
+            negative = (row.get('negative') or '').strip() or None
             if anchor and positive:
-                examples.append(InputExample(texts=[anchor, positive]))
-    return examples
+                rows.append((anchor, positive, negative))
+    return rows
+
+def load_pairs(csv_path):
+    """
+    Load training pairs (anchor, positive) from a CSV file.
+    Format: anchor,positive[,negative]
+    """
+    return [InputExample(texts=[a, p, n] if n else [a, p]) for a, p, n in load_rows(csv_path)]
 
 def train(csv_path, out_dir="models/legal-sim-model", epochs=2, batch_size=8):
     """
@@ -29,6 +67,8 @@ def train(csv_path, out_dir="models/legal-sim-model", epochs=2, batch_size=8):
     """
     model = SentenceTransformer(MODEL_BASE)
     train_examples = load_pairs(csv_path)
+    if len({len(e.texts) for e in train_examples}) > 1:  # the default collate needs one shape
+        train_examples = [InputExample(texts=e.texts[:2]) for e in train_examples]
     train_dataloader = DataLoader(train_examples, shuffle=True, batch_size=batch_size)
     train_loss = losses.MultipleNegativesRankingLoss(model)
 
@@ -38,13 +78,420 @@ def train(csv_path, out_dir="models/legal-sim-model", epochs=2, batch_size=8):
     model.save(out_dir)
     print(f"✅ Model saved to {out_dir}")
 
+
+# ----------------------------------------------
+# Pre-tokenized, memory-mapped dataset
+# ----------------------------------------------
+class TokenizedPairs(Dataset):
+    """
+    Training rows tokenized once and stored as a flat int32 token file.
+
+    ``tokens.bin`` holds every text's token IDs back to back, ``offsets.npy``
+    where each text starts, and ``rows.npy`` the text numbers of each row's
+    anchor / positive / negative (-1 when a row has no negative). The token
+    file is memory-mapped lazily, so DataLoader workers share the page cache
+    instead of a pickled copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows = np.load(os.path.join(path, "rows.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self._tokens = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_tokens"] = None  # each worker maps the file itself
+        return state
+
+    def text(self, i):
+        if self._tokens is None:
+            self._tokens = np.memmap(os.path.join(self.path, "tokens.bin"), dtype="int32", mode="r")
+        return self._tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def lengths(self):
+        """Longest text (in tokens) of every row, for length bucketing."""
+        sizes = np.diff(self.offsets)
+        return np.stack([np.where(self.rows[:, c] >= 0, sizes[self.rows[:, c]], 0)
+                         for c in range(self.rows.shape[1])]).max(axis=0)
+
+    def __getitem__(self, i):
+        return tuple(self.text(t) if t >= 0 else None for t in self.rows[i])
+
+
+def build_token_cache(csv_path, tokenizer, max_length, root=TRAIN_CACHE_DIR, batch_size=1000):
+    """Tokenize a training CSV once; later runs (and epochs) reuse the cached files."""
+    stat = os.stat(csv_path)
+    source = [os.path.abspath(csv_path), stat.st_size, stat.st_mtime, tokenizer.name_or_path, max_length]
+    key = hashlib.sha1(json.dumps(source).encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(root, key)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        print(f"⚡ Using tokenized cache {path}")
+        return TokenizedPairs(path)
+
+    t0 = time.time()
+    rows = load_rows(csv_path)
+    texts, numbers = [], {}
+    table = np.full((len(rows), 3), -1, dtype="int64")
+    for r, row in enumerate(rows):
+        for c, text in enumerate(row):
+            if text is not None:
+                if text not in numbers:  # repeated positives are tokenized once
+                    numbers[text] = len(texts)
+                    texts.append(text)
+                table[r, c] = numbers[text]
+    if not (table[:, 2] >= 0).any():
+        table = table[:, :2]
+
+    building = path + ".building"
+    os.makedirs(building, exist_ok=True)
+    offsets = np.zeros(len(texts) + 1, dtype="int64")
+    with open(os.path.join(building, "tokens.bin"), "wb") as f:
+        for start in range(0, len(texts), batch_size):
+            ids = tokenizer(texts[start:start + batch_size], truncation=True, max_length=max_length,
+                            add_special_tokens=True)["input_ids"]
+            for j, seq in enumerate(ids):
+                offsets[start + j + 1] = offsets[start + j] + len(seq)
+                f.write(np.asarray(seq, dtype="int32").tobytes())
+    np.save(os.path.join(building, "offsets.npy"), offsets)
+    np.save(os.path.join(building, "rows.npy"), table)
+    with open(os.path.join(building, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"source": source, "rows": len(rows), "texts": len(texts), "tokens": int(offsets[-1]),
+                   "pad_token_id": tokenizer.pad_token_id}, f, indent=2)
+    os.replace(building, path)
+    print(f"✅ Tokenized {len(rows):,} rows ({len(texts):,} texts, {int(offsets[-1]):,} tokens) "
+          f"in {time.time() - t0:.1f}s -> {path}")
+    return TokenizedPairs(path)
+
+
+# ----------------------------------------------
+# Length-bucketed batches
+# ----------------------------------------------
+class BucketBatchSampler(Sampler):
+    """
+    Shuffled batches of rows with similar lengths.
+
+    Each epoch the rows are shuffled, cut into pools of ``bucket_batches``
+    batches, sorted by length inside each pool and sliced into batches;
+    the batch order is then shuffled again. Padding drops to a few percent
+    while every batch still mixes rows from across the dataset.
+    """
+
+    def __init__(self, lengths, batch_size, bucket_batches=TRAIN_BUCKET_BATCHES, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.pool = batch_size * max(1, bucket_batches)
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __len__(self):
+        return len(self.lengths) // self.batch_size  # incomplete last batch dropped: fewer negatives
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        order = rng.permutation(len(self.lengths))
+        batches = []
+        for start in range(0, len(order), self.pool):
+            pool = order[start:start + self.pool]
+            pool = pool[np.argsort(self.lengths[pool], kind="stable")]
+            batches.extend(pool[i:i + self.batch_size] for i in range(0, len(pool) - self.batch_size + 1,
+                                                                      self.batch_size))
+        for b in rng.permutation(len(batches)):
+            yield batches[b].tolist()
+
+
+def _pad(seqs, pad_id):
+    width = max(len(s) for s in seqs)
+    ids = np.full((len(seqs), width), pad_id, dtype="int64")
+    mask = np.zeros((len(seqs), width), dtype="int64")
+    for i, s in enumerate(seqs):
+        ids[i, :len(s)] = s
+        mask[i, :len(s)] = 1
+    return {"input_ids": torch.from_numpy(ids), "attention_mask": torch.from_numpy(mask)}
+
+
+def collate(items, pad_id, mini_batch):
+    """
+    Padded features per column, split into mini-batches. Each column is
+    sorted by length first, so every mini-batch is padded only to its own
+    longest row; ``restore`` puts the embeddings back in row order.
+    Returns ``(features, stats)`` with token counts for logging.
+    """
+    batch, real, padded = {}, 0, 0
+    for c, name in enumerate(COLUMNS[:len(items[0])]):
+        seqs = [item[c] for item in items if item[c] is not None]
+        if not seqs:
+            continue  # no negatives in this batch: in-batch negatives only
+        order = np.argsort([len(s) for s in seqs], kind="stable")
+        seqs = [seqs[i] for i in order]
+        chunks = [seqs[i:i + mini_batch] for i in range(0, len(seqs), mini_batch)]
+        batch[name] = {"chunks": [_pad(chunk, pad_id) for chunk in chunks],
+                       "restore": torch.from_numpy(np.argsort(order))}
+        real += sum(len(s) for s in seqs)
+        padded += sum(len(chunk) * max(len(s) for s in chunk) for chunk in chunks)
+    return batch, {"rows": len(items), "tokens": real, "padded": padded}
+
+
+# ----------------------------------------------
+# Gradient-cached MultipleNegativesRankingLoss
+# ----------------------------------------------
+def ranking_loss(anchors, candidates, scale=SCALE, dims=None):
+    """
+    MultipleNegativesRankingLoss: row i's positive is candidate i, every
+    other candidate a negative. With ``dims`` (Matryoshka) the loss is
+    averaged over the full embedding and its truncations to each dimension.
+    """
+    if dims:
+        full = anchors.shape[-1]
+        sizes = sorted({d for d in dims if d < full} | {full})
+        return sum(ranking_loss(anchors[:, :d], candidates[:, :d], scale) for d in sizes) / len(sizes)
+    scores = torch.nn.functional.normalize(anchors, dim=-1) @ torch.nn.functional.normalize(candidates, dim=-1).T
+    labels = torch.arange(len(anchors), device=scores.device)
+    return torch.nn.functional.cross_entropy(scores * scale, labels)
+
+
+def _embed(model, features):
+    return model(dict(features))["sentence_embedding"]
+
+
+def cached_step(model, batch, scale=SCALE, dims=None):
+    """
+    One large-batch contrastive step in mini-batch memory (GradCache).
+
+    1. Embed every mini-batch without a graph.
+    2. Compute the loss over the full batch of embeddings and take its
+       gradient with respect to the embeddings only.
+    3. Re-run each mini-batch with a graph, replaying the same dropout
+       masks, and backpropagate the cached embedding gradients into the model.
+
+    The parameter gradients equal those of one forward pass over the whole
+    batch. Returns the loss.
+    """
+    reps, states = {}, {}
+    with torch.no_grad():
+        for name, column in batch.items():
+            states[name], reps[name] = [], []
+            for features in column["chunks"]:
+                states[name].append(torch.get_rng_state())
+                reps[name].append(_embed(model, features))
+    leaves = {name: torch.cat(r).detach().requires_grad_() for name, r in reps.items()}
+    rows = {name: leaves[name][column["restore"]] for name, column in batch.items()}  # back to row order
+    candidates = torch.cat([rows["positive"]] + ([rows["negative"]] if "negative" in rows else []))
+    loss = ranking_loss(rows["anchor"], candidates, scale, dims)
+    loss.backward()
+
+    for name, column in batch.items():
+        grads = leaves[name].grad.split([len(r) for r in reps[name]])
+        for features, state, grad in zip(column["chunks"], states[name], grads):
+            torch.set_rng_state(state)
+            torch.autograd.backward(_embed(model, features), grad)
+    return float(loss.detach())
+
+
+def _optimizer(model, lr, weight_decay=0.01):
+    """AdamW without decay on biases and LayerNorm weights, as SentenceTransformer.fit does."""
+    no_decay = ("bias", "LayerNorm.bias", "LayerNorm.weight")
+    params = list(model.named_parameters())
+    groups = [
+        {"params": [p for n, p in params if not any(nd in n for nd in no_decay)], "weight_decay": weight_decay},
+        {"params": [p for n, p in params if any(nd in n for nd in no_decay)], "weight_decay": 0.0},
+    ]
+    return torch.optim.AdamW(groups, lr=lr)
+
+
+def train_fast(csv_path, out_dir="models/legal-sim-model", epochs=2, batch_size=TRAIN_BATCH_SIZE,
+               mini_batch=TRAIN_MINI_BATCH, workers=TRAIN_WORKERS, lr=TRAIN_LR, warmup_steps=100,
+               max_seq_length=TRAIN_MAX_SEQ_LENGTH, log_every=TRAIN_LOG_EVERY, seed=42, matryoshka_dims=None):
+    """
+    High-throughput CPU training with MultipleNegativesRankingLoss.
+
+    Same objective as :func:`train`, but the CSV is tokenized once into a
+    memory-mapped cache, batches are length-bucketed and loaded by worker
+    processes, and the loss is gradient-cached so ``batch_size`` (the number
+    of in-batch negatives + 1) can be in the hundreds while only
+    ``mini_batch`` rows of activations are in memory.
+
+    ``matryoshka_dims`` (e.g. ``[64, 128, 256]``) also trains every prefix of
+    the embedding to rank on its own, so ``reduction.py --method truncate``
+    can shrink the index without a PCA; the dims are saved to ``matryoshka.json``.
+    """
+    from transformers import get_linear_schedule_with_warmup
+    if TRAIN_THREADS:
+        torch.set_num_threads(TRAIN_THREADS)
+    torch.manual_seed(seed)
+
+    model = SentenceTransformer(MODEL_BASE, device="cpu")
+    if max_seq_length:
+        model.max_seq_length = max_seq_length
+    data = build_token_cache(csv_path, model.tokenizer, model.max_seq_length)
+    batch_size = min(batch_size, len(data))
+    if batch_size < 2:
+        raise ValueError(f"❌ Need at least 2 training pairs, got {len(data)}")
+    sampler = BucketBatchSampler(data.lengths(), batch_size, seed=seed)
+    loader_args = {"num_workers": workers}
+    if workers:
+        loader_args.update(persistent_workers=True, prefetch_factor=4)
+    loader = DataLoader(data, batch_sampler=sampler, **loader_args,
+                        collate_fn=partial(collate, pad_id=data.meta["pad_token_id"] or 0, mini_batch=mini_batch))
+
+    total_steps = len(sampler) * epochs
+    optimizer = _optimizer(model, lr)
+    scheduler = get_linear_schedule_with_warmup(optimizer, min(warmup_steps, total_steps // 2), total_steps)
+    print(f"🚀 Training on {len(data):,} pairs: {epochs} epochs x {len(sampler):,} steps, batch {batch_size} "
+          f"({batch_size - 1} in-batch negatives), mini-batch {mini_batch}, {workers} loader workers")
+
+    model.train()
+    step, started = 0, time.time()
+    window = {"rows": 0, "tokens": 0, "padded": 0, "loss": 0.0, "steps": 0, "t0": time.time(), "wait": 0.0}
+    for epoch in range(epochs):
+        sampler.set_epoch(epoch)
+        t_wait = time.time()
+        for batch, stats in loader:
+            window["wait"] += time.time() - t_wait
+            loss = cached_step(model, batch, dims=matryoshka_dims)
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
+            step += 1
+
+            for key in ("rows", "tokens", "padded"):
+                window[key] += stats[key]
+            window["loss"] += loss
+            window["steps"] += 1
+            if step % log_every == 0 or step == total_steps:
+                elapsed = max(time.time() - window["t0"], 1e-9)
+                print(f"📈 epoch {epoch + 1} step {step:,}/{total_steps:,} | "
+                      f"loss {window['loss'] / window['steps']:.4f} | "
+                      f"{window['rows'] / elapsed:.1f} pairs/s | {window['tokens'] / elapsed:,.0f} tokens/s | "
+                      f"padding {1 - window['tokens'] / max(window['padded'], 1):.1%} | "
+                      f"data wait {window['wait'] / elapsed:.0%} | lr {scheduler.get_last_lr()[0]:.2e}")
+                window = {"rows": 0, "tokens": 0, "padded": 0, "loss": 0.0, "steps": 0, "t0": time.time(),
+                          "wait": 0.0}
+            t_wait = time.time()
+
+    model.eval()
+    model.save(out_dir)
+    if matryoshka_dims:
+        with open(os.path.join(out_dir, "matryoshka.json"), "w", encoding="utf-8") as f:
+            json.dump({"dims": sorted(matryoshka_dims)}, f)
+    elapsed = time.time() - started
+    print(f"✅ Model saved to {out_dir} ({step:,} steps in {elapsed:.0f}s, "
+          f"{step * batch_size / max(elapsed, 1e-9):.1f} pairs/s)")
+
+
+# ----------------------------------------------
+# Hard negatives from the existing index
+# ----------------------------------------------
+def stored_text(metadata):
+    """
+    The passage text an index match carries: chunk / Kaggle ``text``, or the
+    gzip+base64 ``text_preview`` of document-mode PDF ingest (reindex_cases.py).
+    """
+    metadata = metadata or {}
+    if metadata.get("text"):
+        return metadata["text"]
+    preview = metadata.get("text_preview")
+    if preview:
+        import gzip
+        import base64
+        try:
+            return gzip.decompress(base64.b64decode(preview)).decode("utf-8")
+        except (OSError, ValueError):
+            return ""
+    return ""
+
+
+def _same_text(a, b, prefix=200):
+    a, b = " ".join(a.lower().split())[:prefix], " ".join(b.lower().split())[:prefix]
+    return a == b or a.startswith(b) or b.startswith(a)
+
+
+def mine_hard_negatives(csv_path, out_path=None, index_name=None, model_name=None, skip=HARD_NEGATIVE_SKIP,
+                        max_score=HARD_NEGATIVE_MAX_SCORE, candidates=10, batch_size=256):
+    """
+    Add a ``negative`` column: for every anchor, a case the current index
+    ranks highly that is not its positive.
+
+    Anchors are encoded with the model the index was built with and searched
+    in batches; the first match below ``max_score``, past the top ``skip``
+    ranks and whose stored text (see :func:`stored_text`) is neither the
+    anchor nor the positive is kept. Writes ``<csv>.hard.csv`` (anchor,
+    positive, negative). Raises ``ValueError`` if the index returns matches
+    but none of them carries any text to use as a negative.
+    """
+    from encoder import load_encoder
+    from vector_store import get_index, query_many
+    from app_config import INDEX_NAME, EMBED_MODEL
+    index_name, model_name = index_name or INDEX_NAME, model_name or EMBED_MODEL
+    out_path = out_path or os.path.splitext(csv_path)[0] + ".hard.csv"
+
+    rows = load_rows(csv_path)
+    encoder = load_encoder(model_name)
+    index = get_index(index_name, dimension=encoder.get_sentence_embedding_dimension())
+    print(f"⛏️ Mining hard negatives for {len(rows):,} anchors from '{index_name}' ({model_name})...")
+    mined = matches = with_text = 0
+    with open(out_path, "w", newline='', encoding='utf-8') as f:
+        out = csv.writer(f)
+        out.writerow(COLUMNS)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            vectors = encoder.encode([a for a, _, _ in batch], batch_size=32, convert_to_numpy=True,
+                                     show_progress_bar=False)
+            results = query_many(index, vectors, top_k=skip + candidates, include_metadata=True)
+            for (anchor, positive, negative), res in zip(batch, results):
+                for rank, m in enumerate(res["matches"]):
+                    text = stored_text(m.get("metadata"))
+                    matches += 1
+                    with_text += bool(text.strip())
+                    if rank < skip or m["score"] >= max_score or not text.strip():
+                        continue
+                    if _same_text(text, positive) or _same_text(text, anchor):
+                        continue
+                    negative = text
+                    mined += 1
+                    break
+                out.writerow((anchor, positive, negative or ""))
+            if matches and not with_text:
+                raise ValueError(f"❌ Index '{index_name}' stores no passage text ('text' or 'text_preview' "
+                                 f"metadata) to mine negatives from; re-ingest it with text metadata")
+    print(f"✅ {mined:,}/{len(rows):,} hard negatives written to {out_path}")
+    return out_path
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Train similarity model on case pairs.")
     parser.add_argument("--csv", required=True, help="Path to training CSV file (with anchor,positive columns)")
     parser.add_argument("--out", default="models/legal-sim-model", help="Output folder for trained model")
     parser.add_argument("--epochs", type=int, default=2)
-    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--batch", type=int, help=f"Pairs per step (default 8, or {TRAIN_BATCH_SIZE} with --fast)")
+    parser.add_argument("--fast", action="store_true",
+                        help="Pre-tokenized cache, length-bucketed batches and gradient-cached loss")
+    parser.add_argument("--mini-batch", type=int, default=TRAIN_MINI_BATCH, help="Rows per forward pass (--fast)")
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS, help="DataLoader workers (--fast)")
+    parser.add_argument("--lr", type=float, default=TRAIN_LR)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--max-seq-length", type=int, default=TRAIN_MAX_SEQ_LENGTH)
+    parser.add_argument("--matryoshka", help="Comma-separated prefix dims to train for truncation, e.g. 64,128,256 "
+                                              "(--fast)")
+    parser.add_argument("--mine-negatives", action="store_true",
+                        help="First add a hard negative per pair, mined from the existing index")
+    parser.add_argument("--index", help="Index to mine negatives from (default APP_INDEX)")
     args = parser.parse_args()
 
-    train(args.csv, out_dir=args.out, epochs=args.epochs, batch_size=args.batch)
+    csv_path = mine_hard_negatives(args.csv, index_name=args.index) if args.mine_negatives else args.csv
+    if args.fast:
+        train_fast(csv_path, out_dir=args.out, epochs=args.epochs, batch_size=args.batch or TRAIN_BATCH_SIZE,
+                   mini_batch=args.mini_batch, workers=args.workers, lr=args.lr, warmup_steps=args.warmup,
+                   max_seq_length=args.max_seq_length,
+                   matryoshka_dims=[int(d) for d in args.matryoshka.split(",")] if args.matryoshka else None)
+    else:
+        train(csv_path, out_dir=args.out, epochs=args.epochs, batch_size=args.batch or 8)
@@ -0,0 +1,204 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from metrics import CACHE_REQUESTS
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+UPLOAD_CACHE_DIR = os.getenv("UPLOAD_CACHE_DIR", os.path.join("cache", "uploads"))
+UPLOAD_CACHE_MAX_MB = float(os.getenv("UPLOAD_CACHE_MAX_MB", "2048"))
+UPLOAD_CACHE_MEMORY_MB = float(os.getenv("UPLOAD_CACHE_MEMORY_MB", "256"))
+
+
+def digest(data):
+    """SHA-256 of the uploaded bytes — the content address of a PDF."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def serializable_matches(res):
+    """Turn an index query response into plain JSON-able match dicts."""
+    matches = []
+    for m in res["matches"]:
+        matches.append({
+            "id": m["id"],
+            "score": float(m["score"]),
+            "metadata": dict(m.get("metadata") or {}),
+        })
+    return matches
+
+
+def _size_of(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value))
+
+
+class UploadCache:
+    """
+    Content-addressed cache of derived artifacts for uploaded PDFs.
+
+    Entries are keyed by ``(sha256, kind)``: ``text`` for extracted text,
+    ``emb:...`` for embeddings and ``matches:...`` for query results (the
+    kind string carries the model name and index version, so a reindex
+    simply stops hitting old entries). Values live on disk under
+    ``UPLOAD_CACHE_DIR`` and in a small in-memory LRU; both are
+    size-bounded and evict least-recently-used entries first.
+    """
+
+    def __init__(self, root=UPLOAD_CACHE_DIR, max_bytes=UPLOAD_CACHE_MAX_MB * 1024 * 1024,
+                 memory_bytes=UPLOAD_CACHE_MEMORY_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._disk_used = sum(e.stat().st_size for e in self._entries())
+
+    # ---------- disk layout ----------
+    def _path(self, sha, kind):
+        safe_kind = "".join(c if c.isalnum() or c in "-_." else "_" for c in kind)
+        if kind.startswith("emb"):
+            ext = ".npy"
+        elif kind == "text":
+            ext = ".txt"
+        else:
+            ext = ".json"
+        return os.path.join(self.root, sha[:2], f"{sha}.{safe_kind}{ext}")
+
+    def _entries(self):
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                yield from (e for e in os.scandir(shard.path) if e.is_file())
+
+    def _read(self, path):
+        if path.endswith(".npy"):
+            return np.load(path)
+        with open(path, encoding="utf-8") as f:
+            return f.read() if path.endswith(".txt") else json.load(f)
+
+    def _write(self, path, value):
+        """Write ``value`` atomically; returns the change in bytes on disk (an overwrite frees the old file)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if path.endswith(".npy"):
+            with open(tmp, "wb") as f:
+                np.save(f, value)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                if path.endswith(".txt"):
+                    f.write(value)
+                else:
+                    json.dump(value, f)
+        try:
+            old = os.path.getsize(path)
+        except FileNotFoundError:
+            old = 0
+        os.replace(tmp, path)
+        return os.path.getsize(path) - old
+
+    def _evict_disk(self):
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        target = 0.9 * self.max_bytes
+        used = sum(e.stat().st_size for e in entries)
+        for e in entries:
+            if used <= target:
+                break
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+                used -= size
+            except FileNotFoundError:
+                pass
+        self._disk_used = used
+
+    # ---------- memory LRU ----------
+    def _remember(self, key, value):
+        size = _size_of(value)
+        if size > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_used -= self._memory.pop(key)[1]
+        self._memory[key] = (value, size)
+        self._memory_used += size
+        while self._memory_used > self.memory_bytes:
+            _, (_, old_size) = self._memory.popitem(last=False)
+            self._memory_used -= old_size
+
+    # ---------- public API ----------
+    def get(self, sha, kind):
+        key = (sha, kind)
+        family = kind.split(":", 1)[0]  # text / emb / matches — keeps label cardinality fixed
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.labels(cache="upload", kind=family, result="memory_hit").inc()
+                return self._memory[key][0]
+        path = self._path(sha, kind)
+        try:
+            value = self._read(path)
+            os.utime(path)  # mtime doubles as the disk LRU clock
+        except (FileNotFoundError, ValueError, OSError):
+            with self._lock:
+                self.misses += 1
+            CACHE_REQUESTS.labels(cache="upload", kind=family, result="miss").inc()
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, value)
+        CACHE_REQUESTS.labels(cache="upload", kind=family, result="disk_hit").inc()
+        return value
+
+    def put(self, sha, kind, value):
+        if value is None or (isinstance(value, (str, list)) and not value):
+            return  # never cache failed extractions or empty results
+        grown = self._write(self._path(sha, kind), value)
+        with self._lock:
+            self._remember((sha, kind), value)
+            self._disk_used += grown
+            over = self._disk_used > self.max_bytes
+        if over:
+            self._evict_disk()
+
+    def get_or_compute(self, sha, kind, compute):
+        value = self.get(sha, kind)
+        if value is None:
+            value = compute()
+            self.put(sha, kind, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_bytes": self._memory_used,
+                "disk_bytes": self._disk_used,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_upload_cache():
+    """Process-wide cache instance shared by the Flask and Streamlit front ends."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UploadCache()
+        return _cache
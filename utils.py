@@ -1,55 +1,46 @@
 import os
 import pdfplumber
-import nltk
-from nltk.tokenize import sent_tokenize
-from pinecone import Pinecone
 from dotenv import load_dotenv
+from chunker import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, chunk_text
 
-# Setup NLTK + environment
-nltk.download('punkt', quiet=True)
-nltk.download('punkt_tab', quiet=True)
 load_dotenv()
 
-# Initialize Pinecone client
+# Pinecone client is only needed for the hosted embed API; create it lazily
+# so that local-backend setups can import this module offline.
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-pc = Pinecone(api_key=PINECONE_API_KEY)
+PINECONE_EMBED_MODEL = "llama-text-embed-v2"
+_pc = None
 
-def pdf_to_text(path):
-    text = []
+def _pinecone_client():
+    global _pc
+    if _pc is None:
+        from pinecone import Pinecone
+        _pc = Pinecone(api_key=PINECONE_API_KEY)
+    return _pc
+
+def iter_pdf_pages(path):
+    """Yield the text layer of each page (``""`` for pages without one)."""
     with pdfplumber.open(path) as pdf:
         for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text.append(page_text)
-    return "\n".join(text)
+            yield page.extract_text() or ""
+            page.flush_cache()  # keep memory flat on long judgments
 
-def chunk_document(text, chunk_size=600, overlap=100):
-    sentences = sent_tokenize(text)
-    chunks = []
-    current = ""
-    for s in sentences:
-        if len(current) + len(s) <= chunk_size:
-            current += " " + s
-        else:
-            chunks.append(current.strip())
-            current = s
-    if current.strip():
-        chunks.append(current.strip())
+def pdf_to_text(path):
+    return "\n".join(text for text in iter_pdf_pages(path) if text)
 
-    # add overlap
-    out = []
-    for i in range(len(chunks)):
-        start = max(0, i - 1)
-        merged = " ".join(chunks[start:i + 1])
-        out.append(merged)
-    return out
+def chunk_document(text, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    """
+    Split a document into chunks of at most ``max_tokens`` model tokens.
+    ``text`` may be a string or an iterable of page texts; see :mod:`chunker`.
+    """
+    return chunk_text(text, max_tokens, overlap)
 
 def get_embeddings(chunks):
     """
     Generate embeddings using Pinecone’s native embed API.
     """
-    response = pc.inference.embed(
-        model="llama-text-embed-v2",
+    response = _pinecone_client().inference.embed(
+        model=PINECONE_EMBED_MODEL,
         inputs=chunks,
         parameters={"input_type": "passage"}
     )
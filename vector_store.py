@@ -0,0 +1,674 @@
+import os
+import json
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import load_dotenv
+from reduction import DIM_REDUCTION, load_projection, ProjectedIndex
+
+# ----------------------------------------------
+# Configuration
+# ----------------------------------------------
+load_dotenv()
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+INDEX_NAME = os.getenv("PINECONE_INDEX", "legal-cases")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_data")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "1024"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# Compressed codes for the ANN structure: none, int8 (scalar) or binary (1 bit/dim)
+FAISS_QUANTIZATION = os.getenv("FAISS_QUANTIZATION", "none").lower()
+# Quantized search over-fetches this many candidates per result for exact rescoring
+FAISS_RESCORE_FACTOR = int(os.getenv("FAISS_RESCORE_FACTOR", "8"))
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# ----------------------------------------------
+# Metadata filters (Pinecone filter syntax subset)
+# ----------------------------------------------
+def _match_condition(value, cond):
+    if not isinstance(cond, dict):
+        return value == cond
+    for op, arg in cond.items():
+        if op == "$eq" and not value == arg:
+            return False
+        if op == "$ne" and not value != arg:
+            return False
+        if op == "$in" and value not in arg:
+            return False
+        if op == "$nin" and value in arg:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > arg:
+                return False
+            if op == "$gte" and not value >= arg:
+                return False
+            if op == "$lt" and not value < arg:
+                return False
+            if op == "$lte" and not value <= arg:
+                return False
+    return True
+
+
+def matches_filter(metadata, flt):
+    """Return True if a metadata dict satisfies a Pinecone-style filter."""
+    if not flt:
+        return True
+    metadata = metadata or {}
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in cond):
+                return False
+        elif not _match_condition(metadata.get(key), cond):
+            return False
+    return True
+
+
+def _parse_vector(v):
+    """Accept Pinecone upsert shapes: (id, values[, metadata]) tuples or dicts."""
+    if isinstance(v, dict):
+        return str(v["id"]), v["values"], v.get("metadata") or {}
+    if len(v) == 2:
+        return str(v[0]), v[1], {}
+    return str(v[0]), v[1], v[2] or {}
+
+
+# ----------------------------------------------
+# Local FAISS-backed index
+# ----------------------------------------------
+class LocalIndex:
+    """
+    In-process vector index with the same upsert/query/delete/list/fetch
+    surface as a Pinecone ``Index``, persisted to ``<root>/<name>/``.
+
+    Vectors are kept in a float32 matrix which is the source of truth; the
+    FAISS structure (flat, IVF or HNSW) is an acceleration layer built from
+    it. Deletes and overwrites leave tombstones that are compacted away.
+
+    With ``quantization`` set to ``int8`` or ``binary`` the FAISS structure
+    holds compressed codes only, the float matrix is memory-mapped from disk,
+    and each query over-fetches candidates from the codes and rescores them
+    against the float rows it actually touches.
+    """
+
+    def __init__(self, name, root=VECTOR_STORE_DIR, dimension=None, metric="cosine",
+                 index_type=FAISS_INDEX_TYPE, quantization=FAISS_QUANTIZATION):
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"❌ Unknown FAISS_INDEX_TYPE '{index_type}' (use flat, ivf or hnsw)")
+        if quantization not in ("none", "int8", "binary"):
+            raise ValueError(f"❌ Unknown FAISS_QUANTIZATION '{quantization}' (use none, int8 or binary)")
+        self.name = name
+        self.path = os.path.join(root, name)
+        self.dimension = dimension
+        self.metric = metric
+        self.index_type = index_type
+        self.quantization = quantization
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_mtime = None
+        self._dirty = False
+        if os.path.exists(self._records_path):
+            self._load()
+
+    # ---------- storage layout ----------
+    @property
+    def _records_path(self):
+        return os.path.join(self.path, "records.json")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.path, "vectors.npy")
+
+    @property
+    def _faiss_path(self):
+        suffix = "" if self.quantization == "none" else f".{self.quantization}"
+        return os.path.join(self.path, f"index.{self.index_type}{suffix}.faiss")
+
+    def _reset(self):
+        dim = self.dimension or 0
+        self._vectors = np.zeros((0, dim), dtype="float32")
+        self._n = 0
+        self._ids = []
+        self._metadata = []
+        self._rows = {}
+        self._deleted = 0
+        self._faiss = None
+        self._trained_on = 0
+
+    # ---------- persistence ----------
+    def _load(self):
+        import faiss
+        with open(self._records_path, encoding="utf-8") as f:
+            records = json.load(f)
+        self.dimension = records["dimension"]
+        self.metric = records.get("metric", self.metric)
+        vectors = None
+        if os.path.exists(self._vectors_path):
+            # quantized modes only touch float rows when rescoring, so leave them on disk
+            mmap = "r" if self.quantization != "none" else None
+            vectors = np.load(self._vectors_path, mmap_mode=mmap)
+        self._reset()
+        if vectors is not None and len(vectors):
+            self._vectors = vectors if self.quantization != "none" else np.ascontiguousarray(vectors, dtype="float32")
+            self._n = len(vectors)
+        self._ids = list(records["ids"])
+        self._metadata = list(records["metadata"])
+        self._rows = {vid: row for row, vid in enumerate(self._ids)}
+        if self._n and os.path.exists(self._faiss_path):
+            read = faiss.read_index_binary if self.quantization == "binary" else faiss.read_index
+            self._faiss = read(self._faiss_path)
+            self._trained_on = self._n
+            self._configure_search(self._faiss)
+            if self._faiss.ntotal != self._n:
+                self._faiss = None
+        self._loaded_mtime = os.path.getmtime(self._records_path)
+        self._dirty = False
+
+    def _maybe_reload(self):
+        """Pick up changes persisted by another process (e.g. a reindex run)."""
+        if self._dirty or not os.path.exists(self._records_path):
+            return
+        if os.path.getmtime(self._records_path) != self._loaded_mtime:
+            self._load()
+
+    def persist(self):
+        """Compact tombstones and atomically write vectors, records and the FAISS index."""
+        import faiss
+        with self._lock:
+            if not self._dirty:
+                return
+            self._compact()
+            self._ensure_faiss()
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._vectors_path + ".tmp.npy"
+            np.save(tmp, self._vectors[:self._n])
+            os.replace(tmp, self._vectors_path)
+            if self._faiss is not None:
+                write = faiss.write_index_binary if self.quantization == "binary" else faiss.write_index
+                write(self._faiss, self._faiss_path + ".tmp")
+                os.replace(self._faiss_path + ".tmp", self._faiss_path)
+            records = {
+                "dimension": self.dimension,
+                "metric": self.metric,
+                "ids": self._ids,
+                "metadata": self._metadata,
+            }
+            with open(self._records_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(records, f)
+            os.replace(self._records_path + ".tmp", self._records_path)
+            self._loaded_mtime = os.path.getmtime(self._records_path)
+            self._dirty = False
+
+    # ---------- FAISS structure ----------
+    def _faiss_metric(self):
+        import faiss
+        return faiss.METRIC_L2 if self.metric == "euclidean" else faiss.METRIC_INNER_PRODUCT
+
+    def _configure_search(self, idx):
+        if self.index_type == "ivf":
+            idx.nprobe = FAISS_NPROBE
+        elif self.index_type == "hnsw":
+            idx.hnsw.efSearch = FAISS_EF_SEARCH
+
+    def _codes(self, arr):
+        """What the FAISS structure stores/searches: floats, or sign bits for binary mode."""
+        if self.quantization == "binary":
+            return np.packbits(arr > 0, axis=1)
+        return arr
+
+    def _build_binary(self, data):
+        import faiss
+        d = self.dimension
+        if d % 8:
+            raise ValueError(f"❌ Binary quantization needs a dimension divisible by 8 (got {d})")
+        codes = self._codes(data)
+        if self.index_type == "hnsw":
+            return faiss.IndexBinaryHNSW(d, FAISS_HNSW_M)
+        if self.index_type == "ivf":
+            nlist = max(1, min(FAISS_NLIST, self._n // 39))
+            idx = faiss.IndexBinaryIVF(faiss.IndexBinaryFlat(d), d, nlist)
+            idx.train(codes)
+            return idx
+        return faiss.IndexBinaryFlat(d)
+
+    def _build_int8(self, data):
+        import faiss
+        d, metric, qtype = self.dimension, self._faiss_metric(), faiss.ScalarQuantizer.QT_8bit
+        if self.index_type == "hnsw":
+            idx = faiss.IndexHNSWSQ(d, qtype, FAISS_HNSW_M, metric)
+            idx.hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+        elif self.index_type == "ivf":
+            nlist = max(1, min(FAISS_NLIST, self._n // 39))
+            quantizer = faiss.IndexFlatL2(d) if metric == faiss.METRIC_L2 else faiss.IndexFlatIP(d)
+            idx = faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, qtype, metric)
+        else:
+            idx = faiss.IndexScalarQuantizer(d, qtype, metric)
+        idx.train(data)
+        return idx
+
+    def _build_faiss(self):
+        import faiss
+        d, metric = self.dimension, self._faiss_metric()
+        data = np.ascontiguousarray(self._vectors[:self._n])
+        if self.quantization != "none":
+            idx = self._build_binary(data) if self.quantization == "binary" else self._build_int8(data)
+            self._configure_search(idx)
+            idx.add(self._codes(data))
+            self._faiss = idx
+            self._trained_on = self._n
+            return
+        if self.index_type == "hnsw":
+            idx = faiss.IndexHNSWFlat(d, FAISS_HNSW_M, metric)
+            idx.hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+        elif self.index_type == "ivf":
+            # ~39 training points per centroid is the FAISS minimum
+            nlist = max(1, min(FAISS_NLIST, self._n // 39))
+            quantizer = faiss.IndexFlatL2(d) if metric == faiss.METRIC_L2 else faiss.IndexFlatIP(d)
+            idx = faiss.IndexIVFFlat(quantizer, d, nlist, metric)
+            idx.train(data)
+        else:
+            idx = faiss.IndexFlatL2(d) if metric == faiss.METRIC_L2 else faiss.IndexFlatIP(d)
+        self._configure_search(idx)
+        if self._n:
+            idx.add(data)
+        self._faiss = idx
+        self._trained_on = self._n
+
+    def _ensure_faiss(self):
+        if not self._n:
+            self._faiss = None
+            return
+        stale = self._faiss is None or self._faiss.ntotal != self._n
+        # IVF centroids trained on a small corpus degrade as it grows
+        if self.index_type == "ivf" and self._n > 4 * max(self._trained_on, 1):
+            stale = True
+        if stale:
+            self._build_faiss()
+
+    def _compact(self):
+        if not self._deleted:
+            return
+        keep = [row for row, vid in enumerate(self._ids) if vid is not None]
+        self._vectors = np.ascontiguousarray(self._vectors[keep])
+        self._ids = [self._ids[r] for r in keep]
+        self._metadata = [self._metadata[r] for r in keep]
+        self._rows = {vid: row for row, vid in enumerate(self._ids)}
+        self._n = len(keep)
+        self._deleted = 0
+        self._faiss = None
+
+    def _prepare(self, values):
+        arr = np.asarray(values, dtype="float32")
+        if arr.ndim == 1:
+            arr = arr[None, :]
+        if self.dimension is None:
+            self.dimension = arr.shape[1]
+            self._vectors = np.zeros((0, self.dimension), dtype="float32")
+        if arr.shape[1] != self.dimension:
+            raise ValueError(f"❌ Vector dimension {arr.shape[1]} does not match index dimension {self.dimension}")
+        if self.metric == "cosine":
+            norms = np.linalg.norm(arr, axis=1, keepdims=True)
+            arr = arr / np.maximum(norms, 1e-12)
+        return np.ascontiguousarray(arr, dtype="float32")
+
+    def _append(self, arr):
+        needed = self._n + len(arr)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors), 1024)
+            grown = np.zeros((capacity, self.dimension), dtype="float32")
+            grown[:self._n] = self._vectors[:self._n]
+            self._vectors = grown
+        self._vectors[self._n:needed] = arr
+        self._n = needed
+
+    def _tombstone(self, vid):
+        row = self._rows.pop(vid, None)
+        if row is not None:
+            self._ids[row] = None
+            self._metadata[row] = None
+            self._deleted += 1
+
+    # ---------- Pinecone-compatible API ----------
+    def upsert(self, vectors, namespace=None, **kwargs):
+        if not vectors:
+            return {"upserted_count": 0}
+        parsed = [_parse_vector(v) for v in vectors]
+        # last write wins for duplicate IDs within one call
+        latest = {}
+        for vid, values, meta in parsed:
+            latest[vid] = (values, meta)
+        with self._lock:
+            self._maybe_reload()
+            arr = self._prepare([values for values, _ in latest.values()])
+            start = self._n
+            for vid in latest:
+                self._tombstone(vid)
+            self._append(arr)
+            for offset, (vid, (_, meta)) in enumerate(latest.items()):
+                self._ids.append(vid)
+                self._metadata.append(dict(meta))
+                self._rows[vid] = start + offset
+            if self._faiss is not None and self._faiss.ntotal == start:
+                self._faiss.add(self._codes(arr))
+            if self._deleted > max(1000, self._n // 5):
+                self._compact()
+            self._dirty = True
+        return {"upserted_count": len(latest)}
+
+    def delete(self, ids=None, delete_all=False, filter=None, namespace=None, **kwargs):
+        with self._lock:
+            self._maybe_reload()
+            if delete_all:
+                self._reset()
+            else:
+                targets = list(ids or [])
+                if filter:
+                    targets += [vid for vid, meta in zip(self._ids, self._metadata)
+                                if vid is not None and matches_filter(meta, filter)]
+                for vid in targets:
+                    self._tombstone(str(vid))
+                if self._deleted > max(1000, self._n // 5):
+                    self._compact()
+            self._dirty = True
+        return {}
+
+    def _search(self, q, k, flt):
+        """Return (scores, rows) for a batch of prepared query vectors."""
+        live = self._n - self._deleted
+        k = min(k, live)
+        if k <= 0:
+            return [[] for _ in range(len(q))]
+        if flt:
+            rows = np.array([r for r, (vid, meta) in enumerate(zip(self._ids, self._metadata))
+                             if vid is not None and matches_filter(meta, flt)], dtype="int64")
+            if not len(rows):
+                return [[] for _ in range(len(q))]
+            cand = self._vectors[rows]
+            scores = q @ cand.T
+            if self.metric == "euclidean":
+                # squared L2 distance, smaller is better
+                scores = np.sum(q ** 2, axis=1, keepdims=True) - 2 * scores + np.sum(cand ** 2, axis=1)[None, :]
+                order = np.argsort(scores, axis=1)
+            else:
+                order = np.argsort(-scores, axis=1)
+            k = min(k, len(rows))
+            return [[(float(scores[qi, j]), int(rows[j])) for j in order[qi, :k]] for qi in range(len(q))]
+        self._ensure_faiss()
+        if self.quantization != "none":
+            return self._search_rescored(q, k)
+        fetch_k = min(self._n, k + self._deleted)
+        scores, labels = self._faiss.search(q, fetch_k)
+        out = []
+        for qi in range(len(q)):
+            hits = []
+            for score, row in zip(scores[qi], labels[qi]):
+                if row < 0 or self._ids[row] is None:
+                    continue
+                hits.append((float(score), int(row)))
+                if len(hits) == k:
+                    break
+            out.append(hits)
+        return out
+
+    def _search_rescored(self, q, k):
+        """Candidate generation on compressed codes, then exact scores from the float store."""
+        fetch_k = min(self._n, k * FAISS_RESCORE_FACTOR + self._deleted)
+        _, labels = self._faiss.search(self._codes(q), fetch_k)
+        out = []
+        for qi in range(len(q)):
+            rows = np.array(sorted(int(r) for r in labels[qi] if r >= 0 and self._ids[r] is not None),
+                            dtype="int64")
+            if not len(rows):
+                out.append([])
+                continue
+            cand = np.asarray(self._vectors[rows], dtype="float32")  # touches only these mmap pages
+            if self.metric == "euclidean":
+                scores = np.sum((cand - q[qi]) ** 2, axis=1)
+                order = np.argsort(scores)[:k]
+            else:
+                scores = cand @ q[qi]
+                order = np.argsort(-scores)[:k]
+            out.append([(float(scores[j]), int(rows[j])) for j in order])
+        return out
+
+    def memory_footprint(self):
+        """Bytes held by the search structure vs. the float store (RAM or memory-mapped)."""
+        import faiss
+        with self._lock:
+            self._ensure_faiss()
+            if self._faiss is None:
+                index_bytes = 0
+            elif self.quantization == "binary":
+                index_bytes = faiss.serialize_index_binary(self._faiss).nbytes
+            else:
+                index_bytes = faiss.serialize_index(self._faiss).nbytes
+            return {
+                "index_type": self.index_type,
+                "quantization": self.quantization,
+                "vectors": self._n - self._deleted,
+                "index_bytes": int(index_bytes),
+                "float_store_bytes": int(self._n * (self.dimension or 0) * 4),
+                "float_store_mmapped": isinstance(self._vectors, np.memmap),
+            }
+
+    def _format(self, hits, include_values, include_metadata):
+        matches = []
+        for score, row in hits:
+            match = {"id": self._ids[row], "score": score}
+            if include_values:
+                match["values"] = np.asarray(self._vectors[row], dtype="float32").tolist()
+            if include_metadata:
+                match["metadata"] = self._metadata[row]
+            matches.append(match)
+        return {"matches": matches, "namespace": ""}
+
+    def query(self, vector=None, top_k=10, include_metadata=False, include_values=False,
+              filter=None, id=None, namespace=None, **kwargs):
+        with self._lock:
+            self._maybe_reload()
+            if id is not None:
+                row = self._rows.get(str(id))
+                if row is None:
+                    return {"matches": [], "namespace": ""}
+                q = np.asarray(self._vectors[row], dtype="float32")[None, :]
+            else:
+                q = self._prepare(vector)
+            hits = self._search(q, top_k, filter)[0]
+            return self._format(hits, include_values, include_metadata)
+
+    def query_many(self, vectors, top_k=10, include_metadata=False, include_values=False,
+                   filter=None, **kwargs):
+        """Search several query vectors in one FAISS call; returns one result per vector."""
+        with self._lock:
+            self._maybe_reload()
+            q = self._prepare(vectors)
+            return [self._format(hits, include_values, include_metadata)
+                    for hits in self._search(q, top_k, filter)]
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        with self._lock:
+            self._maybe_reload()
+            vectors = {}
+            for vid in ids:
+                row = self._rows.get(str(vid))
+                if row is not None:
+                    vectors[vid] = {"id": vid, "values": np.asarray(self._vectors[row], dtype="float32").tolist(),
+                                    "metadata": self._metadata[row]}
+            return {"vectors": vectors, "namespace": ""}
+
+    def list(self, prefix=None, limit=100, namespace=None, **kwargs):
+        """Yield pages of IDs, like ``pinecone.Index.list``."""
+        with self._lock:
+            self._maybe_reload()
+            ids = [vid for vid in self._ids if vid is not None and (not prefix or vid.startswith(prefix))]
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            self._maybe_reload()
+            count = self._n - self._deleted
+            return {
+                "dimension": self.dimension,
+                "index_fullness": 0.0,
+                "total_vector_count": count,
+                "namespaces": {"": {"vector_count": count}},
+            }
+
+
+# ----------------------------------------------
+# Backend selection
+# ----------------------------------------------
+def _pinecone_index(index_name, dimension, metric):
+    from pinecone import Pinecone, ServerlessSpec
+    api_key = os.getenv("PINECONE_API_KEY")
+    if not api_key:
+        raise ValueError("❌ Set your PINECONE_API_KEY in the .env file!")
+    pc = Pinecone(api_key=api_key)
+    if dimension and index_name not in [idx["name"] for idx in pc.list_indexes()]:
+        print(f"🆕 Creating Pinecone index '{index_name}'...")
+        pc.create_index(
+            name=index_name,
+            dimension=dimension,
+            metric=metric,
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    return pc.Index(index_name)
+
+
+def get_index(index_name=None, dimension=None, metric="cosine", backend=None):
+    """
+    Return the vector index for ``index_name`` on the configured backend.
+
+    ``VECTOR_BACKEND=pinecone`` (default) talks to Pinecone; ``faiss`` (or
+    ``local``) opens an in-process index under ``VECTOR_STORE_DIR``. Passing
+    ``dimension`` creates the index if it does not exist yet.
+
+    If a dimensionality-reduction projection is stored for the index (see
+    ``reduction.py``), the index is wrapped so every upsert and query goes
+    through it, and ``dimension`` (the model's) becomes the reduced one.
+    """
+    index_name = index_name or INDEX_NAME
+    backend = (backend or VECTOR_BACKEND).lower()
+    key = (backend, index_name)
+    with _indexes_lock:
+        if key not in _indexes:
+            projection = load_projection(index_name) if DIM_REDUCTION else None
+            if projection and dimension:
+                dimension = projection.output_dim
+            if backend in ("faiss", "local"):
+                index = LocalIndex(index_name, dimension=dimension, metric=metric)
+            elif backend == "pinecone":
+                index = _pinecone_index(index_name, dimension, metric)
+            else:
+                raise ValueError(f"❌ Unknown VECTOR_BACKEND '{backend}' (use pinecone or faiss)")
+            _indexes[key] = ProjectedIndex(index, projection) if projection else index
+        return _indexes[key]
+
+
+def query_many(index, vectors, top_k=10, include_metadata=False, include_values=False, filter=None,
+               namespace=None, max_workers=8, **kwargs):
+    """
+    Run one query per vector and return the results in order.
+
+    Local indexes answer the whole batch with a single search; remote ones
+    get the queries issued concurrently instead of one after another.
+    Other keyword arguments are passed to every query.
+    """
+    if len(vectors) == 0:
+        return []
+    options = dict(top_k=top_k, include_metadata=include_metadata, include_values=include_values,
+                   filter=filter, **kwargs)
+    if namespace is not None:
+        options["namespace"] = namespace
+    if hasattr(index, "query_many"):
+        return index.query_many(vectors, **options)
+
+    def _one(vec):
+        vec = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+        return index.query(vector=vec, **options)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(vectors))) as executor:
+        return list(executor.map(_one, vectors))
+
+
+def delete_in_batches(index, ids, batch_size=100, max_workers=4):
+    """Delete IDs (any iterable, consumed lazily) in concurrent batches; returns the count."""
+    slots = threading.BoundedSemaphore(max_workers)
+    deleted = 0
+
+    def _delete(batch):
+        try:
+            index.delete(ids=batch)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures, batch = [], []
+        for vid in ids:
+            batch.append(vid)
+            if len(batch) >= batch_size:
+                slots.acquire()
+                futures.append(executor.submit(_delete, batch))
+                deleted += len(batch)
+                batch = []
+        if batch:
+            slots.acquire()
+            futures.append(executor.submit(_delete, batch))
+            deleted += len(batch)
+        for future in futures:
+            future.result()
+    return deleted
+
+
+# ----------------------------------------------
+# Index version counter
+# ----------------------------------------------
+def _version_path(index_name):
+    return os.path.join(VECTOR_STORE_DIR, "versions", f"{index_name or INDEX_NAME}.txt")
+
+
+def index_version(index_name=None):
+    """Current version of an index; bumped by every ingestion run that changes it."""
+    try:
+        with open(_version_path(index_name), encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_index_version(index_name=None):
+    """Mark an index as changed so caches keyed on its version are invalidated."""
+    path = _version_path(index_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    version = index_version(index_name) + 1
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(str(version))
+    os.replace(path + ".tmp", path)
+    return version
+
+
+def flush(index):
+    """Persist a local index to disk; a no-op for remote backends."""
+    if hasattr(index, "persist"):
+        index.persist()
+
+
+@atexit.register
+def _flush_all():
+    for idx in list(_indexes.values()):
+        try:
+            flush(idx)
+        except Exception as e:
+            print(f"⚠️ Failed to persist vector index: {e}")